@@ -0,0 +1,308 @@
+import asyncio
+import hashlib
+import logging
+import math
+import os
+import string
+import struct
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional
+
+from storage import UserStore
+
+logger = logging.getLogger(__name__)
+
+# --- Address pool defaults ---
+DOMAIN = "mailto.plus"
+POOL_SIZE = 200          # Ready addresses kept in the buffer
+LOW_WATER = 50           # The background refill starts once fewer are left
+REFILL_BATCH = 50        # Addresses generated (and warmed) per refill step
+WARM_CONCURRENCY = 10    # Concurrent upstream checks while warming
+BLOOM_CAPACITY = 2_000_000
+BLOOM_ERROR_RATE = 0.001
+SAVE_INTERVAL = 600      # Seconds between snapshots of the issued-name filter (several MB; also saved on close)
+BLOOM_KEY = "issued_addresses"
+
+MIN_NAME_LENGTH = 6
+MAX_NAME_LENGTH = 12
+NAME_CHARS = string.ascii_lowercase + string.digits
+
+# Random bytes are mapped to characters and lengths by modulo; bytes >= 252 (a multiple
+# of both 36 characters and 7 lengths) are dropped so neither is biased
+_UNBIASED = 252
+_REJECT = bytes(range(_UNBIASED, 256))
+_TO_CHAR = bytes(ord(NAME_CHARS[b % len(NAME_CHARS)]) for b in range(256))
+_LENGTHS = MAX_NAME_LENGTH - MIN_NAME_LENGTH + 1
+
+
+def generate_names(count: int) -> list:
+    """
+    `count` random names of 6-12 lowercase letters and digits, drawn from the
+    OS CSPRNG in bulk (an inbox is readable by anyone who guesses its name).
+    """
+    names = []
+    while len(names) < count:
+        need = count - len(names)
+        lengths = os.urandom(need).translate(None, _REJECT)
+        chars = os.urandom(need * MAX_NAME_LENGTH * 17 // 16 + 64).translate(None, _REJECT).translate(_TO_CHAR)
+        chars = chars.decode("ascii")
+        position = 0
+        for b in lengths:
+            length = MIN_NAME_LENGTH + b % _LENGTHS
+            if position + length > len(chars):
+                break
+            names.append(chars[position:position + length])
+            position += length
+    return names
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings. Probe positions are 32-bit slices of
+    one blake2b digest (up to 16 probes, 2**32 bits).
+
+    Sized for `capacity` items at `error_rate` false positives; past capacity
+    it keeps working with a rising false-positive rate. Serializes to bytes
+    so it can be snapshotted into the store.
+    """
+
+    _HEADER = struct.Struct("<QBQ")     # bits, hashes, items
+
+    def __init__(self, capacity: int = BLOOM_CAPACITY, error_rate: float = BLOOM_ERROR_RATE,
+                 bits: Optional[int] = None, hashes: Optional[int] = None):
+        self.capacity = capacity
+        self.bits = bits or min(2**32, max(64, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.hashes = hashes or min(16, max(1, round(self.bits / capacity * math.log(2))))
+        self.count = 0
+        self._array = bytearray((self.bits + 7) // 8)
+        self._slices = struct.Struct(f"<{self.hashes}I")
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _positions(self, item: str) -> list:
+        bits = self.bits
+        digest = hashlib.blake2b(item.encode(), digest_size=self._slices.size).digest()
+        return [h % bits for h in self._slices.unpack(digest)]
+
+    def __contains__(self, item: str) -> bool:
+        array = self._array
+        return all(array[p >> 3] & (1 << (p & 7)) for p in self._positions(item))
+
+    def add(self, item: str) -> bool:
+        """Adds an item. Returns False if it was (probably) present already."""
+        array = self._array
+        new = False
+        for p in self._positions(item):
+            mask = 1 << (p & 7)
+            if not array[p >> 3] & mask:
+                array[p >> 3] |= mask
+                new = True
+        if new:
+            self.count += 1
+        return new
+
+    def estimated_error_rate(self) -> float:
+        return (1 - math.exp(-self.hashes * self.count / self.bits)) ** self.hashes
+
+    def to_bytes(self) -> bytes:
+        return self._HEADER.pack(self.bits, self.hashes, self.count) + bytes(self._array)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, capacity: int = BLOOM_CAPACITY) -> "BloomFilter":
+        bits, hashes, count = cls._HEADER.unpack_from(data)
+        bloom = cls(capacity, bits=bits, hashes=hashes)
+        body = data[cls._HEADER.size:]
+        if len(body) != len(bloom._array):
+            raise ValueError(f"filter body is {len(body)} bytes, expected {len(bloom._array)}")
+        bloom._array[:] = body
+        bloom.count = count
+        return bloom
+
+
+class AddressPool:
+    """
+    Pre-generated random addresses, refilled in the background.
+
+    Every generated name is recorded in a Bloom filter of issued names
+    (snapshotted into the store), so a name is never handed out twice across
+    users or restarts; a false positive only costs a regeneration. With a
+    `warm(email)` check, each address is verified upstream before it enters
+    the buffer (an address that already holds mail is dropped instead of
+    announcing someone else's mail), which also primes the client's listing
+    cache for the first poll. `take()` serves from the buffer and only
+    generates inline when it runs dry.
+    """
+
+    def __init__(
+        self,
+        store: Optional[UserStore] = None,
+        domain: str = DOMAIN,
+        size: int = POOL_SIZE,
+        low_water: int = LOW_WATER,
+        refill_batch: int = REFILL_BATCH,
+        capacity: int = BLOOM_CAPACITY,
+        error_rate: float = BLOOM_ERROR_RATE,
+        warm: Optional[Callable[[str], Awaitable[bool]]] = None,
+        warm_concurrency: int = WARM_CONCURRENCY,
+        save_interval: float = SAVE_INTERVAL,
+    ):
+        self.store = store
+        self.domain = domain
+        self.size = size
+        self.low_water = low_water
+        self.refill_batch = refill_batch
+        self.warm = warm
+        self.warm_concurrency = warm_concurrency
+        self.save_interval = save_interval
+        self.issued = BloomFilter(capacity, error_rate)
+        self.collisions = 0          # Names regenerated because the filter had them
+        self.rejected = 0            # Addresses dropped by the warm check
+        self.served_inline = 0       # Addresses generated on demand because the buffer ran dry
+        self._ready = deque()
+        self._dirty = False
+        self._wakeup = asyncio.Event()
+        self._closing = False
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._ready)
+
+    # --- Generation ---
+
+    def reserve(self, name: str) -> bool:
+        """Records a name as issued. Returns False if it (probably) was already."""
+        self._dirty = True
+        return self.issued.add(name)
+
+    def generate(self, count: int) -> list:
+        """`count` fresh addresses, each recorded as issued."""
+        addresses = []
+        while len(addresses) < count:
+            for name in generate_names(count - len(addresses)):
+                if self.reserve(name):
+                    addresses.append(f"{name}@{self.domain}")
+                else:
+                    self.collisions += 1
+        return addresses
+
+    def take(self, count: int = 1) -> list:
+        """Issues `count` addresses, from the buffer first."""
+        ready = self._ready
+        addresses = [ready.popleft() for _ in range(min(count, len(ready)))]
+        if len(addresses) < count:
+            self.served_inline += count - len(addresses)
+            addresses += self.generate(count - len(addresses))
+        if len(ready) < self.low_water:
+            self._wakeup.set()
+        return addresses
+
+    def custom(self, name: str) -> str:
+        """A user-chosen address; recorded so random names never collide with it."""
+        self.reserve(name.lower())
+        return f"{name}@{self.domain}"
+
+    # --- Background refill ---
+
+    async def _warm_batch(self, addresses: list) -> list:
+        semaphore = asyncio.Semaphore(self.warm_concurrency)
+
+        async def check(email: str) -> bool:
+            async with semaphore:
+                try:
+                    return await self.warm(email)
+                except Exception as e:
+                    logger.warning(f"Warming {email} failed: {e}")
+                    return True  # Upstream trouble is not a reason to withhold an address
+
+        usable = await asyncio.gather(*(check(email) for email in addresses))
+        self.rejected += usable.count(False)
+        return [email for email, ok in zip(addresses, usable) if ok]
+
+    async def refill(self) -> int:
+        """Tops the buffer up to `size`. Returns the number of addresses added."""
+        added = 0
+        while len(self._ready) < self.size:
+            batch = self.generate(min(self.refill_batch, self.size - len(self._ready)))
+            if self.warm is not None:
+                batch = await self._warm_batch(batch)
+                if not batch:
+                    # Every fresh address already held mail: something is off upstream, retry later
+                    logger.warning("Address pool refill paused: a whole batch failed the warm check.")
+                    break
+            else:
+                await asyncio.sleep(0)
+            self._ready.extend(batch)
+            added += len(batch)
+        return added
+
+    async def save(self) -> None:
+        """Snapshots the issued-name filter into the store (on a worker thread)."""
+        if self.store is None or not self._dirty:
+            return
+        self._dirty = False
+        data = self.issued.to_bytes()
+        try:
+            await asyncio.to_thread(self.store.save_blob, BLOOM_KEY, data)
+        except Exception as e:
+            self._dirty = True
+            logger.error(f"Failed to save the issued-address filter: {e}")
+
+    async def load(self) -> None:
+        """Restores the issued-name filter from the store (read and decoded on a worker thread)."""
+        if self.store is None:
+            return
+        data = await asyncio.to_thread(self.store.load_blob, BLOOM_KEY)
+        if data is None:
+            return
+        try:
+            self.issued = await asyncio.to_thread(BloomFilter.from_bytes, data, self.issued.capacity)
+        except (ValueError, struct.error) as e:
+            logger.error(f"Ignoring a corrupt issued-address filter: {e}")
+            return
+        logger.info(f"Loaded the issued-address filter ({len(self.issued)} names).")
+        if len(self.issued) > self.issued.capacity:
+            logger.warning(
+                f"Issued-address filter is past its capacity ({len(self.issued)}/{self.issued.capacity}); "
+                f"estimated false-positive rate {self.issued.estimated_error_rate():.4f}"
+            )
+
+    async def _run(self) -> None:
+        last_save = time.monotonic()
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.save_interval)
+            except asyncio.TimeoutError:
+                pass
+            if self._closing:
+                # wait_for may swallow the cancellation if the wakeup fired at the same time
+                return
+            self._wakeup.clear()
+            try:
+                await self.refill()
+            except Exception as e:
+                logger.error(f"Address pool refill failed: {e}")
+            if time.monotonic() - last_save >= self.save_interval:
+                await self.save()
+                last_save = time.monotonic()
+
+    async def start(self) -> None:
+        """Loads the issued-name filter and starts the background refill."""
+        if self._task is None:
+            await self.load()
+            self._closing = False
+            self._wakeup.set()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._closing = True
+            self._wakeup.set()
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.save()
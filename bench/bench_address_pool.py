@@ -0,0 +1,168 @@
+"""
+Benchmark: random address generation throughput and collision rate at
+millions of issued addresses, legacy generator vs. the address pool.
+
+- legacy: the original per-character `random.choice` loop, no record of
+  issued names; duplicates are counted against an exact set
+- pool: bulk CSPRNG names checked against the issued-name Bloom filter;
+  every issued address is verified against an exact set (must be 0 duplicates)
+
+Also reports the filter's size and false-positive rate, the snapshot
+round-trip time and the latency of `take()` from the buffer vs. inline.
+Names are 6-12 characters as before; `--min-length` shrinks the name space
+to make collisions visible at smaller scales.
+
+    python bench/bench_address_pool.py --issued 2000000
+    python bench/bench_address_pool.py --check
+"""
+import argparse
+import asyncio
+import os
+import random
+import string
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.dirname(BENCH_DIR), BENCH_DIR]
+
+import address_pool  # noqa: E402
+from address_pool import AddressPool, BloomFilter, generate_names  # noqa: E402
+from checks import Checks  # noqa: E402
+from storage import UserStore  # noqa: E402
+
+
+def legacy_name(min_length: int) -> str:
+    chars = string.ascii_letters + string.digits
+    length = random.randint(min_length, 12)
+    return ''.join(random.choice(chars) for _ in range(length)).lower()
+
+
+def run_legacy(issued: int, min_length: int) -> None:
+    seen, duplicates = set(), 0
+    started = time.perf_counter()
+    for _ in range(issued):
+        name = legacy_name(min_length)
+        if name in seen:
+            duplicates += 1
+        seen.add(name)
+    elapsed = time.perf_counter() - started
+    print(f"{'legacy':<8} {issued / elapsed:>12,.0f} names/s   duplicate addresses issued: {duplicates:,} "
+          f"({duplicates / issued:.2e})")
+
+
+def run_pool(issued: int, capacity: int, batch: int) -> AddressPool:
+    pool = AddressPool(capacity=capacity)
+    seen, duplicates = set(), 0
+    started = time.perf_counter()
+    for _ in range(0, issued, batch):
+        for email in pool.generate(batch):
+            if email in seen:
+                duplicates += 1
+            seen.add(email)
+    elapsed = time.perf_counter() - started
+    print(f"{'pool':<8} {issued / elapsed:>12,.0f} names/s   duplicate addresses issued: {duplicates:,}   "
+          f"names regenerated: {pool.collisions:,} ({pool.collisions / issued:.2e})")
+    return pool
+
+
+def report_filter(pool: AddressPool, seen_count: int) -> None:
+    bloom = pool.issued
+    started = time.perf_counter()
+    data = bloom.to_bytes()
+    BloomFilter.from_bytes(data)
+    elapsed = time.perf_counter() - started
+    probes = 200_000
+    false_positives = sum(1 for i in range(probes) if f"probe-{i}" in bloom)
+    print(f"filter: {len(data) / 2**20:.1f} MiB for {len(bloom):,} names ({bloom.hashes} hashes), "
+          f"measured false positives {false_positives / probes:.2e} (estimated {bloom.estimated_error_rate():.2e}), "
+          f"snapshot round trip {elapsed * 1000:.0f} ms")
+
+
+async def report_take(size: int) -> None:
+    pool = AddressPool(UserStore(), size=size, low_water=0)
+    await pool.refill()
+    started = time.perf_counter()
+    for _ in range(size):
+        pool.take()
+    buffered = (time.perf_counter() - started) / size
+    started = time.perf_counter()
+    for _ in range(size):
+        pool.take()
+    inline = (time.perf_counter() - started) / size
+    print(f"take(): {buffered * 1e6:.2f} µs from the buffer, {inline * 1e6:.2f} µs generated inline")
+
+
+async def check() -> None:
+    expect = Checks()
+
+    names = generate_names(50_000)
+    expect("50k names generated", len(names) == 50_000)
+    expect("lengths within 6-12", all(6 <= len(name) <= 12 for name in names))
+    expect("charset a-z0-9", set("".join(names)) == set(address_pool.NAME_CHARS))
+
+    bloom = BloomFilter(10_000, 0.01)
+    expect("no false negatives", all(bloom.add(name) or True for name in names[:10_000])
+           and all(name in bloom for name in names[:10_000]))
+    restored = BloomFilter.from_bytes(bloom.to_bytes())
+    expect("snapshot round trip", restored.to_bytes() == bloom.to_bytes() and len(restored) == len(bloom))
+
+    store = UserStore()
+    pool = AddressPool(store, size=20, low_water=5, refill_batch=7)
+    await pool.start()
+    await asyncio.sleep(0.05)
+    expect("buffer filled in the background", len(pool) == 20)
+    issued = pool.take(50)
+    expect("bulk take serves 50 distinct", len(set(issued)) == 50)
+    expect("custom names are recorded", pool.custom("Alice42") == "Alice42@mailto.plus" and "alice42" in pool.issued)
+    await pool.close()
+    reloaded = AddressPool(store)
+    await reloaded.load()
+    expect("filter persisted in the store", all(email.split("@")[0] in reloaded.issued for email in issued))
+    expect("reloaded pool skips issued names", not any(reloaded.reserve(email.split("@")[0]) for email in issued))
+
+    dirty = set()
+
+    async def warm(email: str) -> bool:
+        return email not in dirty
+
+    pool = AddressPool(size=10, low_water=0, warm=warm)
+    original = pool.generate
+
+    def generate(count: int) -> list:
+        batch = original(count)
+        dirty.add(batch[0])
+        return batch
+
+    pool.generate = generate
+    await pool.refill()
+    expect("warm check drops addresses that hold mail", pool.rejected > 0 and not dirty & set(pool._ready))
+
+    expect.finish()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--issued", type=int, default=2_000_000)
+    parser.add_argument("--capacity", type=int, default=address_pool.BLOOM_CAPACITY)
+    parser.add_argument("--batch", type=int, default=address_pool.REFILL_BATCH)
+    parser.add_argument("--min-length", type=int, default=address_pool.MIN_NAME_LENGTH)
+    parser.add_argument("--skip-legacy", action="store_true")
+    parser.add_argument("--check", action="store_true", help="Run correctness checks instead")
+    args = parser.parse_args()
+    if args.check:
+        asyncio.run(check())
+        return
+
+    address_pool.MIN_NAME_LENGTH = args.min_length
+    address_pool._LENGTHS = address_pool.MAX_NAME_LENGTH - args.min_length + 1
+    print(f"{args.issued:,} addresses issued, names {args.min_length}-12 characters")
+    if not args.skip_legacy:
+        run_legacy(args.issued, args.min_length)
+    pool = run_pool(args.issued, args.capacity, args.batch)
+    report_filter(pool, args.issued)
+    asyncio.run(report_take(10_000))
+
+
+if __name__ == "__main__":
+    main()
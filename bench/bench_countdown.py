@@ -0,0 +1,75 @@
+"""
+Load test: scheduler overhead and edit volume vs. number of active countdowns.
+
+Compares the old design (one 1-second job per chat, recomputing the TOTP and
+editing every second) with the shared CountdownTicker, over `--seconds` of
+simulated time against a stub bot that only counts edits.
+
+    python bench/bench_countdown.py --countdowns 100 1000 5000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import pyotp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from countdown import CountdownTicker  # noqa: E402
+
+
+def render(code: str, time_remaining: int) -> str:
+    return f"OTP CODE >> <code>'{code}'</code>\nExpires in: {time_remaining:02d} seconds"
+
+
+async def old_design(secrets: list, seconds: int, start: int) -> tuple:
+    edits = 0
+
+    async def edit(*_):
+        nonlocal edits
+        edits += 1
+
+    started = time.process_time()
+    for now in range(start, start + seconds):
+        for secret in secrets:
+            code = pyotp.TOTP(secret).at(now)
+            await edit(render(code, 30 - now % 30))
+    return time.process_time() - started, edits
+
+
+async def new_design(secrets: list, seconds: int, start: int, step: int) -> tuple:
+    ticker = CountdownTicker(render, edit_step=step)
+
+    async def edit(*_):
+        pass
+
+    for chat_id, secret in enumerate(secrets):
+        ticker.start(chat_id, chat_id, secret)
+    started = time.process_time()
+    for now in range(start, start + seconds):
+        await ticker.tick(edit, now=now)
+    return time.process_time() - started, ticker.edits_sent
+
+
+async def run(counts: list, seconds: int, step: int) -> None:
+    start = int(time.time())
+    print(f"{seconds}s simulated, edit step {step}s")
+    print(f"{'countdowns':>10} | {'old jobs':>8} {'old CPU s':>9} {'old edits/s':>11} | "
+          f"{'new jobs':>8} {'new CPU s':>9} {'new edits/s':>11}")
+    for n in counts:
+        secrets = [pyotp.random_base32() for _ in range(n)]
+        old_cpu, old_edits = await old_design(secrets, seconds, start)
+        new_cpu, new_edits = await new_design(secrets, seconds, start, step)
+        print(f"{n:>10} | {n:>8} {old_cpu:>9.3f} {old_edits / seconds:>11.1f} | "
+              f"{1:>8} {new_cpu:>9.3f} {new_edits / seconds:>11.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--countdowns", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--seconds", type=int, default=60)
+    parser.add_argument("--step", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args.countdowns, args.seconds, args.step))
@@ -0,0 +1,123 @@
+"""
+Benchmark: time from mail arrival to the Telegram notification being queued,
+driving the bot's real auto_fetch loop against the local tempmail.plus fake.
+
+Three pipelines are compared on the same workload (`--mails` mails delivered
+at random times into `--mailboxes` watched addresses over `--duration`
+seconds):
+
+- fixed loop: every address listed every 3 seconds, no conditional requests
+  (the original polling loop)
+- adaptive: per-mailbox adaptive schedule, full listing on every poll
+- adaptive + conditional: the current pipeline; unchanged inboxes are answered
+  with 304 Not Modified and nothing is read or parsed
+
+Reports median / p95 latency, upstream requests, bytes sent by the upstream
+and the CPU time of the process (bot and fake together).
+
+    python bench/bench_delivery.py --mailboxes 300 --mails 100 --duration 30
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import re
+import statistics
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.dirname(BENCH_DIR), BENCH_DIR]
+os.environ["USER_DB_PATH"] = ""
+
+import bot  # noqa: E402
+from fake_tempmail import FakeTempMail  # noqa: E402
+from mail_client import TempMailClient  # noqa: E402
+from mail_cache import MailCache  # noqa: E402
+from poll_scheduler import PollScheduler  # noqa: E402
+from storage import UserStore  # noqa: E402
+
+SUBJECT_RE = re.compile(r"\*Subject:\* (m\d+)")
+
+
+class StubQueue:
+    """Stands in for the outbound SendQueue and timestamps every notification."""
+
+    def __init__(self):
+        self.notified = {}
+
+    def send_message(self, chat_id, text, **kwargs):
+        match = SUBJECT_RE.search(text)
+        if match:
+            self.notified.setdefault(match.group(1), time.perf_counter())
+
+    def __len__(self):
+        return 0
+
+
+async def run(args, label: str, scheduler: PollScheduler, etags: bool) -> None:
+    fake = FakeTempMail(latency=args.latency, etags=etags)
+    url = await fake.start()
+    bot.mail_client = TempMailClient(base_url=url)
+    bot.user_store = UserStore()
+    bot.poll_scheduler = scheduler
+    bot.mailbox_subscribers = {}
+    bot.mail_cache = MailCache()
+    bot.outbound = StubQueue()
+    emails = [f"deliver{i}@mailto.plus" for i in range(args.mailboxes)]
+    for chat_id, email in enumerate(emails):
+        bot.add_mailbox(chat_id, bot.initialize_user_data(chat_id), email)
+
+    rng = random.Random(11)
+    schedule = sorted((rng.uniform(0, args.duration), f"m{n}", rng.choice(emails)) for n in range(args.mails))
+    task = asyncio.create_task(bot.auto_fetch(None))
+    cpu_started = time.process_time()
+    started = time.perf_counter()
+    delivered = {}
+    for at, subject, email in schedule:
+        await asyncio.sleep(max(0.0, started + at - time.perf_counter()))
+        fake.deliver(email, subject=subject, text=f"Your verification code is {rng.randrange(10**5, 10**6)}")
+        delivered[subject] = time.perf_counter()
+    deadline = time.perf_counter() + args.drain
+    while len(bot.outbound.notified) < len(delivered) and time.perf_counter() < deadline:
+        await asyncio.sleep(0.1)
+    elapsed = time.perf_counter() - started
+    cpu = time.process_time() - cpu_started
+
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    await bot.mail_client.close()
+    await fake.stop()
+
+    latencies = sorted(bot.outbound.notified[s] - t for s, t in delivered.items() if s in bot.outbound.notified)
+    p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)] if latencies else float("nan")
+    print(
+        f"{label:<24} notified {len(latencies)}/{len(delivered)}  "
+        f"latency p50 {statistics.median(latencies) if latencies else float('nan'):5.2f}s p95 {p95:5.2f}s  "
+        f"requests/s {fake.requests / elapsed:6.1f} ({fake.not_modified} x 304)  "
+        f"KB/s {fake.bytes_sent / elapsed / 1024:7.1f}  CPU {cpu:.2f}s"
+    )
+
+
+async def main_async(args) -> None:
+    logging.disable(logging.WARNING)
+    print(f"{args.mailboxes} mailboxes, {args.mails} mails over {args.duration:.0f}s, "
+          f"upstream latency {args.latency * 1000:.0f} ms")
+    await run(args, "fixed 3s loop", PollScheduler(fresh_interval=3, idle_interval=3, max_interval=3), etags=False)
+    await run(args, "adaptive", PollScheduler(), etags=False)
+    await run(args, "adaptive + conditional", PollScheduler(), etags=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mailboxes", type=int, default=300)
+    parser.add_argument("--mails", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds over which mails arrive")
+    parser.add_argument("--drain", type=float, default=65.0, help="Max seconds to wait for late notifications")
+    parser.add_argument("--latency", type=float, default=0.02, help="Fake upstream latency (seconds)")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark: HTML-to-text throughput and peak memory on large mail bodies.
+
+Compares the old `re.sub('<[^>]*>', ' ', html)` stripping with html_text,
+both converting the full body and stopping early at the bot's text limit.
+
+    python bench/bench_html.py --kb 100 300 800
+"""
+import argparse
+import os
+import re
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from html_text import html_to_text  # noqa: E402
+
+BLOCK = """
+<table class="row" style="width:100%"><tr><td class="col" style="padding:12px">
+  <a href="https://shop.example/p/{i}"><img src="https://cdn.example/{i}.png" alt="Product {i}" width="120"></a>
+  <p style="font-family:Helvetica,Arial;font-size:14px">Deal&nbsp;#{i}: save 20% on selected items &amp; enjoy free shipping.</p>
+  <div style="display:none">tracking-{i}-preheader</div>
+</td></tr></table>
+"""
+
+
+def marketing_html(kb: int) -> str:
+    head = ("<html><head><title>Sale</title><style>" + ".c{color:#333;margin:0}" * 400 + "</style>"
+            "<script>var t=" + "1," * 2000 + "0;</script></head><body>"
+            "<p>Your verification code is <b>482913</b>.</p>")
+    parts = [head]
+    size = len(head)
+    i = 0
+    while size < kb * 1024:
+        block = BLOCK.format(i=i)
+        parts.append(block)
+        size += len(block)
+        i += 1
+    parts.append("</body></html>")
+    return "".join(parts)
+
+
+def measure(convert, html: str, repeat: int) -> tuple:
+    tracemalloc.start()
+    convert(html)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        out = convert(html)
+    elapsed = (time.perf_counter() - started) / repeat
+    return len(html) / elapsed / 1e6, peak, len(out)
+
+
+def main(sizes: list, repeat: int) -> None:
+    converters = (
+        ("old re.sub", lambda html: re.sub('<[^>]*>', ' ', html)),
+        ("html_text full", lambda html: html_to_text(html)),
+        ("html_text limit=5000", lambda html: html_to_text(html, limit=5000)),
+        ("html_text limit=500", lambda html: html_to_text(html, limit=500)),
+    )
+    print(f"{'body':>7} {'converter':>26} {'MB/s':>8} {'ms/mail':>8} {'peak KB':>9} {'out chars':>10}")
+    for kb in sizes:
+        html = marketing_html(kb)
+        for name, convert in converters:
+            throughput, peak, out = measure(convert, html, repeat)
+            print(f"{kb:>5}KB {name:>26} {throughput:8.1f} {len(html) / throughput / 1e3:8.2f} "
+                  f"{peak / 1024:9.0f} {out:10}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--kb", type=int, nargs="+", default=[100, 300, 800])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main(args.kb, args.repeat)
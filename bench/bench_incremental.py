@@ -0,0 +1,64 @@
+"""
+Benchmark: bytes transferred and client time per poll of a busy inbox,
+full-list polling (`first_id=0`, bodies inline) vs. cursor-based incremental
+polling with a separate body fetch for new mails only.
+
+    python bench/bench_incremental.py --mails 50 --body-kb 20 --polls 100
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mail_client import TempMailClient  # noqa: E402
+from fake_tempmail import FakeTempMail  # noqa: E402
+
+EMAIL = "busy@mailto.plus"
+
+
+async def run(mails: int, body_kb: int, polls: int) -> None:
+    fake = FakeTempMail()
+    for i in range(mails):
+        fake.deliver(EMAIL, subject=f"Newsletter {i}", text="x" * (body_kb * 1024))
+    base_url = await fake.start()
+
+    # Old behaviour: the whole list with full bodies, parsed on every poll
+    full_payload = json.dumps({"result": True, "mail_list": fake.inboxes[EMAIL]}).encode()
+    started = time.perf_counter()
+    for _ in range(polls):
+        json.loads(full_payload)
+    full_parse = (time.perf_counter() - started) / polls
+
+    async with TempMailClient(base_url=base_url) as client:
+        fake.bytes_sent = 0
+        cursor = 0
+        started = time.perf_counter()
+        for i in range(polls):
+            if i == polls // 2:
+                fake.deliver(EMAIL, subject="Your code", text="Your code is 123456")
+            inbox = await client.fetch_inbox(EMAIL, cursor)
+            new = [mail for mail in inbox.get("mail_list", []) if mail.mail_id > cursor]
+            if new:
+                cursor = new[0].mail_id
+                await asyncio.gather(*(client.fetch_mail(EMAIL, mail.mail_id) for mail in new))
+        incremental = (time.perf_counter() - started) / polls
+        incremental_bytes = fake.bytes_sent / polls
+
+    await fake.stop()
+    print(f"inbox: {mails} mails x {body_kb} KB, {polls} polls (1 new mail mid-run)")
+    print(f"  full list:   {len(full_payload) / 1024:10.1f} KB/poll, JSON parse {full_parse * 1e3:.3f} ms/poll")
+    print(f"  incremental: {incremental_bytes / 1024:10.1f} KB/poll, round trip {incremental * 1e3:.3f} ms/poll "
+          f"(first poll pulls the list once)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mails", type=int, default=50)
+    parser.add_argument("--body-kb", type=int, default=20)
+    parser.add_argument("--polls", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(run(args.mails, args.body_kb, args.polls))
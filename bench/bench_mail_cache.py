@@ -0,0 +1,110 @@
+"""
+Benchmark: memory use and operation cost of the MailCache.
+
+Fills the cache with `--mails` realistic mails (short OTP notices and longer
+newsletter-style texts, spread over `--chats` chats) and reports the memory
+actually allocated (tracemalloc) per 10k cached mails, next to the cache's own
+estimate and to keeping the same mails as plain uncompressed dicts. Then
+measures put/list/get latency and checks that the memory budget holds.
+
+    python bench/bench_mail_cache.py --mails 10000 --chats 1000
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mail_cache import MailCache  # noqa: E402
+
+WORDS = ("account", "verify", "your", "code", "security", "please", "update", "offer", "new", "team", "login",
+         "device", "password", "welcome", "receipt", "order", "shipping", "the", "and", "for", "this")
+
+
+def make_mail(i: int) -> tuple:
+    if i % 3 == 0:
+        body = f"Your verification code is {random.randrange(10**5, 10**6)}. It expires in 10 minutes.\n" * 3
+        return "Google", f"{random.randrange(10**5, 10**6)} is your verification code", "482913", body
+    words = random.choices(WORDS, k=random.randint(150, 800))
+    body = "\n".join(" ".join(words[j:j + 12]) for j in range(0, len(words), 12))
+    return "Newsletter", f"Weekly update #{i}", None, body
+
+
+def fill(store, mails: list, chats: int) -> None:
+    for i, (sender, subject, otp, body) in enumerate(mails):
+        store(i % chats, f"user{i % chats}@mailto.plus", 1000 + i, sender, subject, otp, body)
+
+
+def measure(mails: list, chats: int, label: str, factory) -> None:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    holder = factory()
+    fill(holder[1], mails, chats)
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    per_10k = used * 10000 / len(mails)
+    extra = holder[2]() if holder[2] else ""
+    print(f"{label:<26} {per_10k / 1024 / 1024:7.2f} MiB per 10k mails {extra}")
+
+
+def cache_factory(budget: int):
+    def factory():
+        cache = MailCache(per_chat=10**6, memory_budget=budget)
+        return cache, cache.put, lambda: f"(estimate {cache.memory_bytes * 10000 / max(1, len(cache)) / 1024 / 1024:.2f} MiB)"
+    return factory
+
+
+def dict_factory():
+    store = {}
+
+    def put(chat_id, email, mail_id, sender, subject, otp, body):
+        store.setdefault(chat_id, []).append({
+            "email": email, "mail_id": mail_id, "from": sender, "subject": subject, "otp": otp,
+            "text": (body + " ")[:-1], "received": time.time(),  # Own copy, like a parsed response
+        })
+    return store, put, None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mails", type=int, default=10000)
+    parser.add_argument("--chats", type=int, default=1000)
+    args = parser.parse_args()
+
+    random.seed(7)
+    mails = [make_mail(i) for i in range(args.mails)]
+    raw = sum(len(body) for _, _, _, body in mails) / len(mails)
+    print(f"{args.mails} mails over {args.chats} chats, average body {raw:.0f} chars")
+
+    measure(mails, args.chats, "plain dicts (uncompressed)", dict_factory)
+    measure(mails, args.chats, "MailCache (zlib bodies)", cache_factory(10**12))
+
+    cache = MailCache(per_chat=10**6, memory_budget=10**12)
+    started = time.perf_counter()
+    fill(cache.put, mails, args.chats)
+    put_us = (time.perf_counter() - started) / len(mails) * 1e6
+    started = time.perf_counter()
+    for chat_id in range(args.chats):
+        cache.list(chat_id)
+    list_us = (time.perf_counter() - started) / args.chats * 1e6
+    started = time.perf_counter()
+    for i in range(len(mails)):
+        cache.get(i % args.chats, 1000 + i).body
+    get_us = (time.perf_counter() - started) / len(mails) * 1e6
+    print(f"put {put_us:.1f} us, list (one chat) {list_us:.1f} us, get + decompress {get_us:.1f} us")
+
+    budget = 2 * 1024 * 1024
+    bounded = MailCache(memory_budget=budget)
+    fill(bounded.put, mails, args.chats)
+    print(f"budget {budget / 1024 / 1024:.0f} MiB: kept {len(bounded)} mails, estimate "
+          f"{bounded.memory_bytes / 1024 / 1024:.2f} MiB, {bounded.evictions} evicted")
+
+
+if __name__ == "__main__":
+    main()
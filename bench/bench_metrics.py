@@ -0,0 +1,40 @@
+"""
+Microbenchmark: cost of recording a metric on the hot path.
+
+    python bench/bench_metrics.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import Counter, Histogram, Registry  # noqa: E402
+
+registry = Registry()
+counter = Counter("bench_total", "Benchmark counter.", registry=registry)
+histogram = Histogram("bench_seconds", "Benchmark histogram.", registry=registry)
+labelled = Histogram("bench_labelled_seconds", "Benchmark labelled histogram.", ("endpoint",), registry=registry)
+child = labelled.labels("list")
+
+def _timed():
+    with histogram.time():
+        pass
+
+
+CASES = {
+    "Counter.inc()": lambda: counter.inc(),
+    "Histogram.observe()": lambda: histogram.observe(0.042),
+    "Histogram.labels(x).observe()": lambda: labelled.labels("list").observe(0.042),
+    "bound child .observe()": lambda: child.observe(0.042),
+    "Histogram.time() block": lambda: _timed(),
+}
+
+if __name__ == "__main__":
+    number = 200000
+    baseline = min(timeit.repeat(lambda: None, number=number, repeat=5)) / number
+    for name, op in CASES.items():
+        per_op = min(timeit.repeat(op, number=number, repeat=5)) / number - baseline
+        print(f"{name:>32}: {per_op * 1e9:7.0f} ns/op")
+    print(f"render() of {len(registry.render().splitlines())} lines: "
+          f"{min(timeit.repeat(registry.render, number=1000, repeat=3)):.3f} ms/scrape")
@@ -0,0 +1,144 @@
+"""
+OTP extraction benchmark and accuracy suite.
+
+Runs the labelled corpus below through the old inline regex and through
+otp_extract, reporting precision/recall and throughput (mails/sec), plus
+throughput on large marketing-style bodies.
+
+    python bench/bench_otp.py            # report
+    python bench/bench_otp.py --check    # exit 1 if any corpus case fails
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from otp_extract import extract_otp  # noqa: E402
+
+# (sender, subject, body, expected code or None)
+CORPUS = [
+    ("Google <no-reply@accounts.google.com>", "G-482913 is your Google verification code",
+     "Use this code to verify your account.", "482913"),
+    ("Facebook <registration@facebookmail.com>", "FB-73519 is your Facebook confirmation code",
+     "Hi, confirm your account with the code below.", "73519"),
+    ("OpenAI <noreply@tm.openai.com>", "Your ChatGPT code is 590321",
+     "Enter this temporary verification code to continue: 590321", "590321"),
+    ("Telegram <noreply@telegram.org>", "Telegram login code",
+     "Your login code: 84712. Do not give this code to anyone.", "84712"),
+    ("Discord <noreply@discord.com>", "Verify your email",
+     "Your verification code: 118204\nThis code expires in 10 minutes.", "118204"),
+    ("Microsoft account team <account-security-noreply@accountprotection.microsoft.com>",
+     "Microsoft account security code", "Please use the following security code: 9031", "9031"),
+    ("Instagram <security@mail.instagram.com>", "381 044 is your Instagram code",
+     "Someone tried to sign up with this email.", "381044"),
+    ("Uber <uber@uber.com>", "Your Uber code", "Your Uber code: 4417. Never share this code.", "4417"),
+    ("Acme <hello@acme.io>", "Your one-time password",
+     "Hello,\n\nYour OTP is 662018. It is valid for 5 minutes.\n\nAcme Inc, 2024", "662018"),
+    ("Shop <noreply@shop.example>", "Sign in to Shop",
+     "Enter code 774201 to sign in. Order #88231 shipped on 2023-11-02.", "774201"),
+    ("Bank <alerts@bank.example>", "Verification required",
+     "Use 30918 as your verification code. Call 18005550199 if this was not you.", "30918"),
+    ("Game <no-reply@game.example>", "Confirm your email",
+     "Your confirmation code is 123-456", "123456"),
+    ("Service <noreply@service.example>", "Login attempt",
+     "<p>Your PIN: <b>5521</b></p>", "5521"),
+    ("News <news@daily.example>", "Weekly digest 2024",
+     "Top stories for 2024. Read more at example.com. 1200 people attended.", None),
+    ("Store <orders@store.example>", "Order 558213 confirmed",
+     "Thanks for your order #558213. Total: $1249. Ships to ZIP 94107.", None),
+    ("Events <events@venue.example>", "Tickets for Saturday",
+     "Doors open at 19:30. Venue: 1600 Amphitheatre Pkwy, Suite 2100.", None),
+    ("Support <help@support.example>", "Your ticket was updated",
+     "Ticket ID 448812 was updated. Reference number 99231.", None),
+    ("Newsletter <hi@letters.example>", "Welcome!",
+     "Thanks for subscribing. Copyright 2019-2024. Unsubscribe anytime.", None),
+    ("Bills <bill@power.example>", "Your invoice",
+     "Invoice 20231104 amount due 4520 by 2024-01-01.", None),
+    ("Acme <no-reply@acme.example>", "New sign-in to your account",
+     "Your account had a new sign-in.\n\nCopyright 2024 Acme, 1600 Amphitheatre Pkwy", None),
+    ("Cloud <security@cloud.example>", "Sign-in alert",
+     "New sign-in from Chrome on Windows.\nCloud Inc., 2100 Main St, Springfield, IL 62701", None),
+    ("Portal <no-reply@portal.example>", "Portal: 482913",
+     "Use the code in the subject line to continue. Ticket 448812.", "482913"),
+    ("Steam <noreply@steamcommunity.com>", "Your Steam account: Access from new web or mobile device",
+     "Here is the Steam Guard code you need to login to account: 7X3KD", "7X3KD"),
+]
+
+
+def old_extract_otp(subject, content):
+    """The original implementation, for comparison."""
+    otp_pattern = re.compile(
+        r'(?:OTP|CODE|PIN|verification|one[\s_-]time).*?(\d{4,8})'
+        r'|(\b\d{4,8}\b)'
+    , re.IGNORECASE | re.DOTALL)
+    match = otp_pattern.search(subject)
+    if match:
+        return match.group(1) or match.group(2)
+    match = otp_pattern.search(content)
+    if match:
+        return match.group(1) or match.group(2)
+    return None
+
+
+def accuracy(extract) -> tuple:
+    tp = fp = fn = 0
+    failures = []
+    for sender, subject, body, expected in CORPUS:
+        got = extract(sender, subject, body)
+        if got == expected:
+            if expected is not None:
+                tp += 1
+            continue
+        failures.append((subject, expected, got))
+        if got is not None:
+            fp += 1
+        if expected is not None:
+            fn += 1
+    precision = tp / (tp + fp) if tp + fp else 1.0
+    recall = tp / (tp + fn) if tp + fn else 1.0
+    return precision, recall, failures
+
+
+def throughput(extract, mails: list, min_seconds: float = 0.5) -> float:
+    count = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < min_seconds:
+        for sender, subject, body in mails:
+            extract(sender, subject, body)
+        count += len(mails)
+    return count / (time.perf_counter() - started)
+
+
+def large_mail(kb: int) -> tuple:
+    filler = ("Discover our latest deals on shoes, bags and accessories. Free shipping over 50. " * 20 + "\n")
+    body = (filler * (kb * 1024 // len(filler) + 1))[:kb * 1024]
+    return ("Deals <promo@shop.example>", "Spring sale starts now", body + " Unsubscribe.")
+
+
+def main(check: bool) -> int:
+    old = lambda sender, subject, body: old_extract_otp(subject, body)  # noqa: E731
+    new = lambda sender, subject, body: extract_otp(subject, body, sender)  # noqa: E731
+
+    corpus_mails = [(sender, subject, body) for sender, subject, body, _ in CORPUS]
+    big = [large_mail(200)]
+    print(f"corpus: {len(CORPUS)} mails ({sum(1 for c in CORPUS if c[3])} with OTP)")
+    print(f"{'':>12} {'precision':>9} {'recall':>7} {'corpus mails/s':>15} {'200KB mails/s':>14}")
+    results = {}
+    for name, extract in (("old regex", old), ("otp_extract", new)):
+        precision, recall, failures = accuracy(extract)
+        results[name] = failures
+        print(f"{name:>12} {precision:9.2f} {recall:7.2f} {throughput(extract, corpus_mails):15.0f} "
+              f"{throughput(extract, big):14.1f}")
+
+    for subject, expected, got in results["otp_extract"]:
+        print(f"  FAIL {subject!r}: expected {expected!r}, got {got!r}")
+    return 1 if check and results["otp_extract"] else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check", action="store_true", help="Exit non-zero if any corpus case fails")
+    sys.exit(main(parser.parse_args().check))
@@ -0,0 +1,99 @@
+"""
+Benchmark: event-loop lag while a burst of new mail is parsed (HTML
+conversion, sender resolution, OTP extraction), inline on the loop vs. on a
+thread pool vs. on a process pool.
+
+A probe task sleeps 5 ms in a loop and records how late it wakes up, standing
+in for Telegram handlers and countdown edits. The burst is `--heavy` large
+HTML mails plus `--light` short plaintext OTP mails (always parsed inline).
+Pools are started and warmed up before the burst.
+
+    python bench/bench_parse_pool.py --heavy 100 --light 200 --html-kb 100
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import Mail  # noqa: E402
+from parse_pool import ParsePool, WORKERS  # noqa: E402
+from senders import SenderIndex  # noqa: E402
+
+PROBE_INTERVAL = 0.005
+
+
+def heavy_html(i: int, size_kb: int) -> str:
+    filler = "<tr><td class='c'><span style='color:#333'>&nbsp;</span></td></tr>"
+    rows = filler * max(1, size_kb * 1024 // len(filler))
+    return (
+        "<html><head><style>" + ".c{color:red}" * 200 + "</style></head><body>"
+        f"<table>{rows}</table>"
+        f"<p>Hello, use code <b>{100000 + i}</b> to verify your account.</p>"
+        + "<p>" + "Newsletter text. " * 500 + "</p></body></html>"
+    )
+
+
+def make_jobs(heavy: int, light: int, size_kb: int) -> list:
+    jobs = []
+    for i in range(max(heavy, light)):
+        if i < heavy:
+            jobs.append((f"h{i}@mailto.plus", Mail(1000 + i, "Shop <news@shop.example>", f"Offer {i}", "", heavy_html(i, size_kb))))
+        if i < light:
+            jobs.append((f"l{i}@mailto.plus", Mail(5000 + i, "Google <no-reply@accounts.google.com>",
+                                                   "Your code", f"G-{200000 + i} is your Google verification code.")))
+    return jobs
+
+
+async def probe(lags: list, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(time.perf_counter() - started - PROBE_INTERVAL)
+
+
+async def run(kind: str, jobs: list, workers: int) -> None:
+    pool = ParsePool(SenderIndex(), kind=kind, workers=workers)
+    pool.start()
+    await pool.parse(jobs[:1] * workers)  # Warm up (spawns the workers)
+
+    lags, stop = [], asyncio.Event()
+    prober = asyncio.create_task(probe(lags, stop))
+    await asyncio.sleep(0.05)
+    started = time.perf_counter()
+    parsed = await pool.parse(jobs)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await prober
+    pool.close()
+
+    otps = sum(1 for mail in parsed if mail.otp)
+    lags.sort()
+    p99 = lags[max(0, int(len(lags) * 0.99) - 1)]
+    print(f"{kind:<8} burst {elapsed:6.2f}s  loop lag max {lags[-1] * 1000:7.1f} ms  p99 {p99 * 1000:6.1f} ms  "
+          f"median {statistics.median(lags) * 1000:5.1f} ms  ({otps}/{len(parsed)} OTPs, {pool.offloaded} offloaded)")
+
+
+async def main_async(args) -> None:
+    jobs = make_jobs(args.heavy, args.light, args.html_kb)
+    print(f"{args.heavy} HTML mails of ~{args.html_kb} KB + {args.light} plaintext mails, "
+          f"{args.workers} pool workers, {os.cpu_count()} CPUs")
+    for kind in args.kinds:
+        await run(kind, jobs, args.workers)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--heavy", type=int, default=100)
+    parser.add_argument("--light", type=int, default=200)
+    parser.add_argument("--html-kb", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--kinds", nargs="+", default=["inline", "thread", "process"])
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
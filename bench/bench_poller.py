@@ -0,0 +1,67 @@
+"""
+Benchmark: time for one full inbox sweep as the number of users grows.
+
+Compares the old serial blocking loop (one urllib request per user, run in a
+worker thread so the fake server can keep answering) against the pooled
+concurrent TempMailClient.
+
+    python bench/bench_poller.py --users 10 100 500 --latency 0.05
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mail_client import TempMailClient  # noqa: E402
+from fake_tempmail import FakeTempMail  # noqa: E402
+
+
+def serial_sweep(base_url: str, emails: list) -> None:
+    for email in emails:
+        url = f"{base_url}/api/mails?email={email}&first_id=0&epin="
+        with urllib.request.urlopen(url, timeout=10) as res:
+            res.read()
+
+
+async def run(user_counts: list, latency: float, concurrency: int, serial_limit: int) -> None:
+    fake = FakeTempMail(latency=latency)
+    base_url = await fake.start()
+    print(f"fake tempmail.plus at {base_url}, latency={latency * 1000:.0f}ms, concurrency={concurrency}")
+    print(f"{'users':>7} {'serial (s)':>11} {'concurrent (s)':>15} {'speedup':>8}")
+
+    async with TempMailClient(base_url=base_url, concurrency=concurrency) as client:
+        for n in user_counts:
+            emails = [f"user{i}@mailto.plus" for i in range(n)]
+            for email in emails[::10]:
+                fake.deliver(email)
+
+            serial = None
+            if n <= serial_limit:
+                started = time.perf_counter()
+                await asyncio.to_thread(serial_sweep, base_url, emails)
+                serial = time.perf_counter() - started
+
+            started = time.perf_counter()
+            results = await client.fetch_many(emails)
+            concurrent = time.perf_counter() - started
+            errors = sum(1 for inbox in results.values() if "error" in inbox)
+
+            serial_txt = f"{serial:11.3f}" if serial is not None else f"{'skipped':>11}"
+            speedup = f"{serial / concurrent:7.1f}x" if serial is not None else f"{'-':>8}"
+            print(f"{n:>7} {serial_txt} {concurrent:15.3f} {speedup}" + (f"  ({errors} errors)" if errors else ""))
+
+    await fake.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, nargs="+", default=[10, 50, 100, 250, 500, 1000])
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated upstream latency (seconds)")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--serial-limit", type=int, default=250, help="Skip the serial baseline above this many users")
+    args = parser.parse_args()
+    asyncio.run(run(args.users, args.latency, args.concurrency, args.serial_limit))
@@ -0,0 +1,206 @@
+"""
+Simulation: new-mail detection under upstream deletions, expiry, reordering
+and late-listed mails, legacy cursor vs. bounded seen IDs.
+
+One mailbox is polled for `--rounds` rounds. Each round the simulated
+upstream may deliver mails, delete a random mail or the newest one (the
+legacy cursor), expire mails beyond `--inbox-limit`, list a mail a few
+rounds after later ones (late), or return the list in random order.
+
+- legacy: stop scanning at the single `last_seen` ID (the original loop)
+- seen: `new_mails_since` with the Mailbox high-water mark and bounded seen
+  IDs, listing from `Mailbox.cursor` (the lowest remembered ID)
+- seen-hwm: the same detection, but listing from the high-water mark
+
+All run against an upstream that ignores `first_id` (lists the whole inbox)
+and one that honours it. Reports re-announcements, missed mails (every mail
+that sat in the inbox, whether listed or filtered out by the cursor) and
+entries scanned per poll. Listing from the high-water mark scans least but
+never sees mails listed late below it.
+
+    python bench/bench_seen_ids.py --rounds 5000
+    python bench/bench_seen_ids.py --check
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.dirname(BENCH_DIR), BENCH_DIR]
+
+from checks import Checks  # noqa: E402
+from mail_client import new_mails_since  # noqa: E402
+from models import SEEN_LIMIT, MailHeader, Mailbox  # noqa: E402
+
+
+class Upstream:
+    """A simulated inbox; IDs increase with delivery, but late mails are listed after newer ones."""
+
+    def __init__(self, rng: random.Random, inbox_limit: int, honour_first_id: bool):
+        self.rng = rng
+        self.inbox_limit = inbox_limit
+        self.honour_first_id = honour_first_id
+        self.next_id = 1000
+        self.inbox = []        # Listed IDs
+        self.held = []         # (rounds left, ID) not listed yet
+        self.shuffle = False
+
+    def step(self, args) -> None:
+        rng = self.rng
+        if rng.random() < args.deliver:
+            for _ in range(rng.randint(1, 3)):
+                self.next_id += 1
+                if rng.random() < args.late:
+                    self.held.append([rng.randint(1, 3), self.next_id])
+                else:
+                    self.inbox.append(self.next_id)
+        for entry in self.held:
+            entry[0] -= 1
+        self.inbox += [mail_id for left, mail_id in self.held if left <= 0]
+        self.held = [entry for entry in self.held if entry[0] > 0]
+        if self.inbox and rng.random() < args.delete:
+            self.inbox.remove(rng.choice(self.inbox))
+        if self.inbox and rng.random() < args.delete_newest:
+            self.inbox.remove(max(self.inbox))
+        self.inbox.sort()
+        del self.inbox[:-self.inbox_limit]
+        self.shuffle = rng.random() < args.reorder
+
+    def listing(self, first_id) -> list:
+        ids = sorted(self.inbox, reverse=True)
+        if self.honour_first_id and first_id:
+            ids = [mail_id for mail_id in ids if mail_id > first_id]
+        if self.shuffle:
+            self.rng.shuffle(ids)
+        return [MailHeader(mail_id, "", "") for mail_id in ids]
+
+
+def legacy_poll(state: dict, mail_list: list) -> list:
+    new_mails = []
+    for mail in mail_list:
+        if mail.mail_id != state["last_seen"]:
+            new_mails.append(mail)
+        else:
+            break
+    new_mails.reverse()
+    if new_mails:
+        state["last_seen"] = mail_list[0].mail_id
+    return new_mails
+
+
+def seen_poll(mailbox: Mailbox, mail_list: list) -> list:
+    new_mails = new_mails_since(mail_list, mailbox)
+    for mail in new_mails:
+        mailbox.mark(mail.mail_id)
+    return new_mails
+
+
+def simulate(args, design: str, honour_first_id: bool, seed: int) -> dict:
+    upstream = Upstream(random.Random(seed), args.inbox_limit, honour_first_id)
+    legacy, mailbox = {"last_seen": None}, Mailbox()
+    listed, announced = set(), {}
+    scanned = 0
+    elapsed = 0.0
+    for _ in range(args.rounds):
+        upstream.step(args)
+        if design == "legacy":
+            cursor = legacy["last_seen"]
+        else:
+            cursor = mailbox.last_seen if design == "seen-hwm" else mailbox.cursor
+        mail_list = upstream.listing(cursor)
+        # Missed counts every mail that sat in the inbox, listed or filtered out by the cursor
+        listed.update(upstream.inbox)
+        scanned += len(mail_list)
+        started = time.perf_counter()
+        new_mails = legacy_poll(legacy, mail_list) if design == "legacy" else seen_poll(mailbox, mail_list)
+        elapsed += time.perf_counter() - started
+        for mail in new_mails:
+            announced[mail.mail_id] = announced.get(mail.mail_id, 0) + 1
+    return {
+        "delivered": upstream.next_id - 1000,
+        "announced": sum(announced.values()),
+        "duplicates": sum(count - 1 for count in announced.values()),
+        "missed": len(listed - set(announced)),
+        "scanned_per_poll": scanned / args.rounds,
+        "us_per_poll": elapsed / args.rounds * 1e6,
+    }
+
+
+def check(args) -> None:
+    expect = Checks()
+
+    def ids(mails: list) -> list:
+        return [mail.mail_id for mail in mails]
+
+    def listing(*mail_ids) -> list:
+        return [MailHeader(mail_id, "", "") for mail_id in mail_ids]
+
+    mailbox = Mailbox()
+    expect("first poll announces everything, oldest first", ids(seen_poll(mailbox, listing(3, 2, 1))) == [1, 2, 3])
+    expect("cursor is the lowest remembered ID", mailbox.cursor == 1)
+    expect("unchanged list announces nothing", seen_poll(mailbox, listing(3, 2, 1)) == [])
+    expect("deleting the newest mail re-announces nothing", seen_poll(mailbox, listing(2, 1)) == [])
+    expect("new mail after a deletion is announced once", ids(seen_poll(mailbox, listing(4, 2, 1))) == [4])
+    expect("reordered list announces only the new mail", ids(seen_poll(mailbox, listing(1, 5, 2, 4))) == [5])
+    expect("late-listed lower ID is announced", ids(seen_poll(mailbox, listing(5, 4, 0, 2))) == [0])
+    expect("duplicate entries are announced once", ids(seen_poll(mailbox, listing(6, 6, 5))) == [6])
+    expect("no floor until the seen IDs overflow", mailbox.floor is None)
+
+    restored = Mailbox.from_json(json.loads(json.dumps(mailbox.to_json())))
+    expect("JSON round trip keeps the seen IDs", seen_poll(restored, listing(6, 5, 4, 2, 1, 0)) == [])
+    legacy = Mailbox.from_json(1001)
+    expect("legacy cursor lists only newer mail", legacy.cursor == 1001)
+    expect("legacy cursor upgrades", legacy.last_seen == 1001 and legacy.recent is None and legacy.to_json() == 1001)
+    expect("legacy cursor announces only newer mail", ids(seen_poll(legacy, listing(1002, 1001, 1000))) == [1002])
+
+    full = Mailbox()
+    for mail_id in list(range(50, 100)) + [10, 60]:
+        full.mark(mail_id)
+    expect(f"keeps the {SEEN_LIMIT} highest IDs", sorted(full.recent) == list(range(100 - SEEN_LIMIT, 100)))
+    expect("floor is the highest dropped ID", full.floor == 100 - SEEN_LIMIT - 1)
+    expect("cursor stays within the remembered window", full.cursor == 100 - SEEN_LIMIT)
+    expect("IDs at or below the floor count as seen", seen_poll(full, listing(100 - SEEN_LIMIT - 1, 20)) == [])
+    expect("round trip", Mailbox.from_json(full.to_json()).to_json() == full.to_json())
+
+    for honour in (False, True):
+        for seed in range(5):
+            result = simulate(args, "seen", honour, seed)
+            expect(f"simulation seed {seed} (first_id {'honoured' if honour else 'ignored'}): "
+                   f"{result['duplicates']} duplicates, {result['missed']} missed",
+                   result["duplicates"] == 0 and result["missed"] == 0)
+
+    expect.finish()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=5000)
+    parser.add_argument("--inbox-limit", type=int, default=20, help="Mails the upstream keeps (older ones expire)")
+    parser.add_argument("--deliver", type=float, default=0.3, help="Chance of new mail per round")
+    parser.add_argument("--delete", type=float, default=0.05, help="Chance a random mail is deleted per round")
+    parser.add_argument("--delete-newest", type=float, default=0.05, help="Chance the newest mail is deleted")
+    parser.add_argument("--late", type=float, default=0.05, help="Chance a mail is listed after newer ones")
+    parser.add_argument("--reorder", type=float, default=0.05, help="Chance a listing comes back out of order")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--check", action="store_true", help="Run correctness checks instead")
+    args = parser.parse_args()
+    if args.check:
+        check(args)
+        return
+
+    print(f"{args.rounds} polls, inbox limit {args.inbox_limit}, {SEEN_LIMIT} seen IDs per mailbox")
+    print(f"{'upstream':<18} {'design':<8} {'delivered':>9} {'announced':>9} {'duplicates':>10} {'missed':>7} "
+          f"{'scanned/poll':>12} {'µs/poll':>8}")
+    for honour in (False, True):
+        for design in ("legacy", "seen", "seen-hwm"):
+            r = simulate(args, design, honour, args.seed)
+            print(f"{'first_id honoured' if honour else 'first_id ignored':<18} {design:<8} {r['delivered']:>9} "
+                  f"{r['announced']:>9} {r['duplicates']:>10} {r['missed']:>7} {r['scanned_per_poll']:>12.1f} "
+                  f"{r['us_per_poll']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
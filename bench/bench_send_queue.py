@@ -0,0 +1,86 @@
+"""
+Benchmark: delivery latency percentiles of the outbound SendQueue under a
+synthetic burst, against a stubbed bot.
+
+The burst mixes OTP notifications, regular notifications and a flood of
+countdown edits to a few messages; the stub bot adds network latency and
+answers a fraction of calls with RetryAfter.
+
+    python bench/bench_send_queue.py --otps 100 --notifications 100 --edits 2000
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram.error import RetryAfter  # noqa: E402
+
+from outbound import PRIORITY_EDIT, PRIORITY_NORMAL, PRIORITY_OTP, SendQueue  # noqa: E402
+
+
+class StubBot:
+    def __init__(self, latency: float, flood_rate: float):
+        self.latency = latency
+        self.flood_rate = flood_rate
+        self.calls = 0
+
+    async def _call(self):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if random.random() < self.flood_rate:
+            raise RetryAfter(1)
+        return True
+
+    async def send_message(self, **kwargs):
+        return await self._call()
+
+    async def edit_message_text(self, **kwargs):
+        return await self._call()
+
+
+async def run(args) -> None:
+    logging.disable(logging.WARNING)
+    random.seed(7)
+    bot = StubBot(args.latency, args.flood_rate)
+    queue = SendQueue(bot, global_rate=args.global_rate)
+
+    futures = []
+    chats = list(range(args.chats))
+    for i in range(args.edits):
+        chat_id = chats[i % args.edit_messages]
+        futures.append(queue.edit_message_text(chat_id, 1, f"countdown {i}"))
+    for i in range(args.notifications):
+        futures.append(queue.send_message(random.choice(chats), f"mail {i}"))
+    for i in range(args.otps):
+        futures.append(queue.send_message(random.choice(chats), f"otp {i}", priority=PRIORITY_OTP))
+
+    started = time.perf_counter()
+    await asyncio.gather(*futures, return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    await queue.close()
+
+    names = {PRIORITY_OTP: "otp", PRIORITY_NORMAL: "notification", PRIORITY_EDIT: "edit"}
+    print(f"burst: {args.otps} OTPs, {args.notifications} notifications, {args.edits} edits "
+          f"to {args.edit_messages} messages across {args.chats} chats")
+    print(f"drained in {elapsed:.2f}s: {bot.calls} API calls, {queue.sent} delivered, "
+          f"{queue.coalesced} edits coalesced, {queue.retries_after} RetryAfter, {queue.failed} failed")
+    for priority, stats in sorted(queue.latency_percentiles().items()):
+        print(f"  {names[priority]:>12}: " + "  ".join(f"p{p}={v * 1000:7.1f}ms" for p, v in stats.items()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--otps", type=int, default=100)
+    parser.add_argument("--notifications", type=int, default=100)
+    parser.add_argument("--edits", type=int, default=2000)
+    parser.add_argument("--edit-messages", type=int, default=50)
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--global-rate", type=float, default=30.0)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--flood-rate", type=float, default=0.02)
+    asyncio.run(run(parser.parse_args()))
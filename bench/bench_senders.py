@@ -0,0 +1,150 @@
+"""
+Benchmark: sender name resolution, the previous regex-per-mail
+format_sender_name vs. the SenderIndex (precompiled parsing, exact-address
+and reversed-label suffix lookup, LRU for repeat senders).
+
+Resolves `--mails` sender strings drawn from `--distinct` senders (a mix of
+known services, their subdomains, and unknown senders in the usual formats),
+once with a cold index and once warm, and runs the correctness cases,
+including a live reload of the config file. `--check` exits non-zero if a
+case fails.
+
+    python bench/bench_senders.py --mails 200000 --distinct 2000 --check
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from senders import KNOWN_SENDERS, SenderIndex  # noqa: E402
+
+# sender string, expected name
+CASES = (
+    ("Google <no-reply@accounts.google.com>", "Google"),                     # subdomain of a known domain
+    ("Google <noreply@google.com>", "Google"),
+    ("Facebook <registration@facebookmail.com>", "Facebook"),                # exact address entries
+    ("Telegram <noreply@telegram.org>", "Telegram"),
+    ("OpenAI <noreply@tm.openai.com>", "Chat Gpt"),
+    ("noreply@tm.openai.com", "Chat Gpt"),                                   # bare address
+    ("<registration@FacebookMail.com>", "Facebook"),                         # case-insensitive
+    ("Security <security@mail.instagram.com>", "Instagram"),
+    ("Acme Support <help@acme.example>", "Acme Support"),                    # unknown: display name
+    ('"Jane Doe" <jane@example.org>', "Jane Doe"),
+    ("someone@example.org", "someone@example.org"),                          # unknown: raw string
+    ("Evil <x@google.com.evil.example>", "Evil"),                            # suffix, not substring
+    ("Phisher <x@notgoogle.com>", "Phisher"),
+    ("Other <support@telegram.org>", "Other"),                               # address entry is exact
+    ("Weird <<broken", "Weird   broken"),
+)
+
+SUBDOMAINS = ("", "accounts.", "mail.", "notify.", "em.eu.")
+FIRST = ("Alice", "Bob", "Shop", "News", "Team", "Support", "Billing", "Bank")
+
+
+def legacy_format_sender_name(sender_string):
+    """The previous bot.format_sender_name."""
+    email_match = re.search(r'<([^@]+@[^>]+)>', sender_string)
+    if email_match:
+        email_address = email_match.group(1)
+        domain = email_address.split('@')[-1]
+        if domain in KNOWN_SENDERS:
+            return KNOWN_SENDERS[domain]
+        match_name = re.match(r'^(.*?) <.*?>$', sender_string)
+        if match_name:
+            clean_name = match_name.group(1).strip()
+            if clean_name:
+                return clean_name
+    return sender_string.replace("<", " ").replace(">", "").strip()
+
+
+def make_senders(distinct: int) -> list:
+    domains = [key for key in KNOWN_SENDERS if "@" not in key]
+    senders = []
+    for i in range(distinct):
+        if i % 2 == 0:
+            domain = random.choice(SUBDOMAINS) + random.choice(domains)
+        else:
+            domain = f"shop{i}.example"
+        name = random.choice(FIRST)
+        style = i % 3
+        address = f"noreply{i % 7}@{domain}"
+        senders.append(f"{name} <{address}>" if style == 0 else f'"{name}" <{address}>' if style == 1 else address)
+    return senders
+
+
+def check() -> list:
+    failures = []
+    index = SenderIndex()
+    for sender, expected in CASES:
+        got = index.resolve(sender)
+        if got != expected:
+            failures.append(f"{sender!r}: expected {expected!r}, got {got!r}")
+
+    clock = [0.0]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "senders.json")
+        index = SenderIndex(config_path=path, reload_interval=1.0, clock=lambda: clock[0])
+        sender = "Acme <otp@login.acme.example>"
+        before = index.resolve(sender)
+        with open(path, "w") as config:
+            json.dump({"acme.example": "Acme Corp", "otp@login.acme.example": "Acme Login"}, config)
+        clock[0] += 2
+        after = index.resolve(sender)
+        with open(path, "w") as config:
+            config.write("{not json")
+        os.utime(path, ns=(time.time_ns() + 10**9,) * 2)
+        clock[0] += 2
+        broken = index.resolve(sender)
+    if (before, after, broken) != ("Acme", "Acme Login", "Acme Login"):
+        failures.append(f"config reload: got {before!r} -> {after!r} -> {broken!r} "
+                        f"(expected 'Acme' -> 'Acme Login', kept on a broken file)")
+    return failures
+
+
+def timed(resolve, stream: list) -> float:
+    started = time.perf_counter()
+    for sender in stream:
+        resolve(sender)
+    return (time.perf_counter() - started) / len(stream) * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mails", type=int, default=200000)
+    parser.add_argument("--distinct", type=int, default=2000)
+    parser.add_argument("--check", action="store_true", help="Exit non-zero if a correctness case fails")
+    args = parser.parse_args()
+
+    random.seed(3)
+    senders = make_senders(args.distinct)
+    stream = [random.choice(senders) for _ in range(args.mails)]
+
+    legacy_known = sum(legacy_format_sender_name(s) in KNOWN_SENDERS.values() for s in senders)
+    index = SenderIndex()
+    index_known = sum(index.resolve(s) in KNOWN_SENDERS.values() for s in senders)
+    print(f"{args.distinct} distinct senders, half at known services: "
+          f"legacy recognised {legacy_known}, index {index_known}")
+
+    legacy = timed(legacy_format_sender_name, stream)
+    uncached = SenderIndex(cache_size=0)
+    cold = timed(uncached.resolve, stream)
+    warm = timed(SenderIndex().resolve, stream)
+    print(f"{args.mails} mails: legacy {legacy:.2f} us/mail, index uncached {cold:.2f} us/mail, "
+          f"index with LRU {warm:.2f} us/mail")
+
+    failures = check()
+    print(f"correctness: {len(CASES) + 1 - len(failures)}/{len(CASES) + 1} cases pass")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if args.check and failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
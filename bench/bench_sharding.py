@@ -0,0 +1,173 @@
+"""
+Benchmark: sharded polling across worker processes, on one machine, against
+the local tempmail.plus stand-in (run in its own process).
+
+1. Hash ring balance: shard sizes for many chats, and the fraction of chats
+   that move when a worker is added or removed.
+2. Scale-out: for each `--workers` count, a ShardCoordinator spawns that many
+   poll_worker.py processes, `--chats` chats each watch one address, and
+   `--rounds` waves of mail (HTML bodies) are delivered. Reports delivery
+   latency, poll throughput and the CPU time the coordinator process spent.
+3. With `--kill`, one worker is killed after the first wave; the supervisor
+   restarts it and the bench checks that no mail was lost or duplicated while
+   the shards were rebalanced.
+
+    python bench/bench_sharding.py --chats 500 --rounds 3 --workers 1 2 4 --kill
+
+Speedups need free cores: on a single-core machine the worker counts only
+show the coordinator's CPU saving.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import statistics
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import aiohttp  # noqa: E402
+
+from mail_client import new_mails_since  # noqa: E402
+from models import Mail, Mailbox  # noqa: E402
+from sharding import HashRing, ShardCoordinator  # noqa: E402
+
+HTML_BODY = (
+    "<html><head><style>" + ".c{color:red}" * 200 + "</style></head><body>"
+    + "<table>" + "<tr><td><span>&nbsp;</span></td></tr>" * 300 + "</table>"
+    + "<p>Your verification code is <b>{code}</b></p></body></html>"
+)
+
+
+def ring_balance(chats: int) -> None:
+    ring = HashRing()
+    for i in range(4):
+        ring.add(f"worker-{i}")
+    before = {chat_id: ring.node_for(chat_id) for chat_id in range(chats)}
+    sizes = {}
+    for node in before.values():
+        sizes[node] = sizes.get(node, 0) + 1
+    spread = (max(sizes.values()) - min(sizes.values())) / (chats / len(sizes))
+    print(f"ring: {chats} chats over 4 workers -> {sorted(sizes.values())} (max-min = {spread:.1%} of mean)")
+
+    ring.add("worker-4")
+    moved = sum(ring.node_for(chat_id) != node for chat_id, node in before.items())
+    print(f"ring: adding a 5th worker moves {moved / chats:.1%} of chats (ideal {1 / 5:.1%})")
+    ring.remove("worker-4")
+    ring.remove("worker-0")
+    moved = sum(ring.node_for(chat_id) != node for chat_id, node in before.items())
+    print(f"ring: losing worker-0 moves {moved / chats:.1%} of chats (ideal {1 / 4:.1%})")
+
+
+async def start_fake(port: int) -> asyncio.subprocess.Process:
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, os.path.join(BENCH_DIR, "fake_tempmail.py"), "--port", str(port), "--latency", "0.02",
+        stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL,
+    )
+    async with aiohttp.ClientSession() as session:
+        for _ in range(100):
+            try:
+                async with session.get(f"http://127.0.0.1:{port}/api/mails", params={"email": "x"}):
+                    return process
+            except aiohttp.ClientError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError("fake tempmail did not start")
+
+
+async def run_workers(args, base_url: str, workers: int) -> None:
+    tag = f"w{workers}"
+    emails = {chat_id: f"{tag}-{chat_id}@fake.test" for chat_id in range(args.chats)}
+    cursors = {chat_id: Mailbox() for chat_id in emails}   # chat_id -> Mailbox (the bot's user state)
+    sent_at = {}                              # email -> time its latest mail was delivered
+    sent = 0
+    received = {}                             # mail_id -> times reported to its chat
+    latencies = []
+    all_received = asyncio.Event()
+
+    async def on_mail(email: str, mails: list, chats: set) -> None:
+        now = time.perf_counter()
+        mails = [Mail.from_json(mail) for mail in mails]
+        for chat_id in chats:
+            for mail in new_mails_since(mails, cursors[chat_id]):
+                mail_id = mail.mail_id
+                cursors[chat_id].mark(mail_id)
+                received[mail_id] = received.get(mail_id, 0) + 1
+                latencies.append(now - sent_at[email])
+        if len(received) == sent:
+            all_received.set()
+
+    coordinator = ShardCoordinator(on_mail, lambda chat_id, email: cursors[chat_id].to_json())
+    await coordinator.start()
+    coordinator.spawn_workers(workers, "--base-url", base_url)
+    while len(coordinator.workers) < workers:
+        await asyncio.sleep(0.05)
+    for chat_id, email in emails.items():
+        coordinator.watch(chat_id, email)
+
+    cpu_started = time.process_time()
+    started = time.perf_counter()
+    killed = None
+    async with aiohttp.ClientSession() as session:
+        for round_no in range(args.rounds):
+            all_received.clear()
+            for chat_id, email in emails.items():
+                sent_at[email] = time.perf_counter()
+                sent += 1
+                async with session.post(f"{base_url}/_deliver", json={
+                    "email": email, "subject": "Sign-in", "text": "",
+                    "html": HTML_BODY.replace("{code}", f"{round_no:02d}{chat_id:04d}"),
+                }) as response:
+                    response.raise_for_status()
+            try:
+                await asyncio.wait_for(all_received.wait(), timeout=args.timeout)
+            except asyncio.TimeoutError:
+                pass
+            if args.kill and round_no == 0 and workers > 1:
+                killed = coordinator.workers[0]
+                os.kill(coordinator.worker_info()[killed]["pid"], signal.SIGKILL)
+    elapsed = time.perf_counter() - started
+    cpu = time.process_time() - cpu_started
+    polled = sum(info["polled"] for info in coordinator.worker_info().values())
+    await coordinator.close()
+
+    lost = sent - len(received)
+    duplicated = sum(count - 1 for count in received.values())
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else float("nan")
+    print(
+        f"workers={workers}: {len(received)}/{sent} mails in {elapsed:5.1f}s  "
+        f"latency p50 {statistics.median(latencies) if latencies else float('nan'):.2f}s p95 {p95:.2f}s  "
+        f"polls/s {polled / elapsed:6.0f}  coordinator CPU {cpu:.2f}s"
+        + (f"  killed {killed}: lost={lost} duplicated={duplicated}" if killed else f"  lost={lost}")
+    )
+
+
+async def run(args) -> None:
+    logging.disable(logging.WARNING)
+    ring_balance(args.ring_chats)
+    fake = await start_fake(args.port)
+    try:
+        for workers in args.workers:
+            await run_workers(args, f"http://127.0.0.1:{args.port}", workers)
+    finally:
+        fake.terminate()
+        await fake.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--kill", action="store_true", help="Kill one worker after the first wave")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Max seconds to wait for one wave")
+    parser.add_argument("--ring-chats", type=int, default=100000)
+    parser.add_argument("--port", type=int, default=8089)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Benchmark: admin stats read cost, scanning every user's state on each
+request vs. the rolling counters of stats.py, plus the cost the counters add
+to the mail hot path.
+
+- scan: walk `--users` UserStates (each with a few mailboxes and a list of
+  recent mail events) to count active mailboxes, mails in the last minute
+  and top senders, as a naive button handler would
+- counters: `UsageStats.snapshot()` after the same events were recorded
+
+    python bench/bench_stats.py --users 100000
+    python bench/bench_stats.py --check
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.dirname(BENCH_DIR), BENCH_DIR]
+
+from checks import Checks  # noqa: E402
+from models import Mailbox, UserState  # noqa: E402
+from senders import KNOWN_SENDERS  # noqa: E402
+from stats import RollingCounter, UsageStats  # noqa: E402
+
+SERVICES = frozenset(KNOWN_SENDERS.values())
+
+
+def build(users: int, mails_per_user: int, rng: random.Random) -> tuple:
+    names = sorted(SERVICES) + ["someone else"]
+    now = time.monotonic()
+    states, events = {}, {}
+    stats = UsageStats()
+    for chat_id in range(users):
+        states[chat_id] = UserState(mailboxes={f"u{chat_id}-{i}@mailto.plus": Mailbox() for i in range(rng.randint(1, 3))})
+        events[chat_id] = []
+        for _ in range(mails_per_user):
+            sender = rng.choice(names)
+            otp = rng.random() < 0.6
+            events[chat_id].append((now - rng.uniform(0, 3600), sender, otp))
+            stats.mail(sender, otp, SERVICES)
+    return states, events, stats
+
+
+def scan(states: dict, events: dict) -> dict:
+    cutoff = time.monotonic() - 60
+    mailboxes, recent, senders = set(), 0, {}
+    for chat_id, data in states.items():
+        mailboxes.update(data.mailboxes)
+        for at, sender, _ in events[chat_id]:
+            if at >= cutoff:
+                recent += 1
+            if sender in SERVICES:
+                senders[sender] = senders.get(sender, 0) + 1
+    return {"mailboxes": len(mailboxes), "recent": recent, "top": sorted(senders.items(), key=lambda i: -i[1])[:5]}
+
+
+def timed(function, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - started) / repeat
+
+
+def check() -> None:
+    expect = Checks()
+
+    now = [1000.0]
+    counter = RollingCounter(window=60, slot=10, clock=lambda: now[0])
+    for _ in range(12):
+        counter.add()
+        now[0] += 5
+    expect("window keeps the last 60s", counter.sum(60) == 10 and counter.total == 12)
+    now[0] += 35
+    expect("stale slots drop out as time passes", counter.sum(60) == 4)
+    expect("window sum matches the slots", counter._window_sum == sum(counter._counts))
+    now[0] += 10_000
+    expect("idle past the window clears it", counter.sum(60) == 0 and counter.sum(10) == 0 and counter.total == 12)
+
+    stats = UsageStats(clock=lambda: now[0])
+    for sender in ["Google"] * 3 + ["Discord", "someone else"]:
+        stats.mail(sender, sender == "Google", SERVICES)
+    stats.upstream(10, 1)
+    stats.auto_generation(2)
+    snapshot = stats.snapshot()
+    expect("mails and OTPs counted", snapshot["mails"]["total"] == 5 and snapshot["otps"]["total"] == 3)
+    expect("only known services are ranked", snapshot["top_senders"] == [("Google", 3), ("Discord", 1)])
+    expect("upstream error rate", snapshot["upstream_error_rate"]["1m"] == 0.1)
+    expect("auto-gen counted", snapshot["auto_generated"]["total"] == 2)
+    now[0] += 7200
+    expect("rates decay to zero", stats.snapshot()["mails"]["per_min_60m"] == 0 and stats.top_senders() == [])
+
+    expect.finish()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--mails-per-user", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--check", action="store_true", help="Run correctness checks instead")
+    args = parser.parse_args()
+    if args.check:
+        check()
+        return
+
+    states, events, stats = build(args.users, args.mails_per_user, random.Random(1))
+    print(f"{args.users:,} users, {args.users * args.mails_per_user:,} mail events")
+    print(f"{'scan':<9} {timed(lambda: scan(states, events), args.repeat) * 1000:>10.2f} ms per stats read")
+    print(f"{'counters':<9} {timed(stats.snapshot, 1000) * 1000:>10.3f} ms per stats read")
+    hook = timed(lambda: stats.mail("Google", True, SERVICES), 200_000)
+    print(f"hot-path cost: {hook * 1e6:.2f} µs per announced mail")
+
+
+if __name__ == "__main__":
+    main()
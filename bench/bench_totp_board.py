@@ -0,0 +1,117 @@
+"""
+Benchmark: TOTP codes computed and message edits for chats watching several
+secret keys at once.
+
+`--chats` chats each follow `--keys` secrets for `--seconds` of simulated
+time; `--shared` of the secrets come from a small common pool (team accounts
+followed by many chats). Three designs are compared against a stub bot that
+only counts edits:
+
+- per-key uncached: one message per key, TOTP recomputed and edited every second
+- per-key countdowns: one CountdownTicker message per key (cached codes, 5 s edit step)
+- board: one BoardTicker message per chat showing every key
+
+    python bench/bench_totp_board.py --chats 100 1000 --keys 10
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+import pyotp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from countdown import BoardTicker, CountdownTicker, TotpCache  # noqa: E402
+
+SHARED_POOL = 20
+
+
+def render_countdown(code: str, time_remaining: int) -> str:
+    return f"OTP CODE >> <code>'{code}'</code>\nExpires in: {time_remaining:02d} seconds"
+
+
+def render_board(rows: list, time_remaining: int) -> str:
+    return "\n".join(f"<b>{label}</b> >> <code>{code}</code>" for label, code in rows) + \
+        f"\nExpires in: {time_remaining:02d} seconds"
+
+
+def make_boards(chats: int, keys: int, shared: float, seed: int = 5) -> list:
+    rng = random.Random(seed)
+    pool = [pyotp.random_base32() for _ in range(SHARED_POOL)]
+    return [
+        [rng.choice(pool) if rng.random() < shared else pyotp.random_base32() for _ in range(keys)]
+        for _ in range(chats)
+    ]
+
+
+async def per_key_uncached(boards: list, seconds: int, start: int) -> tuple:
+    computed = edits = 0
+    started = time.process_time()
+    for now in range(start, start + seconds):
+        for secrets in boards:
+            for secret in secrets:
+                render_countdown(pyotp.TOTP(secret).at(now), 30 - now % 30)
+                computed += 1
+                edits += 1
+    return time.process_time() - started, computed, edits
+
+
+async def per_key_countdowns(boards: list, seconds: int, start: int, step: int) -> tuple:
+    ticker = CountdownTicker(render_countdown, edit_step=step)
+
+    async def edit(*_):
+        pass
+
+    for chat_id, secrets in enumerate(boards):
+        for k, secret in enumerate(secrets):
+            ticker.start((chat_id, k), k, secret)
+    started = time.process_time()
+    for now in range(start, start + seconds):
+        await ticker.tick(edit, now=now)
+    return time.process_time() - started, ticker.codes.computed, ticker.edits_sent
+
+
+async def board(boards: list, seconds: int, start: int, step: int) -> tuple:
+    ticker = BoardTicker(render_board, TotpCache(), edit_step=step, max_entries=max(map(len, boards)))
+
+    async def edit(*_):
+        pass
+
+    for chat_id, secrets in enumerate(boards):
+        for k, secret in enumerate(secrets):
+            ticker.add(chat_id, f"key {k}", secret)
+        ticker.attach(chat_id, chat_id)
+    started = time.process_time()
+    for now in range(start, start + seconds):
+        await ticker.tick(edit, now=now)
+    return time.process_time() - started, ticker.codes.computed, ticker.edits_sent
+
+
+async def run(args) -> None:
+    start = int(time.time())
+    print(f"{args.keys} keys per chat ({args.shared:.0%} from a pool of {SHARED_POOL}), "
+          f"{args.seconds}s simulated, edit step {args.step}s")
+    print(f"{'chats':>6} {'design':<20} {'CPU s':>7} {'codes/s':>9} {'edits/s':>9} {'edits/chat/min':>15}")
+    for chats in args.chats:
+        boards = make_boards(chats, args.keys, args.shared)
+        for label, result in (
+            ("per-key uncached", await per_key_uncached(boards, args.seconds, start)),
+            ("per-key countdowns", await per_key_countdowns(boards, args.seconds, start, args.step)),
+            ("board", await board(boards, args.seconds, start, args.step)),
+        ):
+            cpu, computed, edits = result
+            print(f"{chats:>6} {label:<20} {cpu:>7.3f} {computed / args.seconds:>9.1f} "
+                  f"{edits / args.seconds:>9.1f} {edits / chats / args.seconds * 60:>15.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--keys", type=int, default=10)
+    parser.add_argument("--shared", type=float, default=0.3, help="Fraction of keys drawn from the shared pool")
+    parser.add_argument("--seconds", type=int, default=60)
+    parser.add_argument("--step", type=int, default=5)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,99 @@
+"""
+Benchmark: resident memory of the per-chat state at 100k and 1M synthetic
+users, plain dicts (the previous layout) vs. the slotted `models` dataclasses.
+
+Every user watches `--mailboxes` addresses with a mail ID cursor, and every
+address keeps its last parsed inbox listing (one mail, as the tempmail client's
+list cache does). The dict layout keeps the listing as parsed from the upstream
+JSON; the slotted layout projects it to a MailHeader. Each measurement runs in
+a fresh process and reports the RSS growth (VmRSS) over an empty interpreter.
+
+    python bench/bench_user_memory.py --users 100000 1000000
+"""
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import Mailbox, MailHeader, UserState  # noqa: E402
+
+# One listing entry with the fields tempmail.plus returns for it
+LISTING = json.dumps({"result": True, "count": 1, "first_id": 0, "last_id": 0, "limit": 20, "more": False, "mail_list": [{
+    "mail_id": 0, "from_mail": "no-reply@accounts.google.com", "from_name": "Google",
+    "subject": "123456 is your verification code", "time": "2026-10-18 12:00:00",
+    "is_new": True, "attachment_count": 0, "first_attachment_name": "",
+}]})
+
+
+def rss_bytes() -> int:
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    raise RuntimeError("VmRSS not available")
+
+
+def build_dicts(users: int, mailboxes: int) -> tuple:
+    states, listings = {}, {}
+    for chat_id in range(users):
+        boxes = {f"u{chat_id}x{i}@mailto.plus": 1000 + i for i in range(mailboxes)}
+        states[chat_id] = {"mailboxes": boxes, "active": next(reversed(boxes)), "username": None, "auto_gen_on": False}
+        for email in boxes:
+            listings[email] = json.loads(LISTING)
+    return states, listings
+
+
+def build_slotted(users: int, mailboxes: int) -> tuple:
+    states, listings = {}, {}
+    for chat_id in range(users):
+        boxes = {f"u{chat_id}x{i}@mailto.plus": Mailbox(1000 + i) for i in range(mailboxes)}
+        states[chat_id] = UserState(boxes, next(reversed(boxes)))
+        for email in boxes:
+            parsed = json.loads(LISTING)
+            listings[email] = {"mail_list": [MailHeader.from_json(mail) for mail in parsed["mail_list"]]}
+    return states, listings
+
+
+def child(layout: str, users: int, mailboxes: int) -> None:
+    gc.collect()
+    before = rss_bytes()
+    data = (build_dicts if layout == "dicts" else build_slotted)(users, mailboxes)
+    gc.collect()
+    print(rss_bytes() - before)
+    del data
+
+
+def measure(layout: str, users: int, mailboxes: int) -> int:
+    out = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", layout, "--users", str(users),
+         "--mailboxes", str(mailboxes)],
+        check=True, capture_output=True, text=True,
+    )
+    return int(out.stdout)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--mailboxes", type=int, default=1, help="Addresses per user")
+    parser.add_argument("--child", choices=("dicts", "slotted"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child, args.users[0], args.mailboxes)
+        return
+
+    print(f"{args.mailboxes} address(es) per user, one listed mail per address")
+    for users in args.users:
+        dicts = measure("dicts", users, args.mailboxes)
+        slotted = measure("slotted", users, args.mailboxes)
+        print(f"{users:>9} users: dicts {dicts / 2**20:8.1f} MiB ({dicts / users:5.0f} B/user)   "
+              f"slotted {slotted / 2**20:8.1f} MiB ({slotted / users:5.0f} B/user)   "
+              f"saved {1 - slotted / dicts:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Load generator: posts synthetic Telegram updates (commands, text messages and
+callback queries) to a webhook endpoint and reports intake and handling
+throughput.
+
+By default it starts a local WebhookIntake whose handler simulates
+`--handler-latency` seconds of I/O per update, once per `--workers` value, so
+the effect of concurrent handling and of the intake bound is visible. With
+`--url` it posts to an already running bot instead (BOT_MODE=webhook); only
+intake numbers are reported then.
+
+    python bench/bench_webhook.py --updates 5000 --chats 500 --workers 1 16 64
+    python bench/bench_webhook.py --url http://127.0.0.1:10000/telegram --secret s3cret
+"""
+import argparse
+import asyncio
+import itertools
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aiohttp  # noqa: E402
+from aiohttp import web  # noqa: E402
+
+from webhook import SECRET_HEADER, WebhookIntake  # noqa: E402
+
+TEXTS = ("/start", "/generate", "/emails", "📧 Temp Mail Service", "🔐 2FA Authenticator", "JBSWY3DPEHPK3PXP")
+CALLBACKS = ("generate", "my_emails", "auto_gen_inline", "claim_otp")
+
+
+def synthetic_updates(count: int, chats: int, seed: int = 7):
+    random.seed(seed)
+    update_ids = itertools.count(1)
+    now = int(time.time())
+    for _ in range(count):
+        chat_id = random.randrange(1, chats + 1)
+        user = {"id": chat_id, "is_bot": False, "first_name": "Load"}
+        chat = {"id": chat_id, "type": "private"}
+        update_id = next(update_ids)
+        if random.random() < 0.3:
+            yield {
+                "update_id": update_id,
+                "callback_query": {
+                    "id": str(update_id), "from": user, "chat_instance": str(chat_id),
+                    "data": random.choice(CALLBACKS),
+                    "message": {"message_id": 1, "date": now, "chat": chat, "text": "menu"},
+                },
+            }
+        else:
+            text = random.choice(TEXTS)
+            message = {"message_id": update_id, "date": now, "chat": chat, "from": user, "text": text}
+            if text.startswith("/"):
+                message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text)}]
+            yield {"update_id": update_id, "message": message}
+
+
+async def post_all(url: str, updates: list, concurrency: int, secret) -> dict:
+    """Posts every update with `concurrency` connections; 503s are retried like Telegram does."""
+    headers = {SECRET_HEADER: secret} if secret else {}
+    statuses = {}
+    retries = 0
+    pending = iter(updates)
+
+    async def client(session):
+        nonlocal retries
+        for update in pending:
+            while True:
+                async with session.post(url, json=update, headers=headers) as response:
+                    statuses[response.status] = statuses.get(response.status, 0) + 1
+                    if response.status != 503:
+                        break
+                retries += 1
+                await asyncio.sleep(0.05)
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        started = time.perf_counter()
+        await asyncio.gather(*(client(session) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return {"elapsed": elapsed, "statuses": statuses, "retries": retries}
+
+
+async def run_local(args, updates: list, workers: int) -> None:
+    accepted = {}    # chat_id -> update IDs in the order the intake accepted them
+    handled = {}     # chat_id -> update IDs in the order they were handled
+
+    async def handler(update):
+        handled.setdefault(update.effective_chat.id, []).append(update.update_id)
+        await asyncio.sleep(args.handler_latency * random.uniform(0.5, 1.5))
+
+    intake = WebhookIntake(handler, None, args.secret, max_pending=args.max_pending, workers=workers)
+    submit = intake.submit
+
+    def recording_submit(data):
+        chat = (data.get("message") or data["callback_query"]["message"])["chat"]
+        accepted.setdefault(chat["id"], []).append(data["update_id"])
+        submit(data)
+
+    intake.submit = recording_submit
+    app = web.Application()
+    intake.register(app, "/telegram")
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    intake.start()
+
+    started = time.perf_counter()
+    result = await post_all(f"http://127.0.0.1:{port}/telegram", updates, args.concurrency, args.secret)
+    await intake.join()
+    total = time.perf_counter() - started
+    await intake.stop()
+    await runner.cleanup()
+    # 503 retries may legitimately change the acceptance order; handling must follow it per chat
+    order_errors = sum(handled.get(chat_id) != ids for chat_id, ids in accepted.items())
+
+    print(
+        f"workers={workers:<4} posted in {result['elapsed']:6.2f}s  handled in {total:6.2f}s "
+        f"({intake.handled / total:8.0f} updates/s)  503s={intake.rejected:<6} "
+        f"chats out of order={order_errors}"
+    )
+
+
+async def run(args) -> None:
+    logging.disable(logging.WARNING)
+    updates = list(synthetic_updates(args.updates, args.chats))
+    if args.url:
+        result = await post_all(args.url, updates, args.concurrency, args.secret)
+        print(
+            f"{len(updates)} updates posted in {result['elapsed']:.2f}s "
+            f"({len(updates) / result['elapsed']:.0f}/s)  statuses={result['statuses']} retries={result['retries']}"
+        )
+        return
+    print(f"{len(updates)} updates over {args.chats} chats, handler latency ~{args.handler_latency * 1000:.0f} ms, "
+          f"intake bound {args.max_pending}")
+    for workers in args.workers:
+        await run_local(args, updates, workers)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Post to a running bot's webhook instead of a local intake")
+    parser.add_argument("--secret", default=None, help="Value for the webhook secret header")
+    parser.add_argument("--updates", type=int, default=5000)
+    parser.add_argument("--chats", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent HTTP connections")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--handler-latency", type=float, default=0.02, help="Simulated seconds per update")
+    parser.add_argument("--max-pending", type=int, default=1000)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
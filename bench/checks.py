@@ -0,0 +1,26 @@
+"""
+Shared harness for the benchmarks' `--check` runs.
+
+    expect = Checks()
+    expect("cache hit", cache.get(key) is not None)
+    expect.finish()
+
+Each expectation prints an ok/FAIL line; `finish()` prints the failure count
+and exits with status 1 if any failed.
+"""
+import sys
+
+
+class Checks:
+    def __init__(self):
+        self.failures = []
+
+    def __call__(self, name: str, ok: bool) -> None:
+        print(f"{'ok  ' if ok else 'FAIL'} {name}")
+        if not ok:
+            self.failures.append(name)
+
+    def finish(self) -> None:
+        print(f"\n{len(self.failures)} failure(s)")
+        if self.failures:
+            sys.exit(1)
@@ -0,0 +1,249 @@
+"""
+Local stand-in for the Telegram Bot API, used by the simulator.
+
+Serves `/bot<token>/<method>` for the methods the bot calls: `getUpdates`
+(long polling over updates queued with `push_message()` /
+`push_callback()`), `sendMessage`, `editMessageText`,
+`answerCallbackQuery`, plus `getMe` and `deleteWebhook`; anything else
+answers `true`. Every call the bot makes is recorded as a `BotCall`, and
+`wait_for()` lets a driver await a specific reply.
+
+Run standalone with `python bench/fake_telegram.py --port 8081 --latency 0.03`.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Callable, Optional
+
+from aiohttp import web
+
+BOT_USER = {"id": 4242, "is_bot": True, "first_name": "Sim", "username": "sim_bot"}
+SEND_METHODS = ("sendMessage", "editMessageText", "answerCallbackQuery")
+
+
+class BotCall:
+    """One Bot API call made by the bot."""
+    __slots__ = ("method", "chat_id", "message_id", "params", "at")
+
+    def __init__(self, method: str, chat_id: Optional[int], message_id: Optional[int], params: dict, at: float):
+        self.method = method
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.params = params
+        self.at = at
+
+    @property
+    def text(self) -> str:
+        return self.params.get("text") or ""
+
+
+class FakeTelegram:
+    """
+    In-memory fake of the Bot API.
+
+    `latency` is added to every send/edit/answer call (seconds). A fraction
+    `error_rate` of those calls fails with HTTP 500 and `flood_rate` with
+    429 Too Many Requests (`retry_after` seconds), as Telegram does under
+    load.
+    """
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, flood_rate: float = 0.0,
+                 retry_after: int = 1):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.flood_rate = flood_rate
+        self.retry_after = retry_after
+        self.calls = {}            # method -> count
+        self.failures = {}         # method -> injected failures
+        self._updates = []
+        self._next_update_id = 1
+        self._new_updates = asyncio.Event()
+        self._message_ids = {}     # chat_id -> last message_id
+        self._callbacks = {}       # callback_query id -> chat_id
+        self._waiters = {}         # chat_id -> [(predicate, future)]
+        self._runner = None
+
+    # --- Driving the bot ---
+
+    def _user(self, chat_id: int) -> dict:
+        return {"id": chat_id, "is_bot": False, "first_name": f"user{chat_id}"}
+
+    def _next_message_id(self, chat_id: int) -> int:
+        message_id = self._message_ids.get(chat_id, 0) + 1
+        self._message_ids[chat_id] = message_id
+        return message_id
+
+    def _push(self, update: dict) -> float:
+        update["update_id"] = self._next_update_id
+        self._next_update_id += 1
+        self._updates.append(update)
+        self._new_updates.set()
+        return time.perf_counter()
+
+    def push_message(self, chat_id: int, text: str) -> float:
+        """Queues a user message (commands get their entity). Returns the time it was queued."""
+        message = {
+            "message_id": self._next_message_id(chat_id),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": self._user(chat_id),
+            "text": text,
+        }
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        return self._push({"message": message})
+
+    def push_callback(self, chat_id: int, message_id: int, data: str) -> float:
+        """Queues an inline button press on one of the bot's messages."""
+        query_id = f"{chat_id}-{self._next_update_id}"
+        self._callbacks[query_id] = chat_id
+        return self._push({"callback_query": {
+            "id": query_id,
+            "from": self._user(chat_id),
+            "chat_instance": str(chat_id),
+            "data": data,
+            "message": {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "from": BOT_USER,
+                "text": "",
+            },
+        }})
+
+    def wait_for(self, chat_id: int, predicate: Callable[[BotCall], bool]) -> asyncio.Future:
+        """A future resolved with the first later call to `chat_id` that matches `predicate`."""
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(chat_id, []).append((predicate, future))
+        return future
+
+    def _record(self, call: BotCall) -> None:
+        waiters = self._waiters.get(call.chat_id)
+        if not waiters:
+            return
+        remaining = []
+        for predicate, future in waiters:
+            if future.done():
+                continue
+            if predicate(call):
+                future.set_result(call)
+            else:
+                remaining.append((predicate, future))
+        self._waiters[call.chat_id] = remaining
+
+    # --- Bot API ---
+
+    @staticmethod
+    async def _params(request: web.Request) -> dict:
+        if request.content_type == "application/json":
+            return await request.json()
+        params = {}
+        for key, value in (await request.post()).items():
+            # Form fields carry objects (reply_markup, allowed_updates) as JSON; the rest stay strings
+            if isinstance(value, str) and value[:1] in ("{", "["):
+                try:
+                    value = json.loads(value)
+                except ValueError:
+                    pass
+            params[key] = value
+        return params
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        params = await self._params(request)
+        self.calls[method] = self.calls.get(method, 0) + 1
+
+        if method == "getUpdates":
+            return self._ok(await self._get_updates(params))
+        if method == "getMe":
+            return self._ok(BOT_USER)
+        if method not in SEND_METHODS:
+            return self._ok(True)
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        roll = random.random()
+        if roll < self.error_rate:
+            self.failures[method] = self.failures.get(method, 0) + 1
+            return self._error(500, "Internal Server Error")
+        if roll < self.error_rate + self.flood_rate:
+            self.failures[method] = self.failures.get(method, 0) + 1
+            return self._error(429, f"Too Many Requests: retry after {self.retry_after}",
+                               {"retry_after": self.retry_after})
+
+        if method == "answerCallbackQuery":
+            chat_id = self._callbacks.pop(str(params.get("callback_query_id")), None)
+            self._record(BotCall(method, chat_id, None, params, time.perf_counter()))
+            return self._ok(True)
+
+        chat_id = int(params["chat_id"])
+        message_id = int(params["message_id"]) if method == "editMessageText" else self._next_message_id(chat_id)
+        self._record(BotCall(method, chat_id, message_id, params, time.perf_counter()))
+        result = {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": BOT_USER,
+            "text": params.get("text", ""),
+        }
+        if isinstance(params.get("reply_markup"), dict) and "inline_keyboard" in params["reply_markup"]:
+            result["reply_markup"] = params["reply_markup"]
+        return self._ok(result)
+
+    async def _get_updates(self, params: dict) -> list:
+        offset = int(params.get("offset") or 0)
+        limit = int(params.get("limit") or 100)
+        if offset:
+            # Confirmed updates are dropped, as Telegram does
+            self._updates = [update for update in self._updates if update["update_id"] >= offset]
+        if not self._updates:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout=float(params.get("timeout") or 0))
+            except asyncio.TimeoutError:
+                pass
+        return self._updates[:limit]
+
+    @staticmethod
+    def _ok(result) -> web.Response:
+        return web.json_response({"ok": True, "result": result})
+
+    @staticmethod
+    def _error(code: int, description: str, parameters: Optional[dict] = None) -> web.Response:
+        payload = {"ok": False, "error_code": code, "description": description}
+        if parameters:
+            payload["parameters"] = parameters
+        return web.json_response(payload, status=code)
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        app.router.add_get("/bot{token}/{method}", self.handle)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Starts the server and returns the Bot API base URL (token appended by the client)."""
+        self._runner = web.AppRunner(self.make_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{port}/bot"
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.03)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--flood-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    fake = FakeTelegram(latency=args.latency, error_rate=args.error_rate, flood_rate=args.flood_rate)
+    web.run_app(fake.make_app(), host="127.0.0.1", port=args.port)
@@ -0,0 +1,133 @@
+"""
+Local stand-in for the tempmail.plus `/api/mails` endpoints, used by the benchmarks.
+
+`GET /api/mails?email=&first_id=` returns list metadata for mails newer than
+`first_id` (with an ETag, answering a matching `If-None-Match` with 304);
+`GET /api/mails/{mail_id}?email=` returns one full mail. `POST /_deliver` with a
+JSON body (`email`, optional `subject`, `text`, `sender`, `html`) delivers a mail,
+so a fake running in another process can be fed too.
+
+Run standalone with `python bench/fake_tempmail.py --port 8088 --latency 0.05`.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+
+from aiohttp import web
+
+
+class FakeTempMail:
+    """
+    In-memory fake of tempmail.plus.
+
+    `latency` is added to every request (seconds), `error_rate` is the fraction
+    of requests answered with HTTP 500. Mails are delivered with `deliver()`.
+    With `etags` off, listings carry no ETag (like an upstream without
+    conditional request support).
+    """
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, etags: bool = True):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.etags = etags
+        self.inboxes = {}
+        self.requests = 0
+        self.not_modified = 0
+        self.bytes_sent = 0
+        self._next_id = 1000
+        self._runner = None
+
+    def deliver(self, email: str, subject: str = "Your code", text: str = "Your verification code is 482913",
+                sender: str = "Google <no-reply@accounts.google.com>", html: str = "") -> int:
+        mail_id = self._next_id
+        self._next_id += 1
+        # Newest first, like the real API
+        self.inboxes.setdefault(email, []).insert(0, {
+            "mail_id": mail_id,
+            "from": sender,
+            "subject": subject,
+            "text": text,
+            "html": html,
+        })
+        return mail_id
+
+    async def handle_mails(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.error_rate and random.random() < self.error_rate:
+            return self._json({"result": False}, status=500)
+        email = request.query.get("email", "")
+        try:
+            first_id = int(request.query.get("first_id") or 0)
+        except ValueError:
+            first_id = 0
+        mail_list = [
+            {"mail_id": mail["mail_id"], "from_mail": mail["from"], "subject": mail["subject"]}
+            for mail in self.inboxes.get(email, [])
+            if mail["mail_id"] > first_id
+        ]
+        response = self._json({"result": True, "count": len(mail_list), "mail_list": mail_list})
+        if self.etags:
+            etag = '"' + hashlib.blake2b(response.body, digest_size=8).hexdigest() + '"'
+            if request.headers.get("If-None-Match") == etag:
+                self.bytes_sent -= len(response.body)
+                self.not_modified += 1
+                return web.Response(status=304, headers={"ETag": etag})
+            response.headers["ETag"] = etag
+        return response
+
+    async def handle_mail(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.error_rate and random.random() < self.error_rate:
+            return self._json({"result": False}, status=500)
+        email = request.query.get("email", "")
+        mail_id = int(request.match_info["mail_id"])
+        for mail in self.inboxes.get(email, []):
+            if mail["mail_id"] == mail_id:
+                return self._json({"result": True, **mail})
+        return self._json({"result": False}, status=404)
+
+    async def handle_deliver(self, request: web.Request) -> web.Response:
+        mail = await request.json()
+        return self._json({"mail_id": self.deliver(**mail)})
+
+    def _json(self, payload: dict, status: int = 200) -> web.Response:
+        body = json.dumps(payload).encode()
+        self.bytes_sent += len(body)
+        return web.Response(body=body, status=status, content_type="application/json")
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/api/mails", self.handle_mails)
+        app.router.add_get("/api/mails/{mail_id}", self.handle_mail)
+        app.router.add_post("/_deliver", self.handle_deliver)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Starts the server and returns its base URL."""
+        self._runner = web.AppRunner(self.make_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{port}"
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8088)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    fake = FakeTempMail(latency=args.latency, error_rate=args.error_rate)
+    web.run_app(fake.make_app(), host="127.0.0.1", port=args.port)
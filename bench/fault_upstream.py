@@ -0,0 +1,144 @@
+"""
+Fault injection: drives the bot's real auto_fetch loop against the local
+tempmail.plus fake and switches the fake between healthy, slow, down and
+recovered phases, once with the circuit breaker and once with it effectively
+disabled.
+
+For each phase it reports the requests that reached the upstream, the
+requests shed by the breaker and the breaker state at the end of the phase.
+At the start of the recovered phase a mail is delivered, and the time until
+its notification is queued is reported. Timeouts and breaker periods are
+scaled down so a run takes under two minutes.
+
+    python bench/fault_upstream.py --mailboxes 500 --phase 10 --check
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.dirname(BENCH_DIR), BENCH_DIR]
+os.environ["USER_DB_PATH"] = ""
+
+import bot  # noqa: E402
+import metrics  # noqa: E402
+from circuit_breaker import CircuitBreaker  # noqa: E402
+from fake_tempmail import FakeTempMail  # noqa: E402
+from mail_client import TempMailClient  # noqa: E402
+from poll_scheduler import PollScheduler  # noqa: E402
+from storage import UserStore  # noqa: E402
+
+REQUEST_TIMEOUT = 1.0
+
+# name, fake latency (s), fake error rate
+PHASES = (
+    ("healthy", 0.01, 0.0),
+    ("slow", 3.0, 0.0),
+    ("down", 0.01, 1.0),
+    ("recovered", 0.01, 0.0),
+)
+
+
+class StubQueue:
+    """Stands in for the outbound SendQueue and timestamps every message."""
+
+    def __init__(self):
+        self.sent = []
+
+    def send_message(self, chat_id, text, **kwargs):
+        self.sent.append((time.perf_counter(), chat_id, text))
+
+    def __len__(self):
+        return 0
+
+
+async def run(args, with_breaker: bool) -> dict:
+    breaker = CircuitBreaker(
+        window=5.0, min_requests=20 if with_breaker else 10**9, slow_call=REQUEST_TIMEOUT * 0.8,
+        consecutive_failures=20 if with_breaker else 10**9,
+        open_for=1.0, max_open_for=4.0,
+    )
+    fake = FakeTempMail()
+    url = await fake.start()
+    bot.mail_client = TempMailClient(base_url=url, request_timeout=REQUEST_TIMEOUT, breaker=breaker)
+    bot.user_store = UserStore()
+    bot.poll_scheduler = PollScheduler()
+    bot.mailbox_subscribers = {}
+    bot.outbound = StubQueue()
+    for chat_id in range(args.mailboxes):
+        bot.add_mailbox(chat_id, bot.initialize_user_data(chat_id), f"fault{chat_id}@mailto.plus")
+
+    task = asyncio.create_task(bot.auto_fetch(None))
+    results = {}
+    for name, latency, error_rate in PHASES:
+        fake.latency, fake.error_rate = latency, error_rate
+        requests_before, shed_before = fake.requests, metrics.BREAKER_SHED.value
+        started = time.perf_counter()
+        if name == "recovered":
+            fake.deliver("fault0@mailto.plus")
+        await asyncio.sleep(args.phase)
+        result = {
+            "upstream": fake.requests - requests_before,
+            "shed": int(metrics.BREAKER_SHED.value - shed_before),
+            "state": breaker.state,
+        }
+        if name == "recovered":
+            notified = [at for at, chat_id, _ in bot.outbound.sent if chat_id == 0]
+            result["notified_after"] = notified[0] - started if notified else None
+        results[name] = result
+
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    await bot.mail_client.close()
+    await fake.stop()
+    return results
+
+
+def report(label: str, results: dict) -> None:
+    print(label)
+    for name, result in results.items():
+        line = f"  {name:<10} upstream requests {result['upstream']:6}  shed {result['shed']:6}  breaker {result['state']}"
+        if "notified_after" in result:
+            after = result["notified_after"]
+            line += f"  new mail notified after {after:.1f}s" if after is not None else "  new mail NOT notified"
+        print(line)
+
+
+async def main_async(args) -> int:
+    logging.disable(logging.ERROR)
+    with_breaker = await run(args, True)
+    report("with circuit breaker:", with_breaker)
+    without = await run(args, False)
+    report("without circuit breaker:", without)
+
+    if not args.check:
+        return 0
+    failures = []
+    # A slow upstream is already throttled by the client's concurrency cap, so expect less there
+    for phase, factor in (("slow", 2), ("down", 5)):
+        if with_breaker[phase]["upstream"] * factor > without[phase]["upstream"]:
+            failures.append(f"{phase}: breaker did not cut upstream load at least {factor}x")
+        if with_breaker[phase]["state"] == "closed":
+            failures.append(f"{phase}: breaker still closed at the end of the phase")
+    if with_breaker["recovered"]["state"] != "closed":
+        failures.append("recovered: breaker did not close")
+    if with_breaker["recovered"]["notified_after"] is None:
+        failures.append("recovered: mail delivered after recovery was not notified")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mailboxes", type=int, default=500)
+    parser.add_argument("--phase", type=float, default=10.0, help="Seconds per phase")
+    parser.add_argument("--check", action="store_true", help="Exit non-zero if the breaker misbehaves")
+    sys.exit(asyncio.run(main_async(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+"""
+End-to-end load simulator: the real bot against local fakes of the Telegram
+Bot API (bench/fake_telegram.py) and tempmail.plus (bench/fake_tempmail.py).
+
+The bot runs in this process exactly as in production (polling mode, every
+handler, the poller, countdown job and outbound queue), pointed at the
+fakes. The fakes and the driver run in a child process so their CPU does not
+count against the bot. `--chats` synthetic chats arrive over `--ramp`
+seconds and each goes through:
+
+    /start -> /generate -> (mail with an OTP arrives) -> 2FA secret -> CLAIMED button
+
+Mail arrival after /generate follows `--arrival`: "uniform" over
+`--mail-delay` seconds, "poisson" (exponential, mean `--mail-delay`) or
+"burst" (every mail at once, `--mail-delay` seconds after the last chat
+generated its address).
+
+Replies and countdown edits share the outbound queue's global send budget
+(30 messages/s, as Telegram enforces), so past a few hundred active chats
+step latency is bounded by it rather than by the bot's own work.
+
+The report is one JSON document (stdout, or `--output`):
+- throughput: updates handled and Bot API calls per second
+- per step: reply latency p50/p99 and timeouts
+- OTP delivery: time from the mail arriving upstream to the notification
+  reaching Telegram, p50/p99
+- bot process: event-loop lag (p50/p99/max), slow callbacks, RSS (current
+  and peak) and CPU time
+- fakes: upstream requests, 304s and injected failures
+
+    python bench/simulate.py --chats 2000 --ramp 20 --output report.json
+    python bench/simulate.py --chats 500 --tg-error-rate 0.02 --mail-error-rate 0.05
+"""
+import argparse
+import asyncio
+import base64
+import json
+import logging
+import os
+import random
+import re
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.dirname(BENCH_DIR), BENCH_DIR]
+
+TOKEN = "123456:SIMULATED-TOKEN"
+ADDRESS_RE = re.compile(r"`([^`@\s]+@mailto\.plus)`")
+STEPS = ("start", "generate", "secret", "claim")
+
+
+def percentiles(values: list, scale: float = 1.0) -> dict:
+    ordered = sorted(values)
+
+    def pct(p: float):
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))] * scale, 3) if ordered else None
+
+    return {"count": len(ordered), "p50": pct(0.5), "p99": pct(0.99), "max": pct(1.0)}
+
+
+def memory_status() -> dict:
+    """Current and peak RSS of this process (MiB), from /proc."""
+    values = {}
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith(("VmRSS:", "VmHWM:")):
+                    key, value = line.split(":", 1)
+                    values[key] = round(int(value.split()[0]) / 1024, 1)
+    except OSError:
+        pass
+    return {"rss_mib": values.get("VmRSS"), "peak_rss_mib": values.get("VmHWM")}
+
+
+# --- Driver (child process): fakes plus synthetic chats ---
+
+class Driver:
+    def __init__(self, args, telegram, tempmail):
+        self.args = args
+        self.telegram = telegram
+        self.tempmail = tempmail
+        self.rng = random.Random(args.seed)
+        self.latencies = {step: [] for step in STEPS}
+        self.timeouts = {step: 0 for step in STEPS}
+        self.otp_latencies = []
+        self.otp_missing = 0
+        self.completed = 0
+        self.generated = 0
+        self.all_generated = asyncio.Event()
+
+    async def step(self, name: str, chat_id: int, push, predicate):
+        """Queues one update and waits for the bot's matching reply."""
+        reply = self.telegram.wait_for(chat_id, predicate)
+        queued = push()
+        try:
+            call = await asyncio.wait_for(reply, self.args.step_timeout)
+        except asyncio.TimeoutError:
+            self.timeouts[name] += 1
+            return None
+        self.latencies[name].append(call.at - queued)
+        return call
+
+    def arrival_delay(self) -> float:
+        if self.args.arrival == "poisson":
+            return self.rng.expovariate(1 / self.args.mail_delay)
+        if self.args.arrival == "uniform":
+            return self.rng.uniform(0, self.args.mail_delay)
+        return 0.0
+
+    async def deliver_otp(self, chat_id: int, email: str) -> bool:
+        if self.args.arrival == "burst":
+            await self.all_generated.wait()
+            await asyncio.sleep(self.args.mail_delay)
+        else:
+            await asyncio.sleep(self.arrival_delay())
+        otp = str(self.rng.randrange(10**5, 10**6))
+        notified = self.telegram.wait_for(chat_id, lambda call: call.method == "sendMessage" and otp in call.text)
+        self.tempmail.deliver(email, subject="Your verification code", text=f"Your verification code is {otp}")
+        delivered = time.perf_counter()
+        try:
+            call = await asyncio.wait_for(notified, self.args.otp_timeout)
+        except asyncio.TimeoutError:
+            self.otp_missing += 1
+            return False
+        self.otp_latencies.append(call.at - delivered)
+        return True
+
+    def _generated(self) -> None:
+        self.generated += 1
+        if self.generated >= self.args.chats:
+            self.all_generated.set()
+
+    async def chat(self, chat_id: int) -> None:
+        telegram = self.telegram
+        await asyncio.sleep(self.rng.uniform(0, self.args.ramp))
+        await self.step("start", chat_id, lambda: telegram.push_message(chat_id, "/start"),
+                        lambda call: call.method == "sendMessage")
+        call = await self.step("generate", chat_id, lambda: telegram.push_message(chat_id, "/generate"),
+                               lambda call: call.method == "sendMessage" and "@mailto.plus" in call.text)
+        self._generated()
+        match = ADDRESS_RE.search(call.text) if call is not None else None
+        mail = asyncio.create_task(self.deliver_otp(chat_id, match.group(1))) if match else None
+
+        secret = base64.b32encode(self.rng.randbytes(20)).decode()
+        code = await self.step("secret", chat_id, lambda: telegram.push_message(chat_id, secret),
+                               lambda call: call.method == "sendMessage" and "OTP CODE" in call.text)
+        claimed = None
+        if code is not None:
+            claimed = await self.step("claim", chat_id,
+                                      lambda: telegram.push_callback(chat_id, code.message_id, "claim_otp"),
+                                      lambda call: call.method == "editMessageText" and "CLAIMED" in call.text)
+        if mail is None:
+            self.otp_missing += 1
+            return
+        if await mail and claimed is not None:
+            self.completed += 1
+
+    async def run(self) -> dict:
+        started = time.perf_counter()
+        await asyncio.gather(*(self.chat(1_000_000 + i) for i in range(self.args.chats)))
+        elapsed = time.perf_counter() - started
+        handled = sum(len(values) for values in self.latencies.values())
+        calls = sum(self.telegram.calls.get(method, 0) for method in ("sendMessage", "editMessageText",
+                                                                      "answerCallbackQuery"))
+        return {
+            "elapsed_s": round(elapsed, 3),
+            "chats": {"total": self.args.chats, "completed": self.completed},
+            "throughput": {
+                "updates_handled": handled,
+                "updates_per_s": round(handled / elapsed, 1),
+                "bot_api_calls": dict(sorted(self.telegram.calls.items())),
+                "bot_api_sends_per_s": round(calls / elapsed, 1),
+            },
+            "steps": {
+                step: {**percentiles(self.latencies[step], 1000), "unit": "ms", "timeouts": self.timeouts[step]}
+                for step in STEPS
+            },
+            "otp_delivery": {**percentiles(self.otp_latencies), "unit": "s", "missing": self.otp_missing},
+            "fakes": {
+                "tempmail_requests": self.tempmail.requests,
+                "tempmail_not_modified": self.tempmail.not_modified,
+                "telegram_injected_failures": self.telegram.failures,
+            },
+        }
+
+
+async def driver_main(args) -> None:
+    from fake_telegram import FakeTelegram
+    from fake_tempmail import FakeTempMail
+
+    telegram = FakeTelegram(latency=args.tg_latency, error_rate=args.tg_error_rate, flood_rate=args.tg_flood_rate)
+    tempmail = FakeTempMail(latency=args.mail_latency, error_rate=args.mail_error_rate)
+    urls = {"telegram": await telegram.start(), "tempmail": await tempmail.start()}
+    print(json.dumps(urls), flush=True)
+
+    loop = asyncio.get_running_loop()
+    stdin = asyncio.StreamReader()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(stdin), sys.stdin)
+    await stdin.readline()                   # "go": the bot is up
+    report = await Driver(args, telegram, tempmail).run()
+    print(json.dumps(report), flush=True)
+    await stdin.readline()                   # EOF: the bot has stopped
+    await telegram.stop()
+    await tempmail.stop()
+
+
+# --- Bot (this process) ---
+
+async def bot_main(args) -> dict:
+    os.environ["USER_DB_PATH"] = ""
+    os.environ["PORT"] = str(args.http_port)
+    os.environ["PARSE_EXECUTOR"] = args.parse_executor
+    import bot
+    from mail_client import TempMailClient
+    from profiler import LoopProfiler
+
+    logging.getLogger().setLevel(args.log_level)
+    child = await asyncio.create_subprocess_exec(
+        sys.executable, os.path.abspath(__file__), "--driver", *sys.argv[1:],
+        stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, limit=2**24,
+    )
+    urls = json.loads(await child.stdout.readline())
+
+    # Keep every lag sample of the run (the bot's default keeps a recent window)
+    bot.profiler = LoopProfiler(slow_threshold=bot.SLOW_CALLBACK_MS / 1000, keep_samples=10**6)
+    bot.mail_client = TempMailClient(base_url=urls["tempmail"], concurrency=bot.POLL_CONCURRENCY,
+                                     request_timeout=bot.POLL_REQUEST_TIMEOUT)
+    application = bot.build_application(TOKEN, base_url=urls["telegram"])
+    await application.initialize()
+    await bot.on_startup(application)
+    await application.start()
+    await application.updater.start_polling(poll_interval=0.0, allowed_updates=bot.subscribed_update_types(application))
+
+    memory_before = memory_status()
+    cpu_started = time.process_time()
+    child.stdin.write(b"go\n")
+    await child.stdin.drain()
+    line = await child.stdout.readline()
+    cpu = time.process_time() - cpu_started
+    memory_after = memory_status()
+    profile = bot.profiler.snapshot()
+
+    await application.updater.stop()
+    await application.stop()
+    await bot.on_shutdown(application)
+    await application.shutdown()
+    child.stdin.close()
+    await child.wait()
+    if not line:
+        raise RuntimeError("the driver process exited without a report")
+
+    report = json.loads(line)
+    report["bot"] = {
+        "cpu_s": round(cpu, 3),
+        "loop_lag_ms": profile["loop_lag"],
+        "slow_callbacks": len(profile["slow_callbacks"]),
+        "memory_start": memory_before,
+        "memory_end": memory_after,
+    }
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=1000)
+    parser.add_argument("--ramp", type=float, default=10.0, help="Seconds over which chats arrive")
+    parser.add_argument("--arrival", choices=("uniform", "poisson", "burst"), default="uniform")
+    parser.add_argument("--mail-delay", type=float, default=5.0, help="Mail arrival delay after /generate (seconds)")
+    parser.add_argument("--tg-latency", type=float, default=0.03, help="Fake Telegram latency per send (seconds)")
+    parser.add_argument("--tg-error-rate", type=float, default=0.0, help="Fraction of sends answered with 500")
+    parser.add_argument("--tg-flood-rate", type=float, default=0.0, help="Fraction of sends answered with 429")
+    parser.add_argument("--mail-latency", type=float, default=0.02, help="Fake tempmail.plus latency (seconds)")
+    parser.add_argument("--mail-error-rate", type=float, default=0.0, help="Fraction of tempmail requests failing")
+    parser.add_argument("--step-timeout", type=float, default=30.0)
+    parser.add_argument("--otp-timeout", type=float, default=60.0)
+    parser.add_argument("--parse-executor", default="thread", choices=("process", "thread", "inline"))
+    parser.add_argument("--http-port", type=int, default=0, help="Port of the bot's health/metrics server (0: any)")
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--driver", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.driver:
+        asyncio.run(driver_main(args))
+        return
+    report = asyncio.run(bot_main(args))
+    report["config"] = {key: value for key, value in vars(args).items() if key not in ("driver", "output")}
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as out:
+            out.write(text + "\n")
+        otp = report["otp_delivery"]
+        print(f"{report['throughput']['updates_per_s']} updates/s, OTP delivery p50 {otp['p50']}s "
+              f"p99 {otp['p99']}s ({otp['missing']} missing), loop lag p99 {report['bot']['loop_lag_ms']['p99_ms']} ms; "
+              f"report written to {args.output}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
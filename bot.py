@@ -1,14 +1,16 @@
-import requests
 import asyncio
+import html
 import random
-import re
 import string
 import datetime
 import time
 import logging
+import os
 import pyotp
+import signal
 import uuid
 from telegram import Update, ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.helpers import escape_markdown
 from telegram.ext import (
     Application, 
     CommandHandler, 
@@ -21,6 +23,24 @@ from telegram.ext import (
 )
 from typing import Optional
 
+from address_pool import AddressPool
+from countdown import BoardTicker, CountdownTicker
+from http_server import HttpServer, create_http_app
+from mail_cache import MailCache
+from mail_client import CIRCUIT_OPEN_ERROR, TempMailClient, new_mails_since
+import metrics
+from models import Mail, Mailbox, UserState
+from outbound import PRIORITY_NORMAL, PRIORITY_OTP, SendQueue
+from parse_pool import ParsePool
+from poll_scheduler import PollScheduler
+from profiler import LoopProfiler
+from pubsub import MailBus
+from senders import SenderIndex
+from sharding import ShardCoordinator
+from stats import UsageStats
+from storage import open_user_store
+from webhook import WebhookIntake, allowed_update_types
+
 # --- 1. CONFIGURATION & SETUP ---
 
 # >>> BOT TOKEN provided by the user <<<
@@ -33,6 +53,29 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Central rate-limited dispatcher for background sends/edits (created in main())
+outbound: Optional[SendQueue] = None
+
+# --- HTTP surface (health checks + metrics), served from the bot's event loop
+HTTP_HOST = "0.0.0.0"
+HTTP_PORT = int(os.environ.get("PORT", 10000))
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN") or None   # Bearer token for /metrics, /debug/profile and full health
+READY_MAX_SWEEP_AGE = 30     # Seconds since the last completed sweep before we report not-ready
+READY_MAX_JOB_LAG = 10       # Seconds a job-queue job may be overdue before we report not-ready
+
+# --- Profiling: loop lag, handler/job timings and stacks of callbacks blocking the loop
+# longer than SLOW_CALLBACK_MS, served on /debug/profile
+SLOW_CALLBACK_MS = float(os.environ.get("SLOW_CALLBACK_MS", 100))
+profiler = LoopProfiler(slow_threshold=SLOW_CALLBACK_MS / 1000)
+
+# --- Update ingestion: "polling" (getUpdates) or "webhook" (served on the HTTP surface above)
+BOT_MODE = os.environ.get("BOT_MODE", "polling")
+WEBHOOK_URL = os.environ.get("WEBHOOK_URL", "")          # Public base URL Telegram posts to
+WEBHOOK_PATH = "/telegram"
+WEBHOOK_SECRET = os.environ.get("WEBHOOK_SECRET") or None
+WEBHOOK_MAX_PENDING = 1000   # Updates queued before the endpoint answers 503 (Telegram retries)
+WEBHOOK_WORKERS = 16         # Updates handled concurrently (per-chat order is kept)
+
 # --- 2. COMMON UI SETUP ---
 
 # Define the keyboard structure for the primary bot's functions
@@ -87,83 +130,90 @@ def format_countdown_message(code: str, time_remaining: int) -> str:
     
     return message
 
+def format_board_message(rows: list, time_remaining: int) -> str:
+    """Formats the live TOTP board: one line per saved key, one shared countdown."""
+    timer_emoji = "🟡"
+    if time_remaining <= 5:
+        timer_emoji = "🔴"
+    elif time_remaining <= 15:
+        timer_emoji = "🟠"
+
+    lines = [f"🔐 <b>2FA Board</b> ({len(rows)} keys)\n"]
+    for label, code in rows:
+        lines.append(f"<b>{html.escape(label)}</b> >> " + (f"<code>{code}</code>" if code else "⚠️ invalid key"))
+    lines.append(f"\n⏳ {timer_emoji} Expires in: {time_remaining:02d} seconds")
+    return "\n".join(lines)
+
+def get_board_inline_markup() -> InlineKeyboardMarkup:
+    """Creates the inline keyboard for the board message."""
+    return InlineKeyboardMarkup([[InlineKeyboardButton("⏹ STOP", callback_data="board_stop")]])
+
 # --- Job Scheduler Functionality (2FA) ---
 
+# Visible countdown granularity (seconds); messages are only edited when the text changes
+COUNTDOWN_EDIT_STEP = 5
+
+# One shared ticker drives every live countdown (instead of one job per chat)
+countdown_ticker = CountdownTicker(format_countdown_message, edit_step=COUNTDOWN_EDIT_STEP)
+
+# Multi-key boards: one live message per chat, driven by the same job and sharing its code cache
+board_ticker = BoardTicker(format_board_message, countdown_ticker.codes, edit_step=COUNTDOWN_EDIT_STEP)
+
 # --- HELPER FUNCTION TO STOP ACTIVE JOBS ---
 async def stop_active_otp_job(chat_id: int, context: ContextTypes.DEFAULT_TYPE) -> bool:
     """
-    Stops the currently running OTP countdown job for a chat.
+    Stops the currently running OTP countdown for a chat.
     Does NOT edit the message; the calling function or the claimant handler handles that.
     """
-    jobs = context.job_queue.get_jobs_by_name(f'otp_countdown_{chat_id}')
-    
-    if jobs:
-        job = jobs[0]
-        # Stop the recurring job
-        job.schedule_removal()
+    if countdown_ticker.stop(chat_id):
         logger.info(f"OTP job for chat {chat_id} stopped.")
         return True
             
     return False
 
 async def countdown_job(context: CallbackContext) -> None:
-    """The recurring job that calculates remaining time and edits the message."""
-    job = context.job
-    chat_id = job.data['chat_id']
-    message_id = job.data['message_id']
-    secret_key = job.data['secret_key']
-    
-    code, time_remaining = calculate_totp(secret_key)
-
-    if code is None:
-        job.schedule_removal()
-        logger.error(f"Job failed for chat {chat_id}. Removing job.")
-        return
+    """The shared 1-second job that advances every countdown and edits changed messages."""
+
+    async def edit(chat_id, message_id, text, secret_key):
+        # Queued, not awaited: pending edits to the same message are coalesced
+        future = outbound.edit_message_text(
+            chat_id,
+            message_id,
+            text,
+            parse_mode='HTML',
+            reply_markup=get_otp_inline_markup(secret_key) # Attach the inline button
+        )
+        future.add_done_callback(
+            lambda f: f.cancelled() or f.exception() is None or countdown_ticker.discard(chat_id, message_id)
+        )
 
-    if time_remaining > 0:
-        message = format_countdown_message(code, time_remaining)
-        
-        try:
-            await context.bot.edit_message_text(
-                chat_id=chat_id,
-                message_id=message_id,
-                text=message,
-                parse_mode='HTML',
-                reply_markup=get_otp_inline_markup(secret_key) # Attach the inline button
-            )
-        except Exception as e:
-            logger.warning(f"Failed to edit message {message_id} in chat {chat_id}: {e}")
-            job.schedule_removal() 
-            
-    elif time_remaining == 0:
-        final_message = (
-            "🔴 <b>CODE EXPIRED!</b> 🔴\n\n"
-            "Your previous code has refreshed. Please send the secret key again "
-            "or press the '2FA Authenticator' button to request a new code."
+    async def edit_board(chat_id, message_id, text):
+        future = outbound.edit_message_text(
+            chat_id, message_id, text, parse_mode='HTML', reply_markup=get_board_inline_markup()
+        )
+        future.add_done_callback(
+            lambda f: f.cancelled() or f.exception() is None or board_ticker.discard(chat_id, message_id)
         )
-        try:
-            await context.bot.edit_message_text(
-                chat_id=chat_id,
-                message_id=message_id,
-                text=final_message,
-                parse_mode='HTML',
-                reply_markup=None
-            )
-        except Exception as e:
-            logger.warning(f"Failed to send final expired message: {e}")
 
-        job.schedule_removal()
-        logger.info(f"Job finished and removed for chat {chat_id}.")
+    await countdown_ticker.tick(edit)
+    await board_ticker.tick(edit_board)
+
+
+def ensure_countdown_ticker(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Schedules the shared countdown job once."""
+    if not context.job_queue.get_jobs_by_name('otp_countdown_ticker'):
+        context.job_queue.run_repeating(profiler.timed(countdown_job), interval=1.0, first=1.0, name='otp_countdown_ticker')
+        logger.info("Shared countdown ticker scheduled.")
 
 
 async def start_countdown(update: Update, context: ContextTypes.DEFAULT_TYPE, secret_key: str) -> None:
-    """Initial function to send the first message and schedule the recurring job."""
+    """Initial function to send the first message and register it with the shared ticker."""
     chat_id = update.effective_chat.id
     
-    # Stop any existing job before starting a new one (prevents two jobs running)
+    # Stop any existing countdown before starting a new one (prevents two running)
     await stop_active_otp_job(chat_id, context)
 
-    initial_code, initial_time_remaining = calculate_totp(secret_key)
+    initial_code, initial_time_remaining = countdown_ticker.current(secret_key)
     
     if initial_code is None or initial_time_remaining == 0:
         error_message = "⚠️ <b>Error:</b> Could not generate initial code. Please try again."
@@ -178,20 +228,9 @@ async def start_countdown(update: Update, context: ContextTypes.DEFAULT_TYPE, se
         parse_mode='HTML'
     )
     
-    job_data = {
-        'chat_id': chat_id,
-        'message_id': initial_message.message_id,
-        'secret_key': secret_key,
-    }
-
-    context.job_queue.run_repeating(
-        countdown_job,
-        interval=1.0, 
-        first=1.0,     
-        data=job_data,
-        name=f'otp_countdown_{chat_id}'
-    )
-    logger.info(f"Countdown job scheduled for chat {chat_id}.")
+    countdown_ticker.start(chat_id, initial_message.message_id, secret_key, initial_message_text)
+    ensure_countdown_ticker(context)
+    logger.info(f"Countdown started for chat {chat_id}.")
 
 # --- NEW HANDLER FOR CLAIMED BUTTON ---
 async def claim_otp_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -210,8 +249,13 @@ async def claim_otp_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
     claimed_message = "✅ <b>OTP CLAIMED!</b> 🧧\n\nThis code has been manually marked as claimed/used."
     
     try:
-        await query.edit_message_text(
-            text=claimed_message,
+        # Queued under the countdown's edit key: it replaces a countdown edit still
+        # waiting for the message, and goes out after one already being sent
+        await outbound.edit_message_text(
+            chat_id,
+            message_id,
+            claimed_message,
+            priority=PRIORITY_NORMAL,
             parse_mode='HTML',
             reply_markup=None
         )
@@ -220,120 +264,283 @@ async def claim_otp_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
         logger.warning(f"Failed to edit OTP message {message_id} to CLAIMED: {e}")
 
 
+# --- Multi-key TOTP board ---
+
+# A pasted line is only taken as a key if it follows the documented format (so stray text is skipped)
+BASE32_CHARS = frozenset(string.ascii_uppercase + "234567")
+MIN_SECRET_LENGTH = 16
+
+def parse_board_entries(text: str) -> tuple[list, int]:
+    """
+    Parses one secret key per line, optionally labelled ("GitHub: ABCD EFGH ...").
+    Returns ([(label, secret), ...], number of invalid lines).
+    """
+    entries, invalid = [], 0
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        label, _, secret = line.rpartition(":")
+        secret = secret.replace(' ', '').upper()
+        if len(secret) < MIN_SECRET_LENGTH or not BASE32_CHARS.issuperset(secret.rstrip("=")) \
+                or calculate_totp(secret)[0] is None:
+            invalid += 1
+            continue
+        entries.append((label.strip() or f"{secret[:4]}…{secret[-4:]}", secret))
+    return entries, invalid
+
+async def post_board(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Sends the chat's board as a new live message (the previous one stops updating)."""
+    chat_id = update.effective_chat.id
+    text = board_ticker.text(chat_id)
+    if text is None:
+        await update.message.reply_text(
+            "🔐 <b>2FA Board</b> is empty.\n\n"
+            "Send several secret keys, one per line (optionally <code>Label: KEY</code>), "
+            "or use <code>/board add Label: KEY</code>.",
+            parse_mode='HTML', reply_markup=REPLY_MARKUP
+        )
+        return
+    message = await update.message.reply_text(text, parse_mode='HTML', reply_markup=get_board_inline_markup())
+    board_ticker.attach(chat_id, message.message_id, text)
+    ensure_countdown_ticker(context)
+    logger.info(f"TOTP board with {len(board_ticker.entries(chat_id))} keys posted for chat {chat_id}.")
+
+async def add_board_entries(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str) -> None:
+    """Adds every valid key in `text` to the chat's board and reposts it."""
+    chat_id = update.effective_chat.id
+    entries, invalid = parse_board_entries(text)
+    added = sum(1 for label, secret in entries if board_ticker.add(chat_id, label, secret))
+    notes = []
+    if invalid:
+        notes.append(f"⚠️ {invalid} line(s) skipped: not a valid 2FA secret key.")
+    if added < len(entries):
+        notes.append(f"⚠️ Board is full ({board_ticker.max_entries} keys); {len(entries) - added} key(s) not added.")
+    if notes:
+        await update.message.reply_text("\n".join(notes), parse_mode='HTML', reply_markup=REPLY_MARKUP)
+    await post_board(update, context)
+
+async def board_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """/board [add <keys> | remove <label> | clear | stop]: manages the live multi-key TOTP board."""
+    chat_id = update.effective_chat.id
+    action = context.args[0].lower() if context.args else ""
+
+    if action == "add":
+        parts = update.message.text.split(None, 2)
+        await add_board_entries(update, context, parts[2] if len(parts) > 2 else "")
+    elif action == "remove":
+        label = " ".join(context.args[1:])
+        if board_ticker.remove(chat_id, label):
+            await post_board(update, context)
+        else:
+            await update.message.reply_text(
+                f"No key labelled <b>{html.escape(label)}</b> on your board.", parse_mode='HTML', reply_markup=REPLY_MARKUP
+            )
+    elif action == "clear":
+        board_ticker.clear(chat_id)
+        await update.message.reply_text("🗑 Board cleared.", reply_markup=REPLY_MARKUP)
+    elif action == "stop":
+        board_ticker.detach(chat_id)
+        await update.message.reply_text("⏹ Board stopped. Send /board to show it again.", reply_markup=REPLY_MARKUP)
+    else:
+        await post_board(update, context)
+
+async def board_stop_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handles the inline '⏹ STOP' button on the board message (the keys are kept)."""
+    query = update.callback_query
+    await query.answer(text="Board stopped.", show_alert=False)
+    board_ticker.discard(query.message.chat_id, query.message.message_id)
+    try:
+        # Through the queue, so it supersedes any board edit still pending for the message
+        await outbound.edit_message_text(
+            query.message.chat_id, query.message.message_id, "⏹ <b>2FA Board stopped.</b>\n\nSend /board to show it again.",
+            priority=PRIORITY_NORMAL, parse_mode='HTML', reply_markup=None
+        )
+    except Exception as e:
+        logger.warning(f"Failed to edit board message {query.message.message_id} to stopped: {e}")
+
+
 # ==============================================================================
 # 4. CORE LOGIC FOR BOT 2 (Temp Mail Service)
 # ==============================================================================
 
 # --- User storage (Merged Global Data)
-user_data = {}
-
-# --- Known Sender Domain Mapping
-KNOWN_SENDERS = {
-    'google.com': 'Google',
-    'registration@facebookmail.com': 'Facebook',
-    'meta.com': 'Meta (Facebook)',
-    'twitter.com': 'X (Twitter)',
-    'discord.com': 'Discord',
-    'amazon.com': 'Amazon',
-    'microsoft.com': 'Microsoft',
-    'apple.com': 'Apple',
-    'noreply@telegram.org': 'Telegram',
-    'instagram.com': 'Instagram',
-    'tiktok.com': 'TikTok',
-    'netflix.com': 'Netflix',
-    'steamcommunity.com': 'Steam',
-    'reddit.com': 'Reddit',
-    'paypal.com': 'PayPal',
-    'snapchat.com': 'Snapchat',
-    'spotify.com': 'Spotify',
-    'linkedin.com': 'LinkedIn',
-    'uber.com': 'Uber',
-    'noreply@tm.openai.com': 'Chat Gpt'
-}
-
-def generate_random_name(min_len=6, max_len=12):
-    """Generates a random username with a mix of letters and numbers."""
-    chars = string.ascii_letters + string.digits
-    length = random.randint(6, 12) 
-    return ''.join(random.choice(chars) for _ in range(length)).lower()
+# Persistent SQLite store (WAL); set USER_DB_PATH="" to keep state in memory only
+USER_DB_PATH = os.environ.get("USER_DB_PATH", "user_data.db")
+user_store = open_user_store(USER_DB_PATH)
+
+# --- Inbox polling
+POLL_MAX_SLEEP = 3           # Upper bound on how long the poller sleeps between checks
+POLL_CONCURRENCY = 50        # Max concurrent tempmail.plus requests
+POLL_REQUEST_TIMEOUT = 10    # Per-request deadline (seconds)
+
+# Shared pooled keep-alive client used by every inbox poll
+mail_client = TempMailClient(concurrency=POLL_CONCURRENCY, request_timeout=POLL_REQUEST_TIMEOUT)
+
+# Per-mailbox adaptive schedule, keyed by email address
+poll_scheduler = PollScheduler()
+
+# Chats watching each polled address (one upstream request even if shared)
+mailbox_subscribers = {}
+
+# Sharded polling: with POLL_WORKERS > 0 mailboxes are polled by that many local
+# worker processes (poll_worker.py), assigned by consistent hashing of chat_id
+POLL_WORKERS = int(os.environ.get("POLL_WORKERS", 0))
+shard_coordinator: Optional[ShardCoordinator] = None
+
+# --- Multi-address inboxes
+MAX_ADDRESSES_PER_CHAT = 20
+
+# --- Random addresses come from a pre-generated, background-refilled pool; issued names are
+# tracked in a Bloom filter kept in the user store, so no name is handed out twice
+ADDRESS_POOL_SIZE = int(os.environ.get("ADDRESS_POOL_SIZE", 200))
+ADDRESS_POOL_WARM = os.environ.get("ADDRESS_POOL_WARM", "1") == "1"   # Check each address is empty upstream first
+address_pool = AddressPool(
+    user_store,
+    size=ADDRESS_POOL_SIZE,
+    low_water=ADDRESS_POOL_SIZE // 4,
+    warm=(lambda email: warm_address(email)) if ADDRESS_POOL_WARM else None,
+)
+
+# HTML bodies are converted only up to this many characters (OTPs sit near the top;
+# the preview needs 500)
+MAIL_TEXT_LIMIT = 5000
+
+# --- Mail parsing (HTML conversion, sender names, OTP extraction) runs on a worker pool:
+# PARSE_EXECUTOR is "process", "thread" or "inline"; small plaintext mails are always parsed inline
+PARSE_EXECUTOR = os.environ.get("PARSE_EXECUTOR", "process")
+PARSE_WORKERS = int(os.environ.get("PARSE_WORKERS", min(4, os.cpu_count() or 1)))
+
+# --- Mail cache (backs /inbox and /mail without re-fetching from tempmail.plus)
+mail_cache = MailCache()
+INBOX_PAGE_SIZE = 5
+MAIL_VIEW_LIMIT = 3500       # Body characters shown by /mail (Telegram caps messages at 4096)
+
+# --- New mail pub/sub: the poller publishes each chat's parsed mails, handlers subscribe
+mail_bus = MailBus()
+
+# --- Known sender names (built-ins in senders.py; SENDERS_CONFIG adds to them, re-read on change)
+SENDERS_CONFIG = os.environ.get("SENDERS_CONFIG", "")
+sender_index = SenderIndex(config_path=SENDERS_CONFIG or None)
+parse_pool = ParsePool(sender_index, kind=PARSE_EXECUTOR, workers=PARSE_WORKERS, text_limit=MAIL_TEXT_LIMIT)
+
+# --- Admin stats: rolling usage counters updated on the hot paths, read by /stats and the
+# Admin Stats button; ADMIN_IDS is a comma-separated list of Telegram user IDs allowed to see them
+ADMIN_IDS = frozenset(int(value) for value in os.environ.get("ADMIN_IDS", "").replace(" ", "").split(",") if value)
+usage_stats = UsageStats()
 
 def generate_email(username_prefix=None):
-    """Generate random or custom mailto.plus address."""
+    """Generate random (from the address pool) or custom mailto.plus address."""
     if username_prefix and username_prefix.isalnum():
-        name = username_prefix
+        return address_pool.custom(username_prefix)
+    return address_pool.take()[0]
+
+async def warm_address(email: str) -> bool:
+    """Pool check before an address is handed out: usable only if its inbox is empty upstream."""
+    inbox = await mail_client.fetch_inbox(email)
+    if "error" in inbox or not inbox["mail_list"]:
+        return True
+    mail_client.forget(email)
+    return False
+
+def initialize_user_data(chat_id):
+    """Ensures necessary keys exist for a new user and returns their record."""
+    return user_store.ensure(chat_id)
+
+
+def add_mailbox(chat_id: int, data: UserState, email: str) -> None:
+    """Adds an address to a chat's live mailboxes and starts polling it."""
+    mailboxes = data.mailboxes
+    if email not in mailboxes:
+        mailboxes[email] = Mailbox()
+    data.active = email
+    # Keep at most MAX_ADDRESSES_PER_CHAT addresses: drop the oldest
+    while len(mailboxes) > MAX_ADDRESSES_PER_CHAT:
+        remove_mailbox(chat_id, data, next(iter(mailboxes)))
+    user_store.save(chat_id)
+    mailbox_subscribers.setdefault(email, set()).add(chat_id)
+    if shard_coordinator is not None:
+        shard_coordinator.watch(chat_id, email)
     else:
-        name = generate_random_name() 
-    return f"{name}@mailto.plus"
+        poll_scheduler.add(email)
 
-def fetch_inbox(email):
-    """Fetch inbox for given email."""
-    url = f"https://tempmail.plus/api/mails?email={email}&first_id=0&epin="
-    try:
-        res = requests.get(url, headers={"accept": "application/json"}, timeout=10)
-        res.raise_for_status() 
-        return res.json()
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Error fetching inbox for {email}: {e}")
-        return {"error": str(e)}
-
-def format_sender_name(sender_string):
-    """Extracts a clean name or identifies a known service from the sender string."""
-    email_match = re.search(r'<([^@]+@[^>]+)>', sender_string)
-    
-    if email_match:
-        email_address = email_match.group(1)
-        domain = email_address.split('@')[-1]
-        
-        # 1. Check for Known Services
-        if domain in KNOWN_SENDERS:
-            return KNOWN_SENDERS[domain]
-        
-        # 2. Extract Name if it exists
-        match_name = re.match(r'^(.*?) <.*?>$', sender_string)
-        if match_name:
-            clean_name = match_name.group(1).strip()
-            if clean_name:
-                return clean_name
-
-    # 3. Fallback to the original string
-    return sender_string.replace("<", " ").replace(">", "").strip()
-
-def extract_otp(subject, content):
-    """Searches subject and content for a 4-8 digit OTP."""
-    otp_pattern = re.compile(
-        r'(?:OTP|CODE|PIN|verification|one[\s_-]time).*?(\d{4,8})' 
-        r'|(\b\d{4,8}\b)'
-    , re.IGNORECASE | re.DOTALL)
-    
-    match = otp_pattern.search(subject)
-    if match:
-        return match.group(1) or match.group(2)
 
-    match = otp_pattern.search(content)
-    if match:
-        return match.group(1) or match.group(2)
-        
-    return None
+def remove_mailbox(chat_id: int, data: UserState, email: str) -> None:
+    """Removes an address from a chat; polling stops once no chat watches it."""
+    data.mailboxes.pop(email, None)
+    if data.active not in data.mailboxes:
+        data.active = next(reversed(data.mailboxes), None)
+    user_store.save(chat_id)
+    if shard_coordinator is not None:
+        shard_coordinator.unwatch(chat_id, email)
+    chats = mailbox_subscribers.get(email)
+    if chats is not None:
+        chats.discard(chat_id)
+        if not chats:
+            drop_mailbox(email)
 
-def initialize_user_data(chat_id):
-    """Ensures necessary keys exist for a new user."""
-    if chat_id not in user_data:
-        user_data[chat_id] = {"emails": [], "active": None, "last_seen_id": None, "username": None, "auto_gen_on": False}
+
+def drop_mailbox(email: str) -> None:
+    """Stops polling an address entirely."""
+    mailbox_subscribers.pop(email, None)
+    poll_scheduler.remove(email)
+    mail_client.forget(email)
 
 
-async def generate_new_email_logic(chat_id: int, username_prefix: str, update: Update, context: ContextTypes.DEFAULT_TYPE, is_callback: bool):
-    """Central logic for generating a new email, used by both button and command."""
+def generate_emails(username_prefix, count: int, exclude=()) -> list:
+    """
+    Generates `count` addresses not in `exclude`; with a custom prefix, extra
+    ones get a numeric suffix (suffixes already in `exclude` are skipped).
+    """
+    if not (username_prefix and username_prefix.isalnum()):
+        return address_pool.take(count)
+    emails = []
+    suffix = 1
+    while len(emails) < count:
+        email = generate_email(username_prefix if suffix == 1 else f"{username_prefix}{suffix}")
+        suffix += 1
+        if email not in exclude:
+            emails.append(email)
+    return emails
+
+
+def format_mailbox_list(data: UserState) -> str:
+    """Lists a chat's live addresses, newest last."""
+    if not data.mailboxes:
+        return "❌ You haven’t generated any emails yet."
+    text = f"📜 *Your active emails ({len(data.mailboxes)}):*\n\n"
+    text += "\n".join(f"• `{email}`" for email in data.mailboxes)
+    return text
+
+
+async def generate_new_email_logic(chat_id: int, username_prefix: str, update: Update, context: ContextTypes.DEFAULT_TYPE, is_callback: bool, count: int = 1, replace: bool = True):
+    """
+    Central logic for generating new emails, used by both button and command.
+    With `replace` the new address(es) replace the current ones; otherwise
+    `count` addresses are added next to the existing ones.
+    """
     # --- Stop 2FA Job on any Temp Mail action (using the simpler stop job) ---
     await stop_active_otp_job(chat_id, context)
 
-    email = generate_email(username_prefix)
+    data = user_store.ensure(chat_id)
+    # When adding, skip addresses the chat already watches so `count` are really new
+    emails = generate_emails(username_prefix, count, exclude=() if replace else data.mailboxes)
 
-    # Clear existing entries and start fresh with only one email in history
-    user_data[chat_id]["emails"] = [email]
-    user_data[chat_id]["active"] = email
-    user_data[chat_id]["last_seen_id"] = None 
+    if replace:
+        # Clear existing entries and start fresh with only the new addresses
+        for email in list(data.mailboxes):
+            remove_mailbox(chat_id, data, email)
+    for email in emails:
+        add_mailbox(chat_id, data, email)
     
-    response_text = f"〽️New Web Mail Generated:\n`{email}`\n⏰Wait 3-4 Second For The Otp"
+    if replace and count == 1:
+        response_text = f"〽️New Web Mail Generated:\n`{emails[0]}`\n⏰Wait 3-4 Second For The Otp"
+    else:
+        response_text = (
+            f"〽️{count} New Web Mail{'s' if count > 1 else ''} Generated:\n"
+            + "\n".join(f"`{email}`" for email in emails)
+            + f"\n\nYou are now watching {len(data.mailboxes)} addresses.\n⏰Wait 3-4 Second For The Otp"
+        )
 
     if is_callback:
         # Use a try/except to handle the CallbackQuery update when the original message is too old
@@ -369,115 +576,354 @@ def get_tempmail_inline_markup():
     ]
     return InlineKeyboardMarkup(buttons)
 
+def format_admin_stats() -> str:
+    """Admin stats view; every figure is an O(1) gauge or a read of the rolling counters."""
+    snapshot = usage_stats.snapshot()
+    breaker = mail_client.breaker.snapshot()
+    lag = profiler.lag.summary()
+    uptime = datetime.timedelta(seconds=snapshot["uptime"])
+
+    def rates(name: str) -> str:
+        entry = snapshot[name]
+        return f"{entry['per_min_1m']:g} / {entry['per_min_15m']:g} / {entry['per_min_60m']:g}  (total {entry['total']})"
+
+    errors = snapshot["upstream_error_rate"]
+    lines = [
+        f"📊 <b>Admin Stats</b> (up {uptime})\n",
+        f"📬 Active mailboxes: <b>{len(mailbox_subscribers)}</b>",
+        f"⏳ Countdowns running: <b>{len(countdown_ticker)}</b>, TOTP boards: <b>{len(board_ticker)}</b>",
+        f"📤 Outbound queue: {len(outbound) if outbound else 0}, address pool: {len(address_pool)}\n",
+        "<i>Per minute over the last 1 / 15 / 60 min</i>",
+        f"📩 Mails: {rates('mails')}",
+        f"🔐 OTPs: {rates('otps')}",
+        f"♻️ Auto-gen: {rates('auto_generated')}",
+        f"🌐 Upstream polls: {rates('upstream_requests')}",
+        f"⚠️ Upstream errors: {errors['1m']:.1%} / {errors['15m']:.1%} / {errors['60m']:.1%} "
+        f"(breaker {html.escape(str(breaker['state']))})\n",
+        "🏷 <b>Top senders</b> (last hour)",
+    ]
+    top = snapshot["top_senders"]
+    lines += [f"{n}. {html.escape(name)}: {count}" for n, (name, count) in enumerate(top, 1)] or ["—"]
+    lines.append(f"\n🐢 Loop lag p99 {lag['p99_ms']} ms, max {lag['max_ms']} ms, slow callbacks: {len(profiler.slow)}")
+    return "\n".join(lines)
+
+def format_inbox_page(chat_id: int, page: int):
+    """Returns the text and inline keyboard for one page of a chat's cached mails."""
+    mails = mail_cache.list(chat_id)
+    if not mails:
+        return "📭 No mails yet. New mails show up here once they arrive.", None
+    pages = (len(mails) + INBOX_PAGE_SIZE - 1) // INBOX_PAGE_SIZE
+    page = max(0, min(page, pages - 1))
+    start = page * INBOX_PAGE_SIZE
+
+    buttons = []
+    for n, entry in enumerate(mails[start:start + INBOX_PAGE_SIZE], start + 1):
+        label = f"{n}. {'🔐 ' if entry.otp else ''}{entry.sender}: {entry.subject}"
+        buttons.append([InlineKeyboardButton(label[:60], callback_data=f"mail:{entry.mail_id}")])
+    nav = []
+    if page > 0:
+        nav.append(InlineKeyboardButton("◀️ Newer", callback_data=f"inbox:{page - 1}"))
+    if page < pages - 1:
+        nav.append(InlineKeyboardButton("Older ▶️", callback_data=f"inbox:{page + 1}"))
+    if nav:
+        buttons.append(nav)
+
+    text = f"📥 *Inbox* ({len(mails)} mails, page {page + 1}/{pages})\n\nTap a mail to open it, or use `/mail <n>`."
+    return text, InlineKeyboardMarkup(buttons)
+
+
+def format_cached_mail(chat_id: int, entry):
+    """Returns the text and inline keyboard showing one cached mail in full."""
+    position = next(n for n, cached in enumerate(mail_cache.list(chat_id)) if cached is entry)
+    body = entry.body.replace("`", "'").strip() or "--- Mail body was empty ---"
+    if len(body) > MAIL_VIEW_LIMIT:
+        body = body[:MAIL_VIEW_LIMIT] + "..."
+    received = datetime.datetime.fromtimestamp(entry.received).strftime("%Y-%m-%d %H:%M")
+    text = (
+        f"📩 *Subject:* {escape_markdown(entry.subject or 'No Subject')}\n"
+        f"*From:* {escape_markdown(entry.sender)}\n"
+        f"*To:* `{entry.email}`\n"
+        f"*Received:* {received}\n"
+        + (f"*OTP:* `{entry.otp}`\n" if entry.otp else "")
+        + f"\n```\n{body}\n```"
+    )
+    back = InlineKeyboardButton("⬅️ Back to inbox", callback_data=f"inbox:{position // INBOX_PAGE_SIZE}")
+    return text, InlineKeyboardMarkup([[back]])
+
+
 # -------------------------------
 # 🔄 Auto-fetch task (Runs in background)
 # -------------------------------
+# New mail is published per chat on mail_bus; these subscribers run in this order
+
+@mail_bus.subscribe
+async def cache_new_mail(chat_id: int, mails: list) -> None:
+    """Keeps new mails browsable through /inbox and /mail."""
+    for mail in mails:
+        mail_cache.put(chat_id, mail.email, mail.mail_id, mail.sender, mail.subject, mail.otp, mail.content)
+
+
+@mail_bus.subscribe
+async def announce_new_mail(chat_id: int, mails: list) -> None:
+    """Announces a chat's new mails (merged from all its addresses, oldest first)."""
+    data = user_store.get(chat_id)
+    multi = data is not None and len(data.mailboxes) > 1
+
+    for mail in mails:
+        is_otp_mail = bool(mail.otp)
+        metrics.MAILS_RECEIVED.inc()
+        if is_otp_mail:
+            metrics.OTPS_EXTRACTED.inc()
+        usage_stats.mail(mail.sender, is_otp_mail, sender_index.services)
+
+        # Say which address received it when the chat watches several
+        to_line = f"*To:* `{mail.email}`\n" if multi else ""
+
+        if is_otp_mail:
+            msg = (
+                f"🚨 *NEW OTP RECEIVED!* 🔐\n\n"
+                f"{to_line}"
+                f"*Subject:* {mail.subject}\n\n"
+                f"*OTP:* >`{mail.otp}`\n\n"
+                f"*NONE MAIL*"
+            )
+        else:
+            msg = (
+                f"📩 *New Mail Received!*\n\n"
+                f"{to_line}"
+                f"*Subject:* {mail.subject}\n\n"
+                f"*OTP:* >`{mail.otp}`\n\n"
+                f"*NONE MAIL*"
+            )
+
+        # Queued through the rate-limited dispatcher; OTPs jump the queue
+        outbound.send_message(
+            chat_id,
+            msg,
+            priority=PRIORITY_OTP if is_otp_mail else PRIORITY_NORMAL,
+            parse_mode="Markdown"
+        )
+
+
+@mail_bus.subscribe
+async def auto_generate_addresses(chat_id: int, mails: list) -> None:
+    """With auto-generation on, replaces every address that received mail (each at most once)."""
+    data = user_store.get(chat_id)
+    if not mails or data is None or not data.auto_gen_on:
+        return
+    replaced = []
+    for email in dict.fromkeys(mail.email for mail in mails):
+        if email not in data.mailboxes:
+            continue
+        new_email = generate_email(data.username)
+        remove_mailbox(chat_id, data, email)
+        add_mailbox(chat_id, data, new_email)
+        replaced.append(new_email)
+
+    if replaced:
+        usage_stats.auto_generation(len(replaced))
+        text = (
+            f"♻️ **Auto-Generated New Email!** ♻️\n\n"
+            f"The previous address was replaced. Your new active email is:\n"
+            + "\n".join(f"• `{new_email}`" for new_email in replaced)
+        )
+        outbound.send_message(
+            chat_id,
+            text,
+            parse_mode="Markdown",
+            reply_markup=get_tempmail_inline_markup()
+        )
+
+
+async def poll_sweep(app: Application):
+    """Fetches every due inbox concurrently and fans the results in per chat."""
+    with metrics.SWEEP_DURATION.time(), profiler.track("poll_sweep"):
+        await _poll_sweep(app)
+
+
+async def _poll_sweep(app: Application):
+    popped = poll_scheduler.pop_due()
+    try:
+        await _sweep_due(app, popped)
+    finally:
+        # A sweep that failed part-way leaves mailboxes in flight: retry those shortly
+        # (defer() leaves the ones already rescheduled alone)
+        for email in popped:
+            poll_scheduler.defer(email, random.uniform(1, 2 * POLL_MAX_SLEEP))
+
+
+async def _sweep_due(app: Application, popped: list):
+    due = {}
+    for email in popped:
+        chats = [
+            chat_id for chat_id in mailbox_subscribers.get(email, ())
+            if email in getattr(user_store.get(chat_id), "mailboxes", ())
+        ]
+        # Drop schedule entries for addresses that are no longer watched
+        if not chats:
+            drop_mailbox(email)
+            continue
+        due[email] = chats
+    if not due:
+        return
+    metrics.SWEEP_MAILBOXES.inc(len(due))
+
+    # One request per address even when shared; the oldest cursor wins so nobody misses mail
+    cursors = {}
+    for email, chats in due.items():
+        seen = [user_store.get(chat_id).mailboxes[email].cursor for chat_id in chats]
+        cursors[email] = None if None in seen else min(seen)
+    inboxes = await mail_client.fetch_many(cursors)
+
+    # Mailboxes shed by the circuit breaker were never polled: retry them later, spread out
+    failed = [email for email, inbox in inboxes.items() if "error" in inbox]
+    shed = {email for email in failed if inboxes[email]["error"] == CIRCUIT_OPEN_ERROR}
+    usage_stats.upstream(len(inboxes) - len(shed), len(failed) - len(shed))
+    for email in shed:
+        poll_scheduler.defer(email, random.uniform(1, 2 * POLL_MAX_SLEEP))
+
+    new_by_chat = collect_new_mail(
+        {email: inboxes[email].get("mail_list") or [] for email in due if email not in shed}, due
+    )
+    got_mail = {email for mails in new_by_chat.values() for email, _ in mails}
+
+    # The list only carries metadata: fetch each new body once, however many chats share it
+    wanted = list({(email, mail.mail_id) for mails in new_by_chat.values() for email, mail in mails})
+    bodies = dict(zip(wanted, await asyncio.gather(*(mail_client.fetch_mail(email, mail_id) for email, mail_id in wanted))))
+
+    # A mail whose body failed (timeout, 5xx, circuit open) stays unseen and is retried on the
+    # next poll, together with the newer mails of its address so the high-water mark never passes it
+    retry_from = {}
+    for (email, mail_id), body in bodies.items():
+        if "error" in body:
+            retry_from[email] = min(mail_id or 0, retry_from.get(email, mail_id or 0))
+    for chat_id, mails in list(new_by_chat.items()):
+        merged = [
+            (email, Mail.with_body(mail, bodies[(email, mail.mail_id)])) for email, mail in mails
+            if email not in retry_from or (mail.mail_id or 0) < retry_from[email]
+        ]
+        if merged:
+            new_by_chat[chat_id] = merged
+        else:
+            del new_by_chat[chat_id]
+    await notify_new_mail(app, new_by_chat)
+
+    for email in due:
+        if email in mailbox_subscribers and email not in shed:
+            poll_scheduler.record(email, email in got_mail)
+
+
+def collect_new_mail(inboxes: dict, chats_by_email: dict) -> dict:
+    """
+    Finds each watching chat's new mails in `inboxes` (email -> MailHeader
+    list, newest first). Returns chat_id -> [(email, mail), ...]; nothing is
+    marked seen until notify_new_mail() has published it.
+    """
+    new_by_chat = {}
+    for email, mail_list in inboxes.items():
+        for chat_id in chats_by_email[email]:
+            data = user_store.get(chat_id)
+            # Skip chats that dropped the address while the poll was in flight
+            mailbox = data.mailboxes.get(email) if data is not None else None
+            if mailbox is None:
+                continue
+            new_mails = new_mails_since(mail_list, mailbox)
+            if new_mails:
+                new_by_chat.setdefault(chat_id, []).extend((email, mail) for mail in new_mails)
+    return new_by_chat
+
+
+def mark_seen(chat_id: int, mails: list) -> None:
+    """Advances a chat's cursors past mails it was just sent ([(email, mail), ...])."""
+    data = user_store.get(chat_id)
+    if data is None:
+        return
+    for email, mail in mails:
+        # Auto-generation may have replaced the address meanwhile
+        mailbox = data.mailboxes.get(email)
+        if mailbox is not None:
+            mailbox.mark(mail.mail_id)
+    user_store.save(chat_id)
+
+
+async def notify_new_mail(app: Application, new_by_chat: dict) -> None:
+    """
+    Parses every new mail once (however many chats share it) and publishes
+    each chat's batch, marking it seen only once published: a sweep that
+    fails before then is retried without losing mail.
+    """
+    unique = {}
+    for mails in new_by_chat.values():
+        for email, mail in mails:
+            unique.setdefault((email, mail.mail_id), (email, mail))
+    # Heavy mails are parsed on the pool, so a burst does not stall the event loop
+    parsed = dict(zip(unique, await parse_pool.parse(list(unique.values()))))
+
+    for chat_id, mails in new_by_chat.items():
+        # One chronological notification stream per chat
+        mails.sort(key=lambda item: item[1].mail_id or 0)
+        await mail_bus.publish(chat_id, [parsed[(email, mail.mail_id)] for email, mail in mails])
+        mark_seen(chat_id, mails)
+
+
+async def schedule_stored_mailboxes():
+    """Re-registers persisted active addresses with the poller, streamed in the background."""
+    count = 0
+    async for chat_id, data in user_store.iter_active():
+        for email in data.mailboxes:
+            mailbox_subscribers.setdefault(email, set()).add(chat_id)
+            if shard_coordinator is not None:
+                shard_coordinator.watch(chat_id, email)
+                count += 1
+            elif email not in poll_scheduler:
+                # Spread the first polls so a restart does not burst the upstream
+                poll_scheduler.add(email, delay=random.uniform(0, POLL_MAX_SLEEP))
+                count += 1
+    logger.info(f"Restored {count} active mailboxes from storage.")
+
+
+# Monotonic time of the last completed auto_fetch sweep (for readiness checks)
+last_sweep_completed: Optional[float] = None
+
 async def auto_fetch(app: Application):
     """Background task to poll inboxes and notify users."""
+    global last_sweep_completed
     logger.info("Auto-fetch task started.")
+    if shard_coordinator is not None:
+        await sharded_fetch(app)
+        return
+    await mail_client.start()
+    asyncio.create_task(schedule_stored_mailboxes())
     while True:
-        # Create a copy of user_data keys to safely iterate while items might be updated
-        for chat_id, data in list(user_data.items()):
-            email = data.get("active")
-            if not email:
-                continue
+        # Pause polling globally while the upstream circuit breaker is open
+        pause = mail_client.breaker.retry_in()
+        if pause:
+            await asyncio.sleep(pause)
+            last_sweep_completed = time.monotonic()
+            continue
+        try:
+            await poll_sweep(app)
+            last_sweep_completed = time.monotonic()
+        except Exception as e:
+            logger.exception(f"Auto-fetch sweep failed: {e}")
 
-            inbox = fetch_inbox(email)
-            last_seen = data.get("last_seen_id")
-            
-            new_mails_received = False
-
-            if "mail_list" in inbox and inbox["mail_list"]:
-                
-                new_mails = []
-                for mail in inbox["mail_list"]:
-                    mail_id = mail.get("mail_id")
-                    if mail_id != last_seen:
-                        new_mails.append(mail)
-                    else:
-                        break 
-                
-                new_mails.reverse() 
-
-                if new_mails:
-                    # Update last seen ID to the newest mail ID
-                    user_data[chat_id]["last_seen_id"] = inbox["mail_list"][0].get("mail_id") 
-                    new_mails_received = True
-
-                for mail in new_mails:
-                    subject = mail.get("subject", "No Subject")
-                    sender = mail.get("from", "Unknown Sender")
-                    
-                    # 1. Get the body content
-                    raw_text_body = mail.get("text", "") 
-                    html_body = mail.get("html", "")
-                    
-                    content = raw_text_body
-                    if not content and html_body:
-                        # Simple HTML stripping
-                        content = re.sub('<[^>]*>', ' ', html_body) 
-
-                    # 2. Get the clean sender name
-                    clean_sender = format_sender_name(sender)
-                    
-                    # 3. OTP EXTRACTION LOGIC
-                    otp = extract_otp(subject, content)
-                    is_otp_mail = bool(otp)
-
-                    # 4. Build the final Telegram message (displaying the mail content)
-                    if is_otp_mail:
-                         display_body_msg = f"HEY THIS YOUR OTP CODE >> `{otp}`"
-                         msg = (
-                            f"🚨 *NEW OTP RECEIVED!* 🔐\n\n"
-                            f"*Subject:* {subject}\n\n"
-                            f"*OTP:* >`{otp}`\n\n"
-                            f"*NONE MAIL*"
-                        )
-                    else:
-                        display_body = content if content.strip() else "--- Mail body was empty or only contained unreadable data ---"
-                        # Limit displayed body content
-                        display_body_preview = display_body[:500].strip()
-                        display_body_msg = f"Full Body:\n```\n{display_body_preview}{'...' if len(display_body) > 500 else ''}\n```"
-                        
-                        msg = (
-                            f"📩 *New Mail Received!*\n\n"
-                            f"*Subject:* {subject}\n\n"
-                            f"*OTP:* >`{otp}`\n\n"
-                            f"*NONE MAIL*"
-                        )
-                    
-                    try:
-                        await app.bot.send_message(chat_id=chat_id, text=msg, parse_mode="Markdown")
-                        
-                    except Exception as e:
-                        logger.error(f"Error sending message to {chat_id}: {e}")
-                
-                # 🔥 6. AUTO-GENERATE NEW MAIL LOGIC - TRIGGERED IF ANY NEW MAIL RECEIVED 🔥
-                if new_mails_received and data.get("auto_gen_on"):
-                    username_prefix = data.get("username")
-                    new_email = generate_email(username_prefix)
-                    
-                    # Update user data:
-                    data["emails"] = [new_email] # Clear all previous and set new
-                    data["active"] = new_email
-                    data["last_seen_id"] = None
-                    
-                    text = (
-                        f"♻️ **Auto-Generated New Email!** ♻️\n\n"
-                        f"The previous address was replaced. Your new active email is:\n"
-                        f"• `{new_email}`"
-                    )
-                    
-                    # Send the updated status
-                    await app.bot.send_message(
-                        chat_id=chat_id, 
-                        text=text, 
-                        parse_mode="Markdown",
-                        reply_markup=get_tempmail_inline_markup() 
-                    )
-
-        # Sleep for 3 seconds
-        await asyncio.sleep(3)
+        # Sleep until the next mailbox is due (or a new address is generated)
+        await poll_scheduler.wait(POLL_MAX_SLEEP)
+
+
+async def sharded_fetch(app: Application):
+    """Runs polling in worker processes; this process only fans their reports out to chats."""
+    global last_sweep_completed
+    await shard_coordinator.start()
+    shard_coordinator.spawn_workers(POLL_WORKERS, "--base-url", mail_client.base_url)
+    asyncio.create_task(schedule_stored_mailboxes())
+    try:
+        while True:
+            # Ready only while every worker keeps sweeping
+            last_sweep_completed = shard_coordinator.last_sweep
+            await asyncio.sleep(POLL_MAX_SLEEP)
+    finally:
+        await shard_coordinator.close()
 
 
 # ==============================================================================
@@ -489,7 +935,7 @@ async def auto_fetch(app: Application):
 async def set_username(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handles the /set command for custom usernames."""
     chat_id = update.message.chat_id
-    initialize_user_data(chat_id)
+    data = initialize_user_data(chat_id)
     
     # --- Stop 2FA Job on any Temp Mail action ---
     await stop_active_otp_job(chat_id, context)
@@ -509,7 +955,8 @@ async def set_username(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ The username must be alphanumeric and between 6 and 12 characters in length.")
         return
 
-    user_data[chat_id]["username"] = new_username
+    data.username = new_username
+    user_store.save(chat_id)
     
     await update.message.reply_text(
         f"✅ Your preferred email prefix is now set to: `{new_username}`.\n"
@@ -520,14 +967,15 @@ async def set_username(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def auto_gen_toggle(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Toggles the automatic email generation after OTP is received."""
     chat_id = update.message.chat_id
-    initialize_user_data(chat_id)
+    data = initialize_user_data(chat_id)
 
     # --- Stop 2FA Job on any Temp Mail action ---
     await stop_active_otp_job(chat_id, context)
     
-    current_state = user_data[chat_id]["auto_gen_on"]
+    current_state = data.auto_gen_on
     new_state = not current_state
-    user_data[chat_id]["auto_gen_on"] = new_state
+    data.auto_gen_on = new_state
+    user_store.save(chat_id)
     
     status_text = "ON" if new_state else "OFF"
     emoji = "✅" if new_state else "❌"
@@ -539,43 +987,121 @@ async def auto_gen_toggle(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
 async def generate_new_email_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handles the /generate command."""
+    """Handles the /generate [count] command."""
     chat_id = update.message.chat_id
-    initialize_user_data(chat_id)
-    username_prefix = user_data[chat_id].get("username")
+    username_prefix = initialize_user_data(chat_id).username
     
     # --- Stop 2FA Job on any Temp Mail action ---
     await stop_active_otp_job(chat_id, context)
 
-    await generate_new_email_logic(chat_id, username_prefix, update, context, is_callback=False)
+    count = 1
+    if context.args:
+        if len(context.args) != 1 or not context.args[0].isdigit() or not 1 <= int(context.args[0]) <= MAX_ADDRESSES_PER_CHAT:
+            await update.message.reply_text(
+                "Usage: **/generate [count]**\n\n"
+                "Without a count, your addresses are replaced by one new address.\n"
+                f"With a count (1-{MAX_ADDRESSES_PER_CHAT}), that many addresses are added and watched at once.",
+                parse_mode="Markdown"
+            )
+            return
+        count = int(context.args[0])
+
+    # A bare /generate replaces the addresses (like the button); a count adds to them
+    await generate_new_email_logic(
+        chat_id, username_prefix, update, context, is_callback=False, count=count, replace=not context.args
+    )
+
+
+async def list_emails_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handles the /emails command: lists every address the chat is watching."""
+    chat_id = update.message.chat_id
+    data = initialize_user_data(chat_id)
+
+    await update.message.reply_text(format_mailbox_list(data), parse_mode="Markdown", reply_markup=get_tempmail_inline_markup())
+
+
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handles /stats: usage statistics, for ADMIN_IDS only."""
+    if update.effective_user.id not in ADMIN_IDS:
+        await update.message.reply_text("⛔ This command is for admins only.")
+        return
+    await update.message.reply_text(format_admin_stats(), parse_mode="HTML", reply_markup=get_tempmail_inline_markup())
+
+
+async def inbox_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handles /inbox [page]: browses the mails already announced to this chat."""
+    chat_id = update.message.chat_id
+    page = int(context.args[0]) - 1 if context.args and context.args[0].isdigit() else 0
+    text, markup = format_inbox_page(chat_id, page)
+    await update.message.reply_text(text, parse_mode="Markdown", reply_markup=markup)
+
+
+async def mail_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handles /mail <n>: shows the n-th newest cached mail in full."""
+    chat_id = update.message.chat_id
+    if not context.args or not context.args[0].isdigit() or int(context.args[0]) < 1:
+        await update.message.reply_text("Usage: **/mail <n>** (1 is the newest mail, see /inbox)", parse_mode="Markdown")
+        return
+    mails = mail_cache.list(chat_id)
+    n = int(context.args[0])
+    if n > len(mails):
+        await update.message.reply_text(f"❌ There are only {len(mails)} cached mails. See /inbox.")
+        return
+    text, markup = format_cached_mail(chat_id, mails[n - 1])
+    await update.message.reply_text(text, parse_mode="Markdown", reply_markup=markup)
+
+
+async def inbox_button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handles the inbox pagination ("inbox:<page>") and open-mail ("mail:<id>") buttons."""
+    query = update.callback_query
+    chat_id = query.message.chat_id
+    await query.answer()
+
+    kind, _, value = query.data.partition(":")
+    if kind == "inbox":
+        text, markup = format_inbox_page(chat_id, int(value))
+    else:
+        entry = mail_cache.get(chat_id, int(value))
+        if entry is None:
+            text, markup = format_inbox_page(chat_id, 0)
+            text = "⌛ That mail is no longer cached.\n\n" + text
+        else:
+            text, markup = format_cached_mail(chat_id, entry)
+    try:
+        await query.edit_message_text(text, parse_mode="Markdown", reply_markup=markup)
+    except Exception:
+        await context.bot.send_message(chat_id=chat_id, text=text, parse_mode="Markdown", reply_markup=markup)
 
 
 async def tempmail_button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     chat_id = query.message.chat_id
-    initialize_user_data(chat_id)
+    data = initialize_user_data(chat_id)
     await query.answer() # Acknowledge the button press
 
     # --- Stop 2FA Job on any Temp Mail action ---
     await stop_active_otp_job(chat_id, context)
 
     if query.data == "generate":
-        username_prefix = user_data[chat_id].get("username")
-        await generate_new_email_logic(chat_id, username_prefix, update, context, is_callback=True)
+        username_prefix = data.username
+        await generate_new_email_logic(chat_id, username_prefix, update, context, is_callback=True, replace=True)
 
     elif query.data == "admin_stats":
-        # Placeholder for Admin Stats logic
-        text = "📊 Admin Stats:\nThis button is a placeholder. To get stats, you would implement the data retrieval logic here."
+        if query.from_user.id not in ADMIN_IDS:
+            await context.bot.send_message(chat_id=chat_id, text="⛔ Admin Stats are for admins only.")
+            return
+        text = format_admin_stats()
         try:
-            await query.edit_message_text(text, parse_mode="Markdown", reply_markup=get_tempmail_inline_markup())
+            await query.edit_message_text(text, parse_mode="HTML", reply_markup=get_tempmail_inline_markup())
         except Exception:
-             await context.bot.send_message(chat_id=chat_id, text=text, parse_mode="Markdown", reply_markup=get_tempmail_inline_markup())
+             await context.bot.send_message(chat_id=chat_id, text=text, parse_mode="HTML", reply_markup=get_tempmail_inline_markup())
 
     elif query.data == "auto_gen_inline":
         # Toggle auto-generation directly via inline button
-        current_state = user_data[chat_id]["auto_gen_on"]
+        current_state = data.auto_gen_on
         new_state = not current_state
-        user_data[chat_id]["auto_gen_on"] = new_state
+        data.auto_gen_on = new_state
+        user_store.save(chat_id)
         
         status_text = "ON" if new_state else "OFF"
         emoji = "✅" if new_state else "❌"
@@ -604,13 +1130,8 @@ async def tempmail_button_handler(update: Update, context: ContextTypes.DEFAULT_
 
     elif query.data == "my_emails":
         # (This is a fallback for the old 'my_emails' button, though not on the new markup)
-        emails = user_data[chat_id]["emails"]
         markup = get_tempmail_inline_markup()
-        if not emails:
-            text = "❌ You haven’t generated any emails yet."
-        else:
-            text = "📜 *Your active email:*\n\n"
-            text += f"• `{user_data[chat_id]['active']}`"
+        text = format_mailbox_list(data)
         try:
             await query.edit_message_text(text, parse_mode="Markdown", reply_markup=markup)
         except Exception:
@@ -678,7 +1199,9 @@ async def send_2fa_instructions(update: Update, context: ContextTypes.DEFAULT_TY
         "⚠ <b>নিয়মাবলী:</b>\n"
         "• কমপক্ষে ১৬ অক্ষর\n"
         "• শুধুমাত্র A-Z এবং 2-7\n"
-        "• Space ব্যবহার করতে হবে"
+        "• Space ব্যবহার করতে হবে\n\n"
+        "📋 <b>একাধিক কী:</b> প্রতি লাইনে একটি কী পাঠান "
+        "(<code>Label: KEY</code>) — সবগুলো কোড একটি বোর্ডে দেখাবে (/board)"
     )
 
     await update.message.reply_text(
@@ -706,7 +1229,12 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
     logger.info(f"User {user_id} sent message, attempting 2FA key validation.")
 
-    # 2. Assume the remaining message is a secret key and attempt validation
+    # 2. Several lines: one key per line, shown together on the chat's board
+    if "\n" in text:
+        await add_board_entries(update, context, text)
+        return
+
+    # 3. Assume the remaining message is a secret key and attempt validation
     cleaned_key = text.replace(' ', '').upper()
 
     code, _ = calculate_totp(cleaned_key)
@@ -729,9 +1257,170 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 # 6. MAIN BOT RUNNER & HANDLER REGISTRATION
 # ==============================================================================
 
-def main() -> None:
-    """Start the merged bot."""
-    application = Application.builder().token(BOT_TOKEN).build()
+# Long-running background tasks (cancelled on shutdown)
+background_tasks = set()
+poller_task: Optional[asyncio.Task] = None
+http_server: Optional[HttpServer] = None
+webhook_intake: Optional[WebhookIntake] = None
+
+def health_status(application: Application) -> dict:
+    """Snapshot of poller liveness and queue backlogs for /healthz and /readyz."""
+    now = datetime.datetime.now(datetime.timezone.utc)
+    jobs = application.job_queue.jobs() if application.job_queue else ()
+    # Jobs whose run time has passed by more than a second are backlogged
+    overdue = [job for job in jobs if job.next_t and (now - job.next_t).total_seconds() > 1]
+    return {
+        "poller_running": poller_task is not None and not poller_task.done(),
+        "last_sweep_age": None if last_sweep_completed is None else round(time.monotonic() - last_sweep_completed, 3),
+        "scheduled_mailboxes": len(shard_coordinator if shard_coordinator is not None else poll_scheduler),
+        "poll_workers": shard_coordinator.worker_info() if shard_coordinator is not None else None,
+        "outbound_queue": len(outbound) if outbound else 0,
+        "countdowns": len(countdown_ticker),
+        "address_pool": len(address_pool),
+        "totp_boards": len(board_ticker),
+        "pending_updates": len(webhook_intake) if webhook_intake else 0,
+        "upstream": mail_client.breaker.snapshot(),
+        "job_queue": {
+            "jobs": len(jobs),
+            "overdue": len(overdue),
+            "max_lag": round(max(((now - job.next_t).total_seconds() for job in overdue), default=0.0), 3),
+        },
+    }
+
+def is_ready(status: dict) -> bool:
+    """Ready once the poller is sweeping regularly and scheduled jobs are not backlogged."""
+    return (
+        status["poller_running"]
+        and status["last_sweep_age"] is not None
+        and status["last_sweep_age"] <= READY_MAX_SWEEP_AGE
+        and status["job_queue"]["max_lag"] <= READY_MAX_JOB_LAG
+    )
+
+async def on_startup(application: Application) -> None:
+    """Starts storage, the background poller and the HTTP surface once the bot is initialized."""
+    global poller_task, http_server, shard_coordinator
+    profiler.start()
+    await user_store.start()
+    await address_pool.start()
+    if POLL_WORKERS > 0:
+        async def on_shard_mail(email: str, mails: list, chats: set) -> None:
+            mail_list = [Mail.from_json(mail) for mail in mails]
+            await notify_new_mail(application, collect_new_mail({email: mail_list}, {email: chats}))
+
+        def shard_cursor(chat_id: int, email: str):
+            mailbox = user_store.get(chat_id).mailboxes.get(email)
+            return mailbox.to_json() if mailbox is not None else None
+
+        shard_coordinator = ShardCoordinator(on_shard_mail, shard_cursor, on_sweep=usage_stats.upstream)
+    # Run the auto-fetch task in the background
+    poller_task = asyncio.create_task(auto_fetch(application))
+    background_tasks.add(poller_task)
+
+    http_app = create_http_app(lambda: health_status(application), is_ready, profiler.snapshot, METRICS_TOKEN)
+    if webhook_intake is not None:
+        webhook_intake.register(http_app, WEBHOOK_PATH)
+        webhook_intake.start()
+    http_server = HttpServer(http_app, HTTP_HOST, HTTP_PORT)
+    await http_server.start()
+
+
+async def on_shutdown(application: Application) -> None:
+    """Stops background tasks, flushes pending state and closes upstream connections."""
+    if http_server is not None:
+        await http_server.stop()
+    if webhook_intake is not None:
+        await webhook_intake.stop()
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
+    await address_pool.close()
+    await outbound.close()
+    await mail_client.close()
+    parse_pool.close()
+    await user_store.close()
+    profiler.stop()
+
+
+def subscribed_update_types(application: Application) -> list:
+    """Update types consumed by the registered handlers (passed to Telegram as allowed_updates)."""
+    return allowed_update_types(handler for group in application.handlers.values() for handler in group)
+
+
+async def run_webhook(application: Application) -> None:
+    """
+    Runs the bot in webhook mode: Telegram posts updates to WEBHOOK_PATH on the
+    HTTP surface instead of the bot long-polling getUpdates.
+    """
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await application.initialize()
+    await on_startup(application)
+    await application.bot.set_webhook(
+        url=WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+        allowed_updates=subscribed_update_types(application),
+        secret_token=WEBHOOK_SECRET,
+        max_connections=100,
+    )
+    await application.start()
+    logger.info(f"Webhook mode: listening on {HTTP_HOST}:{HTTP_PORT}{WEBHOOK_PATH}")
+    try:
+        await stop.wait()
+    finally:
+        await application.stop()
+        # Drain queued updates while the bot can still answer them
+        await on_shutdown(application)
+        await application.shutdown()
+
+
+async def run_polling(application: Application) -> None:
+    """
+    Runs the bot in polling mode. Like run_webhook, on_shutdown runs before
+    the Bot API client is shut down, so messages still queued for sending
+    are delivered.
+    """
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await application.initialize()
+    await on_startup(application)
+    # Only ask Telegram for the update types our handlers consume
+    await application.updater.start_polling(allowed_updates=subscribed_update_types(application))
+    await application.start()
+    try:
+        await stop.wait()
+    finally:
+        await application.updater.stop()
+        await application.stop()
+        await on_shutdown(application)
+        await application.shutdown()
+
+
+def build_application(token: str = BOT_TOKEN, base_url: Optional[str] = None) -> Application:
+    """
+    Builds the Application with every handler registered. `base_url` points
+    the Bot API client elsewhere (e.g. the simulator's fake Telegram).
+    """
+    global outbound
+    # on_startup/on_shutdown are run by run_polling/run_webhook, around the bot's own lifecycle
+    builder = Application.builder().token(token)
+    if base_url:
+        builder = builder.base_url(base_url)
+    application = builder.build()
+    outbound = SendQueue(application.bot)
+
+    # Scrape-time gauges
+    metrics.OUTBOUND_QUEUE_DEPTH.set_function(lambda: len(outbound))
+    metrics.POLLED_MAILBOXES.set_function(
+        lambda: len(shard_coordinator if shard_coordinator is not None else poll_scheduler)
+    )
+    metrics.ACTIVE_COUNTDOWNS.set_function(lambda: len(countdown_ticker))
+    metrics.ADDRESS_POOL_READY.set_function(lambda: len(address_pool))
 
     # --- Handlers for Bot 1 (2FA Authenticator) ---
     application.add_handler(CommandHandler("start", start_command))
@@ -742,31 +1431,47 @@ def main() -> None:
     application.add_handler(CommandHandler("generate", generate_new_email_command))
     application.add_handler(CommandHandler("set", set_username)) 
     application.add_handler(CommandHandler("auto_gen", auto_gen_toggle))
+    application.add_handler(CommandHandler("emails", list_emails_command))
+    application.add_handler(CommandHandler("inbox", inbox_command))
+    application.add_handler(CommandHandler("stats", stats_command))
+    application.add_handler(CommandHandler("mail", mail_command))
+    application.add_handler(CallbackQueryHandler(inbox_button_handler, pattern=r'^(inbox|mail):\d+$'))
     # General CallbackQueryHandler for Temp Mail buttons
     application.add_handler(CallbackQueryHandler(tempmail_button_handler, pattern='^(generate|admin_stats|auto_gen_inline|set_username_inline|my_emails)$'))
     
     # --- NEW: Handler for the CLAIMED OTP button ---
     application.add_handler(CallbackQueryHandler(claim_otp_handler, pattern='^claim_otp$'))
 
+    # --- Multi-key TOTP board ---
+    application.add_handler(CommandHandler("board", board_command))
+    application.add_handler(CallbackQueryHandler(board_stop_handler, pattern='^board_stop$'))
+
     # General text message handler (must be last, catches 2FA keys)
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
 
-    # Run the auto-fetch task in the background
-    asyncio.get_event_loop().create_task(auto_fetch(application))
-
-    # Run the bot
-    print("🤖 Unified Bot is running. Send /start on Telegram to begin...")
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    # Time every handler (see /debug/profile)
+    profiler.instrument(application)
+    return application
 
-from flask import Flask
-import threading
-app = Flask(__name__)
 
-@app.route('/')
-def home(): return "✅ Bot is running!"
+def main() -> None:
+    """Start the merged bot."""
+    global webhook_intake
+    application = build_application()
 
-def run_flask(): app.run(host="0.0.0.0", port=10000)
+    # Run the bot
+    print("🤖 Unified Bot is running. Send /start on Telegram to begin...")
+    if BOT_MODE == "webhook":
+        if not WEBHOOK_URL:
+            raise RuntimeError("WEBHOOK_URL must be set when BOT_MODE=webhook")
+        webhook_intake = WebhookIntake(
+            application.process_update, application.bot, WEBHOOK_SECRET,
+            max_pending=WEBHOOK_MAX_PENDING, workers=WEBHOOK_WORKERS,
+        )
+        metrics.UPDATE_QUEUE_DEPTH.set_function(lambda: len(webhook_intake))
+        asyncio.run(run_webhook(application))
+    else:
+        asyncio.run(run_polling(application))
 
 if __name__ == "__main__":
-    threading.Thread(target=run_flask).start()
     main()
@@ -0,0 +1,185 @@
+import logging
+import time
+from typing import Optional
+
+from metrics import BREAKER_OPENS, BREAKER_SHED, BREAKER_STATE
+
+logger = logging.getLogger(__name__)
+
+# --- Breaker defaults ---
+WINDOW = 30.0            # Seconds of history the error rate is computed over
+BUCKET = 1.0             # Width of one history bucket (seconds)
+MIN_REQUESTS = 20        # No verdict on fewer requests than this in the window
+ERROR_RATIO = 0.5        # Open when at least this fraction of requests failed...
+SLOW_CALL = 5.0          # ...or when at least SLOW_RATIO of them took longer than this (seconds)
+SLOW_RATIO = 0.8
+CONSECUTIVE_FAILURES = 20  # Open at once after this many failed or slow requests in a row
+OPEN_FOR = 10.0          # First open period; doubled on every failed probe
+MAX_OPEN_FOR = 120.0
+HALF_OPEN_PROBES = 3     # Successful probes needed to close again
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitBreaker:
+    """
+    Sliding-window circuit breaker for one upstream.
+
+    Outcomes are counted in `BUCKET`-second buckets over the last `window`
+    seconds. When enough of them failed or were slow (or the last
+    `consecutive_failures` all did, so a hard outage is not diluted by the
+    successes still in the window), the breaker opens and
+    `allow()` refuses requests for `open_for` seconds. After that it goes
+    half-open and lets `probes` requests through at a time: if they all
+    succeed it closes, if one fails it opens again for twice as long.
+    """
+
+    def __init__(
+        self,
+        name: str = "tempmail.plus",
+        window: float = WINDOW,
+        bucket: float = BUCKET,
+        min_requests: int = MIN_REQUESTS,
+        error_ratio: float = ERROR_RATIO,
+        slow_call: float = SLOW_CALL,
+        slow_ratio: float = SLOW_RATIO,
+        consecutive_failures: int = CONSECUTIVE_FAILURES,
+        open_for: float = OPEN_FOR,
+        max_open_for: float = MAX_OPEN_FOR,
+        probes: int = HALF_OPEN_PROBES,
+        clock=time.monotonic,
+    ):
+        self.name = name
+        self.bucket = bucket
+        self.min_requests = min_requests
+        self.error_ratio = error_ratio
+        self.slow_call = slow_call
+        self.slow_ratio = slow_ratio
+        self.consecutive_failures = consecutive_failures
+        self.base_open_for = open_for
+        self.max_open_for = max_open_for
+        self.probes = probes
+        self.clock = clock
+        size = max(1, int(window / bucket))
+        # Ring of [bucket index, requests, errors, slow] rows plus running totals
+        self._buckets = [[-1, 0, 0, 0] for _ in range(size)]
+        self._totals = [0, 0, 0]
+        self._last_index = -1
+        self._failure_run = 0
+        self.state = CLOSED
+        self.open_for = open_for
+        self.opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        BREAKER_STATE.set(STATE_VALUES[CLOSED])
+
+    def _set_state(self, state: str, now: float) -> None:
+        self.state = state
+        BREAKER_STATE.set(STATE_VALUES[state])
+        if state == OPEN:
+            self.opened_at = now
+            BREAKER_OPENS.inc()
+            logger.warning(f"{self.name} circuit breaker open for {self.open_for:.0f}s ({self._totals[1]} errors, "
+                           f"{self._totals[2]} slow of {self._totals[0]} requests).")
+        elif state == HALF_OPEN:
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+        else:
+            self.open_for = self.base_open_for
+            self._failure_run = 0
+            self._reset_window()
+            logger.info(f"{self.name} circuit breaker closed.")
+
+    def _reset_window(self) -> None:
+        for row in self._buckets:
+            row[:] = [-1, 0, 0, 0]
+        self._totals = [0, 0, 0]
+
+    def _current_row(self, now: float) -> list:
+        index = int(now / self.bucket)
+        row = self._buckets[index % len(self._buckets)]
+        if row[0] != index:
+            # Recycle an expired bucket: drop its counts from the totals
+            for i in range(3):
+                self._totals[i] -= row[i + 1]
+            row[:] = [index, 0, 0, 0]
+        return row
+
+    def _expire(self, now: float) -> None:
+        index = int(now / self.bucket)
+        if index == self._last_index:
+            return
+        self._last_index = index
+        for row in self._buckets:
+            if row[0] != -1 and index - row[0] >= len(self._buckets):
+                for i in range(3):
+                    self._totals[i] -= row[i + 1]
+                row[:] = [-1, 0, 0, 0]
+
+    def retry_in(self, now: Optional[float] = None) -> float:
+        """Seconds until an open breaker lets probes through (0 unless open)."""
+        if self.state != OPEN:
+            return 0.0
+        now = self.clock() if now is None else now
+        return max(0.0, self.opened_at + self.open_for - now)
+
+    def allow(self, now: Optional[float] = None) -> bool:
+        """Whether a request may be sent now. Every allowed request must be `record()`ed."""
+        now = self.clock() if now is None else now
+        if self.state == OPEN:
+            if now < self.opened_at + self.open_for:
+                BREAKER_SHED.inc()
+                return False
+            self._set_state(HALF_OPEN, now)
+        if self.state == HALF_OPEN:
+            if self._probes_in_flight >= self.probes:
+                BREAKER_SHED.inc()
+                return False
+            self._probes_in_flight += 1
+        return True
+
+    def record(self, ok: bool, latency: float, now: Optional[float] = None) -> None:
+        """Records the outcome of an allowed request."""
+        now = self.clock() if now is None else now
+        slow = latency >= self.slow_call
+        if self.state == HALF_OPEN:
+            if not self._probes_in_flight:
+                return  # Late answer to a request sent before the breaker opened
+            self._probes_in_flight -= 1
+            if not ok or slow:
+                self.open_for = min(self.open_for * 2, self.max_open_for)
+                self._set_state(OPEN, now)
+            else:
+                self._probe_successes += 1
+                if self._probe_successes >= self.probes:
+                    self._set_state(CLOSED, now)
+            return
+        if self.state == OPEN:
+            return  # Late answer to a request sent before the breaker opened
+        row = self._current_row(now)
+        row[1] += 1
+        self._totals[0] += 1
+        if not ok:
+            row[2] += 1
+            self._totals[1] += 1
+        if slow:
+            row[3] += 1
+            self._totals[2] += 1
+        self._expire(now)
+        self._failure_run = self._failure_run + 1 if not ok or slow else 0
+        requests, errors, slow_calls = self._totals
+        if self._failure_run >= self.consecutive_failures or requests >= self.min_requests and (
+            errors >= self.error_ratio * requests or slow_calls >= self.slow_ratio * requests
+        ):
+            self._set_state(OPEN, now)
+
+    def snapshot(self) -> dict:
+        requests, errors, slow_calls = self._totals
+        return {
+            "state": self.state,
+            "requests": requests,
+            "errors": errors,
+            "slow": slow_calls,
+            "retry_in": round(self.retry_in(), 3),
+        }
@@ -0,0 +1,302 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Optional
+
+import pyotp
+
+from metrics import COUNTDOWN_REMOVALS
+
+logger = logging.getLogger(__name__)
+
+# --- Countdown defaults ---
+TOTP_PERIOD = 30         # Seconds per TOTP window
+EDIT_STEP = 5            # Granularity (seconds) of the visible countdown
+MAX_CONCURRENT_EDITS = 100
+MAX_BOARD_ENTRIES = 50   # Secrets per TOTP board (keeps the message well under Telegram's 4096 chars)
+
+
+class TotpCache:
+    """Caches TOTP codes by (secret, window) so each code is computed once per window."""
+
+    def __init__(self, period: int = TOTP_PERIOD):
+        self.period = period
+        self.computed = 0
+        self._codes = {}
+        self._window = None
+
+    def get(self, secret_key: str, window: int) -> Optional[str]:
+        if window != self._window:
+            # Codes from older windows are never asked for again
+            self._codes.clear()
+            self._window = window
+        key = (secret_key, window)
+        code = self._codes.get(key)
+        if code is None:
+            try:
+                code = pyotp.TOTP(secret_key, interval=self.period).at(window * self.period)
+            except Exception as e:
+                logger.error(f"Error calculating TOTP: {e}")
+                return None
+            self._codes[key] = code
+            self.computed += 1
+        return code
+
+    def get_many(self, secret_keys, window: int) -> dict:
+        """Codes for many secrets in one pass (each distinct secret computed at most once per window)."""
+        return {secret_key: self.get(secret_key, window) for secret_key in secret_keys}
+
+
+class _Countdown:
+    __slots__ = ("chat_id", "message_id", "secret_key", "last_text")
+
+    def __init__(self, chat_id: int, message_id: int, secret_key: str, last_text: Optional[str]):
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.secret_key = secret_key
+        self.last_text = last_text
+
+
+class CountdownTicker:
+    """
+    One shared ticker for every live OTP countdown.
+
+    `tick()` runs once per second. Because every countdown shares the wall
+    clock, the visible state (current window and remaining time rounded to
+    `edit_step`) only changes a few times per window; on every other tick the
+    ticker returns immediately. When it does change, codes come from the
+    per-window `TotpCache` and a message is edited only if its text differs
+    from what was last sent.
+    """
+
+    def __init__(
+        self,
+        render: Callable[[str, int], str],
+        edit_step: int = EDIT_STEP,
+        period: int = TOTP_PERIOD,
+        max_concurrent_edits: int = MAX_CONCURRENT_EDITS,
+        clock=time.time,
+    ):
+        self.render = render
+        self.edit_step = edit_step
+        self.period = period
+        self.clock = clock
+        self.codes = TotpCache(period)
+        self.max_concurrent_edits = max_concurrent_edits
+        self._countdowns = {}
+        self._last_state = None
+        self.edits_sent = 0
+
+    def __len__(self) -> int:
+        return len(self._countdowns)
+
+    def visible_remaining(self, time_remaining: int) -> int:
+        """Rounds the remaining seconds up to the edit granularity."""
+        step = self.edit_step
+        return min(self.period, -(-time_remaining // step) * step)
+
+    def current(self, secret_key: str, now: Optional[float] = None) -> tuple:
+        """Returns (code, visible_remaining) for a secret at the current time."""
+        now = int(self.clock() if now is None else now)
+        window, offset = divmod(now, self.period)
+        return self.codes.get(secret_key, window), self.visible_remaining(self.period - offset)
+
+    def start(self, chat_id: int, message_id: int, secret_key: str, initial_text: Optional[str] = None) -> None:
+        """Registers a countdown; replaces any existing one for the chat."""
+        self._countdowns[chat_id] = _Countdown(chat_id, message_id, secret_key, initial_text)
+
+    def stop(self, chat_id: int) -> bool:
+        return self._countdowns.pop(chat_id, None) is not None
+
+    def discard(self, chat_id: int, message_id: int) -> None:
+        """Stops a chat's countdown only if it still drives `message_id`."""
+        countdown = self._countdowns.get(chat_id)
+        if countdown is not None and countdown.message_id == message_id:
+            del self._countdowns[chat_id]
+            COUNTDOWN_REMOVALS.inc()
+            logger.info(f"Countdown for chat {chat_id} dropped after a failed edit.")
+
+    async def tick(self, edit: Callable, now: Optional[float] = None) -> int:
+        """
+        Advances every countdown. `edit(chat_id, message_id, text, secret_key)` is
+        awaited for each message whose visible text changed; countdowns whose
+        edit raises are dropped. Returns the number of edits issued.
+        """
+        now = int(self.clock() if now is None else now)
+        window, offset = divmod(now, self.period)
+        state = (window, self.visible_remaining(self.period - offset))
+        if state == self._last_state or not self._countdowns:
+            return 0
+        self._last_state = state
+
+        pending = []
+        for countdown in list(self._countdowns.values()):
+            code = self.codes.get(countdown.secret_key, window)
+            if code is None:
+                self._countdowns.pop(countdown.chat_id, None)
+                COUNTDOWN_REMOVALS.inc()
+                logger.error(f"Countdown failed for chat {countdown.chat_id}. Removing it.")
+                continue
+            text = self.render(code, state[1])
+            if text != countdown.last_text:
+                countdown.last_text = text
+                pending.append(countdown)
+
+        if pending:
+            semaphore = asyncio.Semaphore(self.max_concurrent_edits)
+
+            async def _edit(countdown: _Countdown) -> None:
+                async with semaphore:
+                    try:
+                        await edit(countdown.chat_id, countdown.message_id, countdown.last_text, countdown.secret_key)
+                    except Exception as e:
+                        logger.warning(f"Failed to edit message {countdown.message_id} in chat {countdown.chat_id}: {e}")
+                        # Only drop it if it was not replaced meanwhile
+                        if self._countdowns.get(countdown.chat_id) is countdown:
+                            del self._countdowns[countdown.chat_id]
+                            COUNTDOWN_REMOVALS.inc()
+
+            await asyncio.gather(*(_edit(countdown) for countdown in pending))
+            self.edits_sent += len(pending)
+        return len(pending)
+
+
+class _Board:
+    __slots__ = ("chat_id", "entries", "message_id", "last_text")
+
+    def __init__(self, chat_id: int):
+        self.chat_id = chat_id
+        self.entries = {}            # label -> secret, in insertion order
+        self.message_id: Optional[int] = None
+        self.last_text: Optional[str] = None
+
+
+class BoardTicker:
+    """
+    Live multi-secret TOTP boards: one consolidated message per chat.
+
+    Boards share the countdowns' clock and `TotpCache`: once per visible state
+    change (window or rounded remaining time) every distinct secret on every
+    live board is looked up in one batch, so each code is computed once per
+    window, and each board message gets at most one edit per tick however
+    many secrets it shows.
+
+    `render(rows, time_remaining)` builds the message text from
+    [(label, code or None), ...].
+    """
+
+    def __init__(
+        self,
+        render: Callable[[list, int], str],
+        codes: TotpCache,
+        edit_step: int = EDIT_STEP,
+        max_entries: int = MAX_BOARD_ENTRIES,
+        max_concurrent_edits: int = MAX_CONCURRENT_EDITS,
+        clock=time.time,
+    ):
+        self.render = render
+        self.codes = codes
+        self.period = codes.period
+        self.edit_step = edit_step
+        self.max_entries = max_entries
+        self.max_concurrent_edits = max_concurrent_edits
+        self.clock = clock
+        self._boards = {}
+        self._last_state = None
+        self.edits_sent = 0
+
+    def __len__(self) -> int:
+        """Boards with a live message."""
+        return sum(1 for board in self._boards.values() if board.message_id is not None)
+
+    def entries(self, chat_id: int) -> dict:
+        board = self._boards.get(chat_id)
+        return dict(board.entries) if board is not None else {}
+
+    def add(self, chat_id: int, label: str, secret_key: str) -> bool:
+        """Adds (or replaces) a secret under `label`. Returns False if the board is full."""
+        board = self._boards.setdefault(chat_id, _Board(chat_id))
+        if label not in board.entries and len(board.entries) >= self.max_entries:
+            return False
+        board.entries[label] = secret_key
+        return True
+
+    def remove(self, chat_id: int, label: str) -> bool:
+        board = self._boards.get(chat_id)
+        return board is not None and board.entries.pop(label, None) is not None
+
+    def clear(self, chat_id: int) -> bool:
+        return self._boards.pop(chat_id, None) is not None
+
+    def _state(self, now: Optional[float]) -> tuple:
+        now = int(self.clock() if now is None else now)
+        window, offset = divmod(now, self.period)
+        step = self.edit_step
+        return window, min(self.period, -(-(self.period - offset) // step) * step)
+
+    def text(self, chat_id: int, now: Optional[float] = None) -> Optional[str]:
+        """The board's current text (None if it has no entries)."""
+        board = self._boards.get(chat_id)
+        if board is None or not board.entries:
+            return None
+        window, remaining = self._state(now)
+        codes = self.codes.get_many(board.entries.values(), window)
+        return self.render([(label, codes[secret]) for label, secret in board.entries.items()], remaining)
+
+    def attach(self, chat_id: int, message_id: int, text: Optional[str] = None) -> None:
+        """Makes `message_id` the board's live message (the previous one stops updating)."""
+        board = self._boards.setdefault(chat_id, _Board(chat_id))
+        board.message_id = message_id
+        board.last_text = text
+
+    def detach(self, chat_id: int) -> bool:
+        """Stops live updates; the entries are kept."""
+        board = self._boards.get(chat_id)
+        if board is None or board.message_id is None:
+            return False
+        board.message_id = None
+        return True
+
+    def discard(self, chat_id: int, message_id: int) -> None:
+        """Stops updating a board only if it still drives `message_id`."""
+        board = self._boards.get(chat_id)
+        if board is not None and board.message_id == message_id:
+            board.message_id = None
+            COUNTDOWN_REMOVALS.inc()
+            logger.info(f"TOTP board for chat {chat_id} detached after a failed edit.")
+
+    async def tick(self, edit: Callable, now: Optional[float] = None) -> int:
+        """
+        Refreshes every live board. `edit(chat_id, message_id, text)` is awaited
+        once per board whose text changed. Returns the number of edits issued.
+        """
+        state = self._state(now)
+        live = [board for board in self._boards.values() if board.message_id is not None and board.entries]
+        if state == self._last_state or not live:
+            return 0
+        self._last_state = state
+        window, remaining = state
+
+        # One batch for every distinct secret on every live board
+        codes = self.codes.get_many({secret for board in live for secret in board.entries.values()}, window)
+        pending = []
+        for board in live:
+            text = self.render([(label, codes[secret]) for label, secret in board.entries.items()], remaining)
+            if text != board.last_text:
+                board.last_text = text
+                pending.append((board, board.message_id))
+
+        if pending:
+            semaphore = asyncio.Semaphore(self.max_concurrent_edits)
+
+            async def _edit(board: _Board, message_id: int) -> None:
+                async with semaphore:
+                    try:
+                        await edit(board.chat_id, message_id, board.last_text)
+                    except Exception as e:
+                        logger.warning(f"Failed to edit TOTP board {message_id} in chat {board.chat_id}: {e}")
+                        self.discard(board.chat_id, message_id)
+
+            await asyncio.gather(*(_edit(board, message_id) for board, message_id in pending))
+            self.edits_sent += len(pending)
+        return len(pending)
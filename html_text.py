@@ -0,0 +1,130 @@
+import re
+from html.parser import HTMLParser
+from typing import Optional
+
+# --- Conversion defaults ---
+CHUNK_SIZE = 16384
+
+# Elements whose content is never visible
+SKIP_TAGS = frozenset({"head", "title", "style", "script", "noscript", "template", "svg", "iframe", "object", "xml"})
+
+# Elements that start a new line in the visible text
+BLOCK_TAGS = frozenset({
+    "address", "article", "aside", "blockquote", "br", "dd", "div", "dl", "dt", "footer", "form", "h1", "h2",
+    "h3", "h4", "h5", "h6", "header", "hr", "li", "main", "nav", "ol", "p", "pre", "section", "table", "tbody",
+    "tfoot", "thead", "tr", "ul",
+})
+
+# Elements separated from their neighbours by a space
+CELL_TAGS = frozenset({"td", "th"})
+
+VOID_TAGS = frozenset({"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"})
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_HIDDEN_STYLE_RE = re.compile(r"display\s*:\s*none|visibility\s*:\s*hidden", re.IGNORECASE)
+
+
+class HtmlTextExtractor(HTMLParser):
+    """
+    Incremental HTML-to-text converter.
+
+    Feed it chunks with `feed()`; it drops non-visible elements (`<style>`,
+    `<script>`, `<head>`, inline-hidden blocks, comments), decodes entities,
+    collapses whitespace and turns block elements into line breaks. Once
+    `limit` characters have been produced `done` becomes True and further
+    input is ignored, so callers can stop feeding early.
+    """
+
+    def __init__(self, limit: Optional[int] = None):
+        super().__init__(convert_charrefs=True)
+        self.limit = limit
+        self.done = False
+        self._parts = []
+        self._length = 0
+        self._hidden = []          # Stack of open tags whose content is invisible
+        self._need_space = False
+        self._at_line_start = True
+        self._blank_lines = 1
+
+    def _newline(self) -> None:
+        if self._blank_lines >= 2 or self.done:
+            return
+        self._parts.append("\n")
+        self._length += 1
+        self._blank_lines += 1
+        self._at_line_start = True
+        self._need_space = False
+
+    def handle_starttag(self, tag: str, attrs: list) -> None:
+        if self.done:
+            return
+        if tag in SKIP_TAGS or (self._hidden and tag not in VOID_TAGS):
+            # Track nesting inside hidden content so the right end tag closes it
+            self._hidden.append(tag)
+            return
+        if tag not in VOID_TAGS:
+            for name, value in attrs:
+                if name == "hidden" or (name == "style" and value and _HIDDEN_STYLE_RE.search(value)):
+                    self._hidden.append(tag)
+                    return
+        if tag in BLOCK_TAGS:
+            self._newline()
+        elif tag in CELL_TAGS:
+            self._need_space = True
+
+    def handle_startendtag(self, tag: str, attrs: list) -> None:
+        if not self._hidden and tag in BLOCK_TAGS and not self.done:
+            self._newline()
+
+    def handle_endtag(self, tag: str) -> None:
+        if self._hidden:
+            if tag in self._hidden:
+                # Pop up to and including the matching tag (tolerates unclosed children)
+                while self._hidden and self._hidden.pop() != tag:
+                    pass
+            return
+        if tag in BLOCK_TAGS and not self.done:
+            self._newline()
+
+    def handle_data(self, data: str) -> None:
+        if self._hidden or self.done:
+            return
+        leading = data[:1].isspace()
+        trailing = data[-1:].isspace()
+        text = _WHITESPACE_RE.sub(" ", data).strip()
+        if not text:
+            if data:
+                self._need_space = True
+            return
+        if (self._need_space or leading) and not self._at_line_start:
+            text = " " + text
+        if self.limit is not None and self._length + len(text) >= self.limit:
+            text = text[:self.limit - self._length]
+            self.done = True
+        self._parts.append(text)
+        self._length += len(text)
+        self._need_space = trailing
+        self._at_line_start = False
+        self._blank_lines = 0
+
+    def feed(self, data: str) -> None:
+        if not self.done:
+            super().feed(data)
+
+    def text(self) -> str:
+        return "".join(self._parts).strip()
+
+
+def html_to_text(html: str, limit: Optional[int] = None, chunk_size: int = CHUNK_SIZE) -> str:
+    """
+    Converts an HTML mail body to visible plain text. With `limit`, conversion
+    stops as soon as that many characters have been produced.
+    """
+    parser = HtmlTextExtractor(limit)
+    for offset in range(0, len(html), chunk_size):
+        parser.feed(html[offset:offset + chunk_size])
+        if parser.done:
+            break
+    else:
+        parser.close()
+    return parser.text()
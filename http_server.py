@@ -0,0 +1,93 @@
+import hmac
+import logging
+from typing import Callable, Optional
+
+from aiohttp import web
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+TOKEN_SCHEME = "Bearer "
+
+
+def create_http_app(health: Callable[[], dict], ready: Callable[[dict], bool],
+                    profile: Optional[Callable[[], dict]] = None, token: Optional[str] = None) -> web.Application:
+    """
+    Builds the bot's HTTP surface, served from the bot's own event loop.
+
+    `health()` returns the current status snapshot; `ready(status)` decides
+    whether it counts as ready. Because the handlers run on the same loop as
+    the poller, a blocked loop also makes these endpoints stop answering.
+    `profile()`, if given, is served on /debug/profile (loop lag, callback
+    timings and captured slow-callback stacks).
+
+    The surface shares its public listener with the webhook, so /healthz and
+    /readyz only answer a bare status; the full snapshot, /metrics and
+    /debug/profile need `Authorization: Bearer <token>` and are refused
+    outright while no `token` is configured.
+    """
+
+    def authorized(request: web.Request) -> bool:
+        header = request.headers.get("Authorization", "")
+        return (token is not None and header.startswith(TOKEN_SCHEME)
+                and hmac.compare_digest(header[len(TOKEN_SCHEME):], token))
+
+    def private(handler: Callable) -> Callable:
+        async def guarded(request: web.Request) -> web.Response:
+            if not authorized(request):
+                return web.json_response({"error": "unauthorized"}, status=401)
+            return await handler(request)
+
+        return guarded
+
+    async def home(request: web.Request) -> web.Response:
+        return web.Response(text="✅ Bot is running!")
+
+    async def healthz(request: web.Request) -> web.Response:
+        # Liveness: answering at all means the event loop is turning
+        return web.json_response(health() if authorized(request) else {"status": "ok"})
+
+    async def readyz(request: web.Request) -> web.Response:
+        status = health()
+        is_ready = ready(status)
+        body = status if authorized(request) else {"status": "ready" if is_ready else "not ready"}
+        return web.json_response(body, status=200 if is_ready else 503)
+
+    @private
+    async def metrics_endpoint(request: web.Request) -> web.Response:
+        return web.Response(body=metrics.REGISTRY.render().encode(), headers={"Content-Type": metrics.CONTENT_TYPE})
+
+    app = web.Application()
+    app.router.add_get("/", home)
+    app.router.add_get("/healthz", healthz)
+    app.router.add_get("/readyz", readyz)
+    app.router.add_get("/metrics", metrics_endpoint)
+    if profile is not None:
+        @private
+        async def profile_endpoint(request: web.Request) -> web.Response:
+            return web.json_response(profile())
+
+        app.router.add_get("/debug/profile", profile_endpoint)
+    return app
+
+
+class HttpServer:
+    """Runs an aiohttp application on the current event loop."""
+
+    def __init__(self, app: web.Application, host: str, port: int):
+        self.app = app
+        self.host = host
+        self.port = port
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self) -> None:
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"HTTP server listening on {self.host}:{self.port}")
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
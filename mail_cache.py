@@ -0,0 +1,112 @@
+import sys
+import time
+import zlib
+from collections import OrderedDict
+from typing import Optional
+
+# --- Cache defaults ---
+PER_CHAT_LIMIT = 50              # Newest mails kept per chat
+TTL = 24 * 3600.0                # Seconds a mail stays browsable
+MEMORY_BUDGET = 32 * 1024 * 1024  # Approximate bytes for the whole cache
+COMPRESS_LEVEL = 6
+ENTRY_OVERHEAD = 360             # Approximate bytes per entry besides its strings (object, index slots)
+
+
+class CachedMail:
+    """One announced mail: parsed metadata, the extracted OTP and the zlib-compressed body."""
+    __slots__ = ("chat_id", "email", "mail_id", "sender", "subject", "otp", "received", "_body", "size")
+
+    def __init__(self, chat_id: int, email: str, mail_id: int, sender: str, subject: str,
+                 otp: Optional[str], body: str, received: float):
+        self.chat_id = chat_id
+        self.email = email
+        self.mail_id = mail_id
+        self.sender = sender
+        self.subject = subject
+        self.otp = otp
+        self.received = received
+        self._body = zlib.compress(body.encode(), COMPRESS_LEVEL) if body else b""
+        self.size = (
+            ENTRY_OVERHEAD + len(self._body)
+            + sys.getsizeof(email) + sys.getsizeof(sender) + sys.getsizeof(subject)
+        )
+
+    @property
+    def body(self) -> str:
+        return zlib.decompress(self._body).decode() if self._body else ""
+
+
+class MailCache:
+    """
+    Bounded cache of the mails announced to each chat.
+
+    Entries live in one global LRU (for the memory budget) and in a per-chat
+    index (newest last) for browsing. A chat keeps at most `per_chat` mails,
+    entries expire after `ttl` seconds, and once the approximate size passes
+    `memory_budget` the least recently used entries of any chat are evicted.
+    """
+
+    def __init__(self, per_chat: int = PER_CHAT_LIMIT, ttl: float = TTL,
+                 memory_budget: int = MEMORY_BUDGET, clock=time.time):
+        self.per_chat = per_chat
+        self.ttl = ttl
+        self.memory_budget = memory_budget
+        self.clock = clock
+        self.memory_bytes = 0
+        self.evictions = 0
+        self._lru = OrderedDict()     # (chat_id, mail_id) -> CachedMail, least recently used first
+        self._chats = {}              # chat_id -> OrderedDict(mail_id -> CachedMail), oldest first
+
+    def __len__(self) -> int:
+        return len(self._lru)
+
+    def _remove(self, entry: CachedMail) -> None:
+        self._lru.pop((entry.chat_id, entry.mail_id), None)
+        mails = self._chats.get(entry.chat_id)
+        if mails is not None:
+            mails.pop(entry.mail_id, None)
+            if not mails:
+                del self._chats[entry.chat_id]
+        self.memory_bytes -= entry.size
+
+    def put(self, chat_id: int, email: str, mail_id: int, sender: str, subject: str,
+            otp: Optional[str], body: str) -> CachedMail:
+        key = (chat_id, mail_id)
+        if key in self._lru:
+            self._remove(self._lru[key])
+        entry = CachedMail(chat_id, email, mail_id, sender, subject, otp, body, self.clock())
+        self._lru[key] = entry
+        mails = self._chats.setdefault(chat_id, OrderedDict())
+        mails[mail_id] = entry
+        self.memory_bytes += entry.size
+
+        while len(mails) > self.per_chat:
+            self._remove(next(iter(mails.values())))
+            self.evictions += 1
+        while self.memory_bytes > self.memory_budget and len(self._lru) > 1:
+            self._remove(next(iter(self._lru.values())))
+            self.evictions += 1
+        return entry
+
+    def _expire(self, chat_id: int) -> None:
+        mails = self._chats.get(chat_id)
+        if not mails:
+            return
+        cutoff = self.clock() - self.ttl
+        while mails and next(iter(mails.values())).received < cutoff:
+            self._remove(next(iter(mails.values())))
+            if chat_id not in self._chats:
+                break
+
+    def list(self, chat_id: int) -> list:
+        """A chat's cached mails, newest first."""
+        self._expire(chat_id)
+        return list(reversed(self._chats.get(chat_id, {}).values()))
+
+    def get(self, chat_id: int, mail_id: int) -> Optional[CachedMail]:
+        """Returns one cached mail and marks it recently used."""
+        self._expire(chat_id)
+        entry = self._lru.get((chat_id, mail_id))
+        if entry is not None:
+            self._lru.move_to_end((chat_id, mail_id))
+        return entry
@@ -0,0 +1,223 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from typing import Iterable, Mapping, Optional, Union
+
+import aiohttp
+
+from circuit_breaker import CircuitBreaker
+from metrics import FETCH_ERRORS, FETCH_LATENCY, LIST_UNCHANGED
+from models import MailHeader, Mailbox
+
+logger = logging.getLogger(__name__)
+
+# --- Upstream client defaults ---
+TEMPMAIL_BASE_URL = "https://tempmail.plus"
+DEFAULT_CONCURRENCY = 50        # Max in-flight requests to tempmail.plus
+DEFAULT_REQUEST_TIMEOUT = 10.0  # Per-request deadline (seconds)
+DEFAULT_CONNECT_TIMEOUT = 3.0
+
+# Error returned without a request while the circuit breaker sheds load
+CIRCUIT_OPEN_ERROR = "circuit open"
+
+
+def new_mails_since(mail_list: list, mailbox: Mailbox) -> list:
+    """
+    Returns the listed mails `mailbox` has not announced yet, oldest first.
+    Every entry is checked in O(1), so deleted, expired or reordered mails
+    cannot hide new ones; fetched with `first_id=mailbox.cursor`, the list
+    only holds the new mails and a few recently announced ones.
+    """
+    new_mails = {mail.mail_id: mail for mail in mail_list if mail.mail_id is not None and mailbox.is_new(mail.mail_id)}
+    return [new_mails[mail_id] for mail_id in sorted(new_mails)]
+
+
+class _CachedList:
+    """Last listing of one inbox: digest of the raw body, the parsed inbox and its HTTP validators."""
+    __slots__ = ("digest", "inbox", "etag", "last_modified")
+
+    def __init__(self, digest: bytes, inbox: dict, etag: Optional[str], last_modified: Optional[str]):
+        self.digest = digest
+        self.inbox = inbox
+        self.etag = etag
+        self.last_modified = last_modified
+
+
+class TempMailClient:
+    """
+    Async, pooled keep-alive client for the tempmail.plus API.
+
+    A single aiohttp session (and connection pool) is shared by every poll.
+    A semaphore caps the number of in-flight requests and every request has
+    its own deadline, so a slow upstream can never block the event loop or
+    starve the Telegram handlers. A circuit breaker fails requests fast while
+    the upstream is down or too slow.
+
+    Inbox polls are conditional: the last listing's ETag / Last-Modified are
+    sent back, and a 304 (or a body identical to the last one) returns the
+    cached parse without reading or parsing anything new.
+    """
+
+    def __init__(
+        self,
+        base_url: str = TEMPMAIL_BASE_URL,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        request_timeout: float = DEFAULT_REQUEST_TIMEOUT,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = concurrency
+        self.request_timeout = request_timeout
+        self.connect_timeout = connect_timeout
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._session: Optional[aiohttp.ClientSession] = None
+        # Per-email _CachedList for cheap unchanged polls
+        self._list_cache = {}
+
+    async def start(self) -> None:
+        """Creates the shared session. Safe to call more than once."""
+        if self._session is not None and not self._session.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=self.concurrency,
+            limit_per_host=self.concurrency,
+            keepalive_timeout=60,
+            ttl_dns_cache=300,
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=self.request_timeout,
+            sock_connect=self.connect_timeout,
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=timeout,
+            headers={"accept": "application/json"},
+        )
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self) -> "TempMailClient":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def _get_raw(self, path: str, params: dict, endpoint: str) -> Union[bytes, dict]:
+        """GETs a raw response body, mapping every failure to an {"error": ...} dict."""
+        response = await self._request(path, params, endpoint)
+        return response if isinstance(response, dict) else response[2]
+
+    async def _request(self, path: str, params: dict, endpoint: str, headers: Optional[dict] = None) -> Union[tuple, dict]:
+        """GETs (status, response headers, body), mapping every failure to an {"error": ...} dict."""
+        if self._session is None:
+            await self.start()
+        async with self._semaphore:
+            # Checked after queueing on the semaphore: the breaker may have opened meanwhile
+            if not self.breaker.allow():
+                return {"error": CIRCUIT_OPEN_ERROR}
+            started = time.perf_counter()
+            ok = False
+            try:
+                async with self._session.get(f"{self.base_url}{path}", params=params, headers=headers) as res:
+                    res.raise_for_status()
+                    body = await res.read()
+                    ok = True
+                    return res.status, res.headers, body
+            except asyncio.TimeoutError:
+                FETCH_ERRORS.labels(endpoint).inc()
+                return {"error": f"timeout after {self.request_timeout}s"}
+            except aiohttp.ClientResponseError as e:
+                FETCH_ERRORS.labels(endpoint).inc()
+                ok = e.status < 500  # The upstream answered; only 5xx count against it
+                return {"error": str(e) or e.__class__.__name__}
+            except aiohttp.ClientError as e:
+                FETCH_ERRORS.labels(endpoint).inc()
+                return {"error": str(e) or e.__class__.__name__}
+            finally:
+                latency = time.perf_counter() - started
+                FETCH_LATENCY.labels(endpoint).observe(latency)
+                self.breaker.record(ok, latency)
+
+    async def _get_json(self, path: str, params: dict, endpoint: str) -> dict:
+        raw = await self._get_raw(path, params, endpoint)
+        if isinstance(raw, dict):
+            return raw
+        try:
+            return json.loads(raw)
+        except ValueError as e:
+            return {"error": f"invalid JSON: {e}"}
+
+    async def fetch_inbox(self, email: str, first_id: int = 0) -> dict:
+        """
+        Fetch the mail list (metadata only) for given email, newer than `first_id`.
+        Returns {"mail_list": [MailHeader, ...]} (newest first) or {"error": ...}.
+
+        The parsed response is projected to the header fields the poller reads and
+        cached per email together with a digest of the raw bytes, so an unchanged
+        inbox skips JSON parsing entirely.
+        """
+        params = {"email": email, "first_id": first_id or 0, "epin": ""}
+        cached = self._list_cache.get(email)
+        headers = None
+        if cached is not None and (cached.etag or cached.last_modified):
+            headers = {}
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+        response = await self._request("/api/mails", params, "list", headers)
+        if isinstance(response, dict):
+            if response["error"] != CIRCUIT_OPEN_ERROR:
+                logger.error(f"Error fetching inbox for {email}: {response['error']}")
+            return response
+
+        status, response_headers, raw = response
+        if status == 304 and cached is not None:
+            LIST_UNCHANGED.inc()
+            return cached.inbox
+        digest = hashlib.blake2b(raw, digest_size=16).digest()
+        if cached is not None and cached.digest == digest:
+            LIST_UNCHANGED.inc()
+            return cached.inbox
+        try:
+            parsed = json.loads(raw)
+        except ValueError as e:
+            logger.error(f"Error parsing inbox for {email}: {e}")
+            return {"error": f"invalid JSON: {e}"}
+        inbox = {"mail_list": [MailHeader.from_json(mail) for mail in parsed.get("mail_list") or []]}
+        self._list_cache[email] = _CachedList(
+            digest, inbox, response_headers.get("ETag"), response_headers.get("Last-Modified")
+        )
+        return inbox
+
+    async def fetch_mail(self, email: str, mail_id: int) -> dict:
+        """Fetch one full mail (including `text` and `html` bodies)."""
+        mail = await self._get_json(f"/api/mails/{mail_id}", {"email": email, "epin": ""}, "mail")
+        if "error" in mail and mail["error"] != CIRCUIT_OPEN_ERROR:
+            logger.error(f"Error fetching mail {mail_id} for {email}: {mail['error']}")
+        return mail
+
+    def forget(self, email: str) -> None:
+        """Drops cached list data for an address that is no longer polled."""
+        self._list_cache.pop(email, None)
+
+    async def fetch_many(self, cursors: Union[Mapping[str, Optional[int]], Iterable[str]]) -> dict:
+        """
+        Fetches many inboxes concurrently (bounded by the client's concurrency).
+        `cursors` maps each email to its last seen mail ID (or is a plain iterable
+        of emails to fetch from the start). Returns a dict mapping each email to
+        its inbox (or {"error": ...}).
+        """
+        if not isinstance(cursors, Mapping):
+            cursors = dict.fromkeys(cursors)
+        emails = list(cursors)
+        results = await asyncio.gather(*(self.fetch_inbox(email, cursors[email]) for email in emails))
+        return dict(zip(emails, results))
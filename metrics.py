@@ -0,0 +1,226 @@
+import time
+from bisect import bisect_left
+from typing import Callable, Optional
+
+# Default latency buckets (seconds)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_labels(labelnames: tuple, labelvalues: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), registry: Optional["Registry"] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def labels(self, *labelvalues):
+        """Returns the child metric for one combination of label values."""
+        child = self._children.get(labelvalues)
+        if child is None:
+            child = self._children[labelvalues] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _samples(self):
+        """Yields (labelvalues, child) pairs, including the unlabelled metric itself."""
+        if not self.labelnames:
+            yield (), self
+        else:
+            yield from self._children.items()
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for labelvalues, child in self._samples():
+            lines.extend(child._render_child(self.name, self.labelnames, labelvalues))
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonic counter. `inc()` is a single attribute update."""
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        self.value = 0
+        super().__init__(*args, **kwargs)
+
+    def _new_child(self):
+        child = Counter.__new__(Counter)
+        child.value = 0
+        return child
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def _render_child(self, name, labelnames, labelvalues) -> list:
+        return [f"{name}{_format_labels(labelnames, labelvalues)} {_format_value(self.value)}"]
+
+
+class Gauge(_Metric):
+    """Gauge set directly, or computed at scrape time from a callback."""
+    kind = "gauge"
+
+    def __init__(self, *args, function: Optional[Callable[[], float]] = None, **kwargs):
+        self.value = 0
+        self.function = function
+        super().__init__(*args, **kwargs)
+
+    def _new_child(self):
+        child = Gauge.__new__(Gauge)
+        child.value = 0
+        child.function = None
+        return child
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.value -= amount
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self.function = function
+
+    def _render_child(self, name, labelnames, labelvalues) -> list:
+        value = self.function() if self.function is not None else self.value
+        return [f"{name}{_format_labels(labelnames, labelvalues)} {_format_value(value)}"]
+
+
+class Histogram(_Metric):
+    """
+    Fixed-bucket histogram. `observe()` is one bisect plus two additions;
+    cumulative bucket counts are only computed at scrape time.
+    """
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: tuple = DEFAULT_BUCKETS, **kwargs):
+        self.buckets = tuple(sorted(buckets))
+        self._init_state()
+        super().__init__(*args, **kwargs)
+
+    def _init_state(self) -> None:
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+
+    def _new_child(self):
+        child = Histogram.__new__(Histogram)
+        child.buckets = self.buckets
+        child._init_state()
+        return child
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def time(self) -> "_Timer":
+        """Context manager that observes the elapsed wall time of its block."""
+        return _Timer(self)
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def _render_child(self, name, labelnames, labelvalues) -> list:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{name}_bucket{_format_labels(labelnames, labelvalues, le)} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labelnames, labelvalues)} {_format_value(self.sum)}")
+        lines.append(f"{name}_count{_format_labels(labelnames, labelvalues)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+
+    def __enter__(self) -> "_Timer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.histogram.observe(time.perf_counter() - self.started)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric: _Metric) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"Duplicate metric name: {metric.name}")
+        self._metrics[metric.name] = metric
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """Renders every metric in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# --- Hot-path metrics ---
+
+FETCH_LATENCY = Histogram("tempmail_fetch_seconds", "Latency of tempmail.plus requests.", ("endpoint",))
+FETCH_ERRORS = Counter("tempmail_fetch_errors_total", "Failed tempmail.plus requests.", ("endpoint",))
+LIST_UNCHANGED = Counter("tempmail_list_unchanged_total", "Inbox polls answered by the cached listing (304 or same body).")
+SWEEP_DURATION = Histogram("poll_sweep_seconds", "Duration of one auto_fetch sweep over the due mailboxes.")
+SWEEP_MAILBOXES = Counter("poll_mailboxes_total", "Mailboxes polled by auto_fetch.")
+OTP_EXTRACT_TIME = Histogram(
+    "otp_extract_seconds", "CPU time spent in extract_otp per mail.",
+    buckets=(0.00001, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05),
+)
+MAILS_RECEIVED = Counter("mails_received_total", "New mails announced to chats.")
+OTPS_EXTRACTED = Counter("otps_extracted_total", "Mails in which an OTP was found.")
+SEND_LATENCY = Histogram("telegram_send_seconds", "Latency of Telegram API calls made by the outbound queue.", ("method",))
+DELIVERY_LATENCY = Histogram(
+    "telegram_delivery_seconds", "Time from enqueue to delivery in the outbound queue.", ("priority",),
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+)
+RETRY_AFTER = Counter("telegram_retry_after_total", "Telegram 429 (RetryAfter) responses.")
+SEND_FAILURES = Counter("telegram_send_failures_total", "Telegram sends/edits that failed permanently.", ("method",))
+EDITS_COALESCED = Counter("telegram_edits_coalesced_total", "Pending edits replaced by a newer edit.")
+COUNTDOWN_REMOVALS = Counter("countdown_removals_total", "Countdowns removed after a failed edit or TOTP error.")
+OUTBOUND_QUEUE_DEPTH = Gauge("outbound_queue_depth", "Items waiting in the outbound queue.")
+POLLED_MAILBOXES = Gauge("poll_scheduled_mailboxes", "Addresses registered with the poll scheduler.")
+ACTIVE_COUNTDOWNS = Gauge("countdowns_active", "Live OTP countdowns.")
+ADDRESS_POOL_READY = Gauge("address_pool_ready", "Pre-generated addresses waiting to be issued.")
+UPDATE_HANDLING = Histogram("telegram_update_seconds", "Time spent handling one webhook update.")
+WEBHOOK_REJECTED = Counter("webhook_rejected_total", "Webhook updates refused because the intake queue was full.")
+UPDATE_QUEUE_DEPTH = Gauge("webhook_pending_updates", "Webhook updates accepted but not yet handled.")
+BREAKER_STATE = Gauge("tempmail_breaker_state", "tempmail.plus circuit breaker state (0 closed, 1 half-open, 2 open).")
+BREAKER_OPENS = Counter("tempmail_breaker_opens_total", "Times the tempmail.plus circuit breaker opened.")
+BREAKER_SHED = Counter("tempmail_breaker_shed_total", "tempmail.plus requests refused by the open circuit breaker.")
+LOOP_LAG = Histogram("event_loop_lag_seconds", "Delay before the event loop runs a freshly scheduled callback.")
+CALLBACK_TIME = Histogram("callback_seconds", "Wall time of handlers, jobs and other tracked callbacks.", ("callback",))
+SLOW_CALLBACKS = Counter("slow_callbacks_total", "Times the event loop was blocked past the slow-callback threshold.")
@@ -0,0 +1,163 @@
+from array import array
+from dataclasses import dataclass, field
+from typing import Optional, Union
+
+SEEN_LIMIT = 16     # Recently announced mail IDs remembered per mailbox
+
+
+@dataclass(slots=True)
+class Mailbox:
+    """
+    Polling cursor of one live address: the highest announced mail ID, the
+    SEEN_LIMIT highest announced IDs (allocated on first mail) and a floor at
+    the highest ID dropped from them.
+
+    A listed mail is new if it is above the high-water mark, or above the
+    floor without being remembered (listed late). Anything at or below the
+    floor counts as seen, so mails deleted, expired or reordered upstream are
+    never announced twice.
+    """
+    last_seen: Optional[int] = None     # High-water mark: highest mail ID announced (None: nothing yet)
+    recent: Optional[array] = None      # Highest announced IDs, at most SEEN_LIMIT
+    floor: Optional[int] = None         # IDs at or below this count as seen
+
+    @property
+    def cursor(self) -> Optional[int]:
+        """
+        First ID the upstream is asked to list above: the lowest remembered ID,
+        so a listing holds at most SEEN_LIMIT known mails plus the new ones,
+        and mails listed late below the high-water mark are still caught.
+        """
+        return min(self.recent) if self.recent else self.floor
+
+    def is_new(self, mail_id: int) -> bool:
+        if self.last_seen is None or mail_id > self.last_seen:
+            return True
+        if self.floor is not None and mail_id <= self.floor:
+            return False
+        return self.recent is None or mail_id not in self.recent
+
+    def mark(self, mail_id: int) -> None:
+        """Records a mail ID as announced."""
+        if self.last_seen is None or mail_id > self.last_seen:
+            self.last_seen = mail_id
+        recent = self.recent
+        if recent is None:
+            recent = self.recent = array("q")
+        if len(recent) < SEEN_LIMIT:
+            recent.append(mail_id)
+            return
+        # Full: the lowest ID drops out and raises the floor (usually the oldest, as IDs grow)
+        lowest = min(recent)
+        if mail_id > lowest:
+            recent[recent.index(lowest)] = mail_id
+        else:
+            lowest = mail_id
+        if self.floor is None or lowest > self.floor:
+            self.floor = lowest
+
+    def to_json(self) -> Union[int, dict, None]:
+        """The bare high-water mark until the mailbox remembers IDs (the original layout)."""
+        if not self.recent:
+            return self.last_seen
+        return {"last_seen": self.last_seen, "recent": sorted(self.recent), "floor": self.floor}
+
+    @classmethod
+    def from_json(cls, value: Union[int, dict, None]) -> "Mailbox":
+        if not isinstance(value, dict):
+            # Original layout: only the high-water mark, which then also serves as the floor
+            return cls(value, floor=value)
+        recent = value.get("recent")
+        return cls(value.get("last_seen"), array("q", recent[-SEEN_LIMIT:]) if recent else None, value.get("floor"))
+
+
+@dataclass(slots=True)
+class UserState:
+    """
+    Temp-mail state of one chat. `mailboxes` maps every live address to its
+    cursor (insertion-ordered); `active` is the newest address.
+    """
+    mailboxes: dict = field(default_factory=dict)
+    active: Optional[str] = None
+    username: Optional[str] = None
+    auto_gen_on: bool = False
+
+    def to_json(self) -> dict:
+        return {
+            "mailboxes": {email: mailbox.to_json() for email, mailbox in self.mailboxes.items()},
+            "active": self.active,
+            "username": self.username,
+            "auto_gen_on": self.auto_gen_on,
+        }
+
+    @classmethod
+    def from_json(cls, record: dict) -> "UserState":
+        """Builds the state from its stored JSON, upgrading the single-address layout ("emails"/"last_seen_id")."""
+        mailboxes = dict(record.get("mailboxes") or {})
+        active = record.get("active")
+        if "emails" in record or "last_seen_id" in record:
+            last_seen_id = record.get("last_seen_id")
+            for email in record.get("emails") or []:
+                mailboxes.setdefault(email, last_seen_id if email == active else None)
+            if active and active not in mailboxes:
+                mailboxes[active] = last_seen_id
+        return cls(
+            mailboxes={email: Mailbox.from_json(value) for email, value in mailboxes.items()},
+            active=active,
+            username=record.get("username"),
+            auto_gen_on=bool(record.get("auto_gen_on")),
+        )
+
+
+@dataclass(slots=True)
+class MailHeader:
+    """One entry of an inbox listing, projected to the fields the poller reads."""
+    mail_id: Optional[int]
+    sender: str
+    subject: str
+
+    @classmethod
+    def from_json(cls, mail: dict) -> "MailHeader":
+        return cls(
+            mail.get("mail_id"),
+            mail.get("from") or mail.get("from_mail") or "",
+            mail.get("subject", "No Subject"),
+        )
+
+
+@dataclass(slots=True)
+class Mail(MailHeader):
+    """A mail with its bodies, as announced to chats."""
+    text: str = ""
+    html: str = ""
+
+    @classmethod
+    def from_json(cls, mail: dict) -> "Mail":
+        header = MailHeader.from_json(mail)
+        return cls(header.mail_id, header.sender, header.subject, mail.get("text") or "", mail.get("html") or "")
+
+    @classmethod
+    def with_body(cls, header: MailHeader, body: dict) -> "Mail":
+        """Combines a listed header with its fetched body (a failed fetch leaves the bodies empty)."""
+        return cls(
+            header.mail_id,
+            body.get("from") or body.get("from_mail") or header.sender,
+            body.get("subject") or header.subject,
+            body.get("text") or "",
+            body.get("html") or "",
+        )
+
+    def to_json(self) -> dict:
+        return {"mail_id": self.mail_id, "from": self.sender, "subject": self.subject,
+                "text": self.text, "html": self.html}
+
+
+@dataclass(slots=True)
+class ParsedMail:
+    """A new mail after body conversion, sender resolution and OTP extraction (shared by every watching chat)."""
+    email: str
+    mail_id: Optional[int]
+    sender: str             # Display name
+    subject: str
+    content: str            # Visible text, bounded
+    otp: Optional[str]
@@ -0,0 +1,205 @@
+import re
+from typing import NamedTuple, Optional
+
+# --- Extraction defaults ---
+MAX_SCAN_CHARS = 20000       # Only the head of a body is scanned (OTPs sit near the top)
+MAX_KEYWORD_HITS = 8         # Keyword hits examined per text
+WINDOW_BEFORE = 40           # Characters scanned before a keyword hit
+WINDOW_AFTER = 80            # Characters scanned after a keyword hit
+MIN_CONFIDENCE = 0.5         # Below this, extract_otp() reports no OTP
+
+_FLAGS = re.IGNORECASE
+
+KEYWORD_RE = re.compile(
+    r"\b(?:otp|codes?|pin|passcode|password|verification|verify|one[\s_-]?time|security|"
+    r"confirm(?:ation)?|log[\s-]?in|sign[\s-]?in|2fa|authenticat\w*|token)\b",
+    _FLAGS,
+)
+
+# 4-8 digits, optionally split in two halves ("123 456", "123-456"); not part of a
+# longer number, decimal, date, time, URL or identifier.
+CANDIDATE_RE = re.compile(r"(?<![\w.,:/#$€£-])(\d{3,4}[ -]\d{3,4}|\d{4,8})(?![\w/%]|[.,:]\d)")
+
+# Context right before a number that marks it as something other than an OTP
+NEGATIVE_CONTEXT_RE = re.compile(
+    r"(?:order|invoice|ref(?:erence)?|ticket|case|account|acct|zip|postal|phone|tel|call|fax|"
+    r"no\.|number|id|#|\$|€|£|usd|eur|total|amount|price|suite|street|st\.|ave|room|copyright|©)\W{0,3}$",
+    _FLAGS,
+)
+
+# Context right after a number that marks it as part of a postal address or a date:
+# "1600 Amphitheatre Pkwy", "2100 Main St", "1600, 2024", "..., Mountain View, CA 94043"
+TRAILING_CONTEXT_RE = re.compile(
+    r"\W{0,3}(?:[a-z]+\W{1,3}){0,2}?(?:ave(?:nue)?|st(?:reet)?|rd|road|blvd|boulevard|pkwy|parkway|hwy|highway|"
+    r"lane|ln|drive|plaza|suite|ste|floor|apt)\b"
+    r"|\W{1,3}(?:19|20)\d\d\b"
+    r"|[^\n]{0,40}?\b(?-i:[A-Z]{2})\s+\d{5}(?:-\d{4})?\b",
+    _FLAGS,
+)
+
+YEAR_RE = re.compile(r"(?:19|20)\d\d")
+
+# Per-sender templates keyed by sender domain (matched on domain suffix).
+# Each pattern's first non-empty group is the code.
+SENDER_RULES = {
+    "google.com": re.compile(r"\bG-(\d{6})\b|\b(\d{6})\b\s+is your Google", _FLAGS),
+    "facebookmail.com": re.compile(r"\bFB-(\d{5,8})\b|\b(\d{5,8})\b\s+is your (?:Facebook )?(?:confirmation |security )?code", _FLAGS),
+    "meta.com": re.compile(r"\b(\d{6})\b\s+is your|code[:\s]+(\d{6})\b", _FLAGS),
+    "instagram.com": re.compile(r"\b(\d{6})\b\s+is your Instagram|code[:\s]+(\d{3} ?\d{3})\b", _FLAGS),
+    "openai.com": re.compile(r"(?:ChatGPT|OpenAI)?\s*code is[:\s]+(\d{6})\b|\b(\d{6})\b\s+is your", _FLAGS),
+    "telegram.org": re.compile(r"(?:login|Telegram) code[:\s]+(\d{5,6})\b", _FLAGS),
+    "twitter.com": re.compile(r"\b(\d{6,8})\b\s+is your (?:X|Twitter) verification code|code[:\s]+(\d{6,8})\b", _FLAGS),
+    "x.com": re.compile(r"\b(\d{6,8})\b\s+is your (?:X|Twitter) verification code|code[:\s]+(\d{6,8})\b", _FLAGS),
+    "discord.com": re.compile(r"(?:verification|login) code[:\s]+(\d{6})\b", _FLAGS),
+    "microsoft.com": re.compile(r"(?:Security|single-use) code[:\s]+(\d{4,8})\b", _FLAGS),
+    "amazon.com": re.compile(r"(?:OTP|verification code)[^\d]{0,30}(\d{6})\b", _FLAGS),
+    "apple.com": re.compile(r"verification code[^\d]{0,30}(\d{6})\b", _FLAGS),
+    "tiktok.com": re.compile(r"\b(\d{6})\b\s+is your (?:TikTok )?verification code|code[:\s]+(\d{6})\b", _FLAGS),
+    "steamcommunity.com": re.compile(r"(?:Steam Guard|login) code[^:\n]{0,60}:\s*([A-Z0-9]{5})\b"),
+    "paypal.com": re.compile(r"(?:security|one-time) code[^\d]{0,20}(\d{6})\b", _FLAGS),
+    "spotify.com": re.compile(r"\b(\d{6})\b\s+is your|code[:\s]+(\d{6})\b", _FLAGS),
+    "linkedin.com": re.compile(r"verification code[^\d]{0,30}(\d{6})\b|\b(\d{6})\b\s+is your", _FLAGS),
+    "uber.com": re.compile(r"Uber code[:\s]+(\d{4})\b|\b(\d{4})\b\s+is your Uber", _FLAGS),
+    "snapchat.com": re.compile(r"code[:\s]+(\d{6})\b|\b(\d{6})\b\s+is your", _FLAGS),
+    "netflix.com": re.compile(r"code[:\s]+(\d{4,6})\b", _FLAGS),
+    "reddit.com": re.compile(r"code[:\s]+(\d{6})\b", _FLAGS),
+}
+
+_ADDRESS_RE = re.compile(r"<?([^\s<>@]+@([^\s<>@]+?))>?\s*$")
+
+
+class OtpMatch(NamedTuple):
+    code: str
+    confidence: float
+    rule: str
+
+
+def sender_domain(sender: Optional[str]) -> Optional[str]:
+    """Returns the lower-cased domain of a 'Name <user@domain>' sender string."""
+    if not sender:
+        return None
+    match = _ADDRESS_RE.search(sender.strip())
+    return match.group(2).lower() if match else None
+
+
+class OtpExtractor:
+    """
+    OTP extraction with patterns compiled once.
+
+    1. A per-sender template (looked up by sender domain suffix) wins outright.
+    2. Otherwise candidates are only searched in a bounded window around OTP
+       keywords, and scored by distance, length and surrounding context.
+    3. As a last resort a lone number in the subject is accepted at the minimum
+       confidence.
+
+    Only the first `max_scan` characters of a body are examined, so cost is
+    bounded regardless of mail size.
+    """
+
+    def __init__(
+        self,
+        sender_rules: dict = SENDER_RULES,
+        max_scan: int = MAX_SCAN_CHARS,
+        window_before: int = WINDOW_BEFORE,
+        window_after: int = WINDOW_AFTER,
+        max_keyword_hits: int = MAX_KEYWORD_HITS,
+    ):
+        self.sender_rules = sender_rules
+        self.max_scan = max_scan
+        self.window_before = window_before
+        self.window_after = window_after
+        self.max_keyword_hits = max_keyword_hits
+
+    def _sender_rule(self, domain: Optional[str]):
+        """Finds the template for a domain or its closest parent (accounts.google.com -> google.com)."""
+        if not domain:
+            return None, None
+        labels = domain.split(".")
+        for i in range(len(labels) - 1):
+            suffix = ".".join(labels[i:])
+            rule = self.sender_rules.get(suffix)
+            if rule is not None:
+                return suffix, rule
+        return None, None
+
+    def _score(self, text: str, start: int, end: int, code: str, hit_start: int, hit_end: int) -> float:
+        score = 0.6
+        if len(code) == 6:
+            score += 0.2
+        elif len(code) in (5, 8):
+            score += 0.05
+        if start >= hit_end:
+            score += 0.1  # "code is 123456" is more typical than "123456 code"
+            distance = start - hit_end
+        else:
+            distance = hit_start - end
+        score -= min(distance, 80) / 200
+        if len(code) == 4 and YEAR_RE.fullmatch(code):
+            score -= 0.4
+        if NEGATIVE_CONTEXT_RE.search(text, max(0, start - 16), start):
+            score -= 0.5
+        elif TRAILING_CONTEXT_RE.match(text, end, end + 48):
+            score -= 0.5
+        return max(0.0, min(1.0, score))
+
+    def _scan(self, text: str) -> Optional[OtpMatch]:
+        best = None
+        hits = 0
+        for hit in KEYWORD_RE.finditer(text):
+            hits += 1
+            if hits > self.max_keyword_hits:
+                break
+            lo = max(0, hit.start() - self.window_before)
+            hi = hit.end() + self.window_after
+            for candidate in CANDIDATE_RE.finditer(text, lo, hi):
+                code = candidate.group(1).replace(" ", "").replace("-", "")
+                if not 4 <= len(code) <= 8:
+                    continue
+                score = self._score(text, candidate.start(), candidate.end(), code, hit.start(), hit.end())
+                if best is None or score > best.confidence:
+                    best = OtpMatch(code, score, "keyword")
+        return best
+
+    def extract(self, subject: str, content: str, sender: Optional[str] = None) -> Optional[OtpMatch]:
+        """Returns the most likely OTP (with a 0-1 confidence), or None."""
+        subject = subject or ""
+        body = (content or "")[:self.max_scan]
+
+        domain, rule = self._sender_rule(sender_domain(sender))
+        if rule is not None:
+            for text in (subject, body):
+                match = rule.search(text)
+                if match:
+                    code = next(group for group in match.groups() if group)
+                    return OtpMatch(code.replace(" ", ""), 0.95, domain)
+
+        best = None
+        for text in (subject, body):
+            match = self._scan(text)
+            if match is not None and (best is None or match.confidence > best.confidence):
+                best = match
+        if best is not None and best.confidence >= MIN_CONFIDENCE:
+            return best
+
+        # Last resort: a lone number in the subject line
+        candidates = list(CANDIDATE_RE.finditer(subject))
+        if len(candidates) == 1:
+            candidate = candidates[0]
+            code = candidate.group(1)
+            if (not YEAR_RE.fullmatch(code) and not NEGATIVE_CONTEXT_RE.search(subject, 0, candidate.start())
+                    and not TRAILING_CONTEXT_RE.match(subject, candidate.end())):
+                return OtpMatch(code.replace(" ", "").replace("-", ""), MIN_CONFIDENCE, "subject")
+        # Only a weak keyword match, if any (extract_otp drops it)
+        return best
+
+
+default_extractor = OtpExtractor()
+
+
+def extract_otp(subject: str, content: str, sender: Optional[str] = None,
+                min_confidence: float = MIN_CONFIDENCE) -> Optional[str]:
+    """Returns the OTP code found in a mail, or None if nothing is confident enough."""
+    match = default_extractor.extract(subject, content, sender)
+    if match is None or match.confidence < min_confidence:
+        return None
+    return match.code
@@ -0,0 +1,330 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+from typing import Optional
+
+from telegram.error import BadRequest, NetworkError, RetryAfter
+
+from metrics import DELIVERY_LATENCY, EDITS_COALESCED, RETRY_AFTER, SEND_FAILURES, SEND_LATENCY
+
+logger = logging.getLogger(__name__)
+
+# --- Priorities (lower is sent first) ---
+PRIORITY_OTP = 0         # OTP notifications
+PRIORITY_NORMAL = 1      # Regular notifications (new mail, auto-gen)
+PRIORITY_EDIT = 2        # Countdown edits
+PRIORITY_NAMES = {PRIORITY_OTP: "otp", PRIORITY_NORMAL: "normal", PRIORITY_EDIT: "edit"}
+
+# --- Telegram rate limits ---
+GLOBAL_RATE = 30.0       # Messages per second across all chats
+PER_CHAT_RATE = 1.0      # Messages per second to one chat
+PER_CHAT_BURST = 3
+MAX_RETRIES = 3
+LATENCY_SAMPLES = 10000
+CLOSE_TIMEOUT = 10.0     # Seconds close() keeps sending what is already queued
+
+
+class TokenBucket:
+    """
+    Token bucket that hands out reservations: `reserve()` always takes a token
+    and returns the time at which it may be used, so callers queue up in order
+    without polling.
+    """
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def reserve(self, now: float) -> float:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return now
+        return now - self.tokens / self.rate
+
+    def pause_until(self, until: float, now: float) -> None:
+        """Blocks the bucket until `until` (used for Telegram's retry_after)."""
+        self.tokens = min(self.tokens, -(until - now) * self.rate)
+        self.updated = now
+
+    def is_idle(self, now: float) -> bool:
+        return self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+
+class _Item:
+    __slots__ = ("method", "chat_id", "kwargs", "priority", "future", "enqueued", "coalesce_key",
+                 "chat_reserved", "attempts")
+
+    def __init__(self, method: str, chat_id: int, kwargs: dict, priority: int, future: asyncio.Future,
+                 enqueued: float, coalesce_key: Optional[tuple]):
+        self.method = method
+        self.chat_id = chat_id
+        self.kwargs = kwargs
+        self.priority = priority
+        self.future = future
+        self.enqueued = enqueued
+        self.coalesce_key = coalesce_key
+        self.chat_reserved = False
+        self.attempts = 0
+
+
+def _consume_exception(future: asyncio.Future) -> None:
+    # Fire-and-forget callers never await the future; failures are logged instead
+    if not future.cancelled():
+        future.exception()
+
+
+def _copy_outcome(source: asyncio.Future, target: asyncio.Future) -> None:
+    if target.done():
+        return
+    if source.cancelled():
+        target.cancel()
+    elif source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
+
+
+class SendQueue:
+    """
+    Central outbound dispatcher for Telegram sends and edits.
+
+    - A global token bucket and one bucket per chat enforce Telegram's limits.
+    - Items are sent in priority order (OTPs before notifications before edits).
+    - A pending edit to a message is replaced by any newer edit to the same
+      message, so only the latest text is ever sent.
+    - RetryAfter pauses the affected chat for `retry_after` and re-queues the item.
+
+    `send_message()` / `edit_message_text()` return a future with the API result;
+    awaiting it is optional. `close()` drains the queue before stopping, so
+    messages queued at shutdown are still sent.
+    """
+
+    def __init__(
+        self,
+        bot,
+        global_rate: float = GLOBAL_RATE,
+        per_chat_rate: float = PER_CHAT_RATE,
+        per_chat_burst: float = PER_CHAT_BURST,
+        max_retries: int = MAX_RETRIES,
+        clock=time.monotonic,
+    ):
+        self.bot = bot
+        self.per_chat_rate = per_chat_rate
+        self.per_chat_burst = per_chat_burst
+        self.max_retries = max_retries
+        self.clock = clock
+        self._global = TokenBucket(global_rate, global_rate, clock())
+        self._chats = {}
+        self._ready = []      # (priority, seq, item)
+        self._delayed = []    # (send_at, seq, item)
+        self._pending_edits = {}
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._in_flight = set()
+        self._unsent = set()  # Futures of every submitted item not yet resolved
+        self._closing = False
+        self.latencies = {priority: deque(maxlen=LATENCY_SAMPLES)
+                          for priority in (PRIORITY_OTP, PRIORITY_NORMAL, PRIORITY_EDIT)}
+        self.sent = 0
+        self.coalesced = 0
+        self.retries_after = 0
+        self.failed = 0
+
+    def __len__(self) -> int:
+        return len(self._ready) + len(self._delayed)
+
+    # --- Public API ---
+
+    def send_message(self, chat_id: int, text: str, priority: int = PRIORITY_NORMAL, **kwargs) -> asyncio.Future:
+        return self._submit("send_message", chat_id, {"chat_id": chat_id, "text": text, **kwargs}, priority, None)
+
+    def edit_message_text(self, chat_id: int, message_id: int, text: str, priority: int = PRIORITY_EDIT,
+                          **kwargs) -> asyncio.Future:
+        payload = {"chat_id": chat_id, "message_id": message_id, "text": text, **kwargs}
+        return self._submit("edit_message_text", chat_id, payload, priority, (chat_id, message_id))
+
+    async def close(self, timeout: float = CLOSE_TIMEOUT) -> None:
+        """
+        Stops taking new work and keeps sending what is already queued (delayed
+        retries included) for up to `timeout` seconds. Whatever is still unsent
+        after that is cancelled.
+        """
+        self._closing = True
+        if self._unsent:
+            await asyncio.wait(set(self._unsent), timeout=timeout)
+        dropped = [future for future in self._unsent if not future.done()]
+        for future in dropped:
+            future.cancel()
+        if dropped:
+            logger.warning(f"Outbound queue closed with {len(dropped)} message(s) unsent after {timeout}s.")
+        tasks = list(self._in_flight)
+        if self._task is not None:
+            tasks.append(self._task)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        self._ready.clear()
+        self._delayed.clear()
+        self._pending_edits.clear()
+
+    def latency_percentiles(self, percentiles=(50, 90, 99)) -> dict:
+        """Returns {priority: {p: seconds}} for enqueue-to-delivery latency."""
+        result = {}
+        for priority, samples in self.latencies.items():
+            if not samples:
+                continue
+            ordered = sorted(samples)
+            result[priority] = {p: ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] for p in percentiles}
+        return result
+
+    # --- Internals ---
+
+    def _submit(self, method: str, chat_id: int, kwargs: dict, priority: int,
+                coalesce_key: Optional[tuple]) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        if self._closing:
+            logger.warning(f"Outbound queue is closed: dropped {method} for chat {chat_id}")
+            future = loop.create_future()
+            future.cancel()
+            return future
+
+        if coalesce_key is not None:
+            pending = self._pending_edits.get(coalesce_key)
+            if pending is not None:
+                # Collapse into the already queued edit: only the latest text matters
+                pending.kwargs = kwargs
+                self.coalesced += 1
+                EDITS_COALESCED.inc()
+                if priority < pending.priority and not pending.chat_reserved:
+                    pending.priority = priority
+                    heapq.heappush(self._ready, (priority, next(self._seq), pending))
+                return pending.future
+
+        future = loop.create_future()
+        future.add_done_callback(_consume_exception)
+        self._unsent.add(future)
+        future.add_done_callback(self._unsent.discard)
+        item = _Item(method, chat_id, kwargs, priority, future, self.clock(), coalesce_key)
+        if coalesce_key is not None:
+            self._pending_edits[coalesce_key] = item
+        heapq.heappush(self._ready, (priority, next(self._seq), item))
+        self._ensure_started()
+        self._wakeup.set()
+        return future
+
+    def _ensure_started(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._dispatch())
+
+    def _chat_bucket(self, chat_id: int, now: float) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) > 10000:
+                self._chats = {cid: b for cid, b in self._chats.items() if not b.is_idle(now)}
+            bucket = self._chats[chat_id] = TokenBucket(self.per_chat_rate, self.per_chat_burst, now)
+        return bucket
+
+    async def _dispatch(self) -> None:
+        while True:
+            now = self.clock()
+            while self._delayed and self._delayed[0][0] <= now:
+                _, seq, item = heapq.heappop(self._delayed)
+                heapq.heappush(self._ready, (item.priority, seq, item))
+
+            if not self._ready:
+                timeout = self._delayed[0][0] - now if self._delayed else None
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            priority, seq, item = heapq.heappop(self._ready)
+            if item.future.done() or priority != item.priority:
+                continue  # Stale entry (re-pushed with a higher priority)
+
+            if not item.chat_reserved:
+                item.chat_reserved = True
+                send_at = self._chat_bucket(item.chat_id, now).reserve(now)
+                if send_at > now:
+                    heapq.heappush(self._delayed, (send_at, seq, item))
+                    continue
+
+            send_at = self._global.reserve(now)
+            if send_at > now:
+                await asyncio.sleep(send_at - now)
+
+            if item.coalesce_key is not None and self._pending_edits.get(item.coalesce_key) is item:
+                del self._pending_edits[item.coalesce_key]
+            task = asyncio.get_running_loop().create_task(self._deliver(item))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    def _requeue(self, item: _Item, delay: float) -> None:
+        item.chat_reserved = False
+        if item.coalesce_key is not None:
+            newer = self._pending_edits.get(item.coalesce_key)
+            if newer is not None:
+                # A newer edit for the same message is already queued; it supersedes this one
+                newer.future.add_done_callback(lambda f: _copy_outcome(f, item.future))
+                return
+            self._pending_edits[item.coalesce_key] = item
+        heapq.heappush(self._delayed, (self.clock() + delay, next(self._seq), item))
+        self._wakeup.set()
+
+    async def _deliver(self, item: _Item) -> None:
+        item.attempts += 1
+        started = time.perf_counter()
+        try:
+            result = await getattr(self.bot, item.method)(**item.kwargs)
+        except RetryAfter as e:
+            self.retries_after += 1
+            RETRY_AFTER.inc()
+            retry_after = float(e.retry_after)
+            logger.warning(f"Flood limit for chat {item.chat_id}: retrying {item.method} in {retry_after}s")
+            now = self.clock()
+            self._chat_bucket(item.chat_id, now).pause_until(now + retry_after, now)
+            self._requeue(item, retry_after)
+            return
+        except BadRequest as e:
+            if "not modified" in str(e).lower():
+                result = None
+            else:
+                self._fail(item, e)
+                return
+        except NetworkError as e:
+            if item.attempts <= self.max_retries:
+                self._requeue(item, 2 ** item.attempts * 0.5)
+            else:
+                self._fail(item, e)
+            return
+        except Exception as e:
+            self._fail(item, e)
+            return
+        finally:
+            SEND_LATENCY.labels(item.method).observe(time.perf_counter() - started)
+
+        self.sent += 1
+        latency = self.clock() - item.enqueued
+        self.latencies[item.priority].append(latency)
+        DELIVERY_LATENCY.labels(PRIORITY_NAMES[item.priority]).observe(latency)
+        if not item.future.done():
+            item.future.set_result(result)
+
+    def _fail(self, item: _Item, error: Exception) -> None:
+        self.failed += 1
+        SEND_FAILURES.labels(item.method).inc()
+        logger.error(f"Failed to {item.method} for chat {item.chat_id}: {error}")
+        if not item.future.done():
+            item.future.set_exception(error)
@@ -0,0 +1,171 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import BrokenExecutor, Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+import metrics
+from html_text import html_to_text
+from models import Mail, ParsedMail
+from otp_extract import MAX_SCAN_CHARS, extract_otp
+from senders import SenderIndex
+
+logger = logging.getLogger(__name__)
+
+# --- Parse pool defaults ---
+TEXT_LIMIT = 5000        # Characters of visible text kept per mail (HTML conversion stops there)
+INLINE_LIMIT = 2000      # Plaintext mails up to this many characters are parsed on the event loop
+BATCH_SIZE = 8           # Mails per job sent to a pool worker
+WORKERS = min(4, os.cpu_count() or 1)
+
+EXECUTOR_KINDS = ("process", "thread", "inline")
+# Process workers are never forked straight from the bot: it already runs threads (SQLite
+# writer, profiler watchdog) whose locks a forked child could inherit held
+START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+# Each pool worker (thread or process) gets its own SenderIndex: the index's LRU is not thread-safe
+_local = threading.local()
+
+
+def _init_worker(senders_config: Optional[str]) -> None:
+    _local.sender_index = SenderIndex(config_path=senders_config)
+
+
+def parse_mail(email: str, mail: Mail, sender_index: SenderIndex, text_limit: int = TEXT_LIMIT) -> tuple:
+    """
+    Converts the body, resolves the sender and extracts the OTP of one new mail.
+    Returns (ParsedMail, seconds spent extracting the OTP).
+    """
+    sender = mail.sender or "Unknown Sender"
+    content = mail.text
+    if not content and mail.html:
+        # Visible text only; stops once there is enough for the OTP scan and preview
+        content = html_to_text(mail.html, limit=text_limit)
+
+    started = time.perf_counter()
+    otp = extract_otp(mail.subject, content, sender)
+    elapsed = time.perf_counter() - started
+    return ParsedMail(email, mail.mail_id, sender_index.resolve(sender), mail.subject, content[:text_limit], otp), elapsed
+
+
+def _parse_batch(jobs: list, text_limit: int) -> list:
+    """Runs in a pool worker."""
+    return [parse_mail(email, mail, _local.sender_index, text_limit) for email, mail in jobs]
+
+
+def _is_light(mail: Mail, inline_limit: int) -> bool:
+    return not mail.html and len(mail.text) <= inline_limit
+
+
+class ParsePool:
+    """
+    Parses new mail off the event loop.
+
+    Small plaintext mails are parsed inline (cheaper than a hop to a worker).
+    The rest is split into batches of `batch_size` and run on a thread or
+    process pool, so a burst of large HTML mails does not stall Telegram
+    handlers or countdown edits. Results keep the order of the input. With
+    `kind="inline"` everything runs on the loop. A batch that fails on the
+    pool (a broken pool is restarted) is parsed inline mail by mail, and a
+    mail that cannot be parsed at all is passed on unparsed (no OTP), so one
+    bad mail never sinks the others.
+    """
+
+    def __init__(
+        self,
+        sender_index: SenderIndex,
+        kind: str = "process",
+        workers: int = WORKERS,
+        batch_size: int = BATCH_SIZE,
+        inline_limit: int = INLINE_LIMIT,
+        text_limit: int = TEXT_LIMIT,
+    ):
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(f"unknown parse executor {kind!r} (expected one of {', '.join(EXECUTOR_KINDS)})")
+        self.sender_index = sender_index
+        self.kind = kind
+        self.workers = workers
+        self.batch_size = batch_size
+        self.inline_limit = inline_limit
+        self.text_limit = text_limit
+        self.offloaded = 0
+        self._executor: Optional[Executor] = None
+
+    def _new_executor(self) -> Optional[Executor]:
+        config = (self.sender_index.config_path,)
+        if self.kind == "process":
+            context = multiprocessing.get_context(START_METHOD)
+            if START_METHOD == "forkserver":
+                # The fork server only needs this module, not the bot's __main__
+                context.set_forkserver_preload([__name__])
+            return ProcessPoolExecutor(self.workers, mp_context=context, initializer=_init_worker, initargs=config)
+        if self.kind == "thread":
+            return ThreadPoolExecutor(self.workers, thread_name_prefix="parse", initializer=_init_worker, initargs=config)
+        return None
+
+    def start(self) -> None:
+        if self._executor is None:
+            self._executor = self._new_executor()
+
+    def close(self) -> None:
+        # Never waits: a hung worker must not stall the event loop
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _trim(self, mail: Mail) -> Mail:
+        # Only the scanned head of a plaintext body matters: keep the pickled job small
+        limit = max(MAX_SCAN_CHARS, self.text_limit)
+        if len(mail.text) > limit:
+            return Mail(mail.mail_id, mail.sender, mail.subject, mail.text[:limit], mail.html)
+        return mail
+
+    def _parse_inline(self, email: str, mail: Mail) -> tuple:
+        try:
+            return parse_mail(email, mail, self.sender_index, self.text_limit)
+        except Exception as e:
+            logger.exception(f"Failed to parse mail {mail.mail_id} for {email}: {e}")
+            sender = mail.sender or "Unknown Sender"
+            return ParsedMail(email, mail.mail_id, sender, mail.subject, mail.text[:self.text_limit], None), 0.0
+
+    async def _run_batch(self, jobs: list) -> list:
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._executor, _parse_batch, jobs, self.text_limit)
+        except BrokenExecutor as e:
+            logger.error(f"Parse pool broken ({e}); restarting it and parsing {len(jobs)} mails inline.")
+            self.close()
+            self.start()
+        except Exception as e:
+            logger.error(f"Parse batch failed ({e.__class__.__name__}: {e}); parsing {len(jobs)} mails inline.")
+        return [self._parse_inline(email, mail) for email, mail in jobs]
+
+    async def parse(self, jobs: list) -> list:
+        """Parses [(email, Mail), ...] into ParsedMail objects, in order."""
+        results = [None] * len(jobs)
+        heavy = []
+        for i, (email, mail) in enumerate(jobs):
+            if self.kind == "inline" or _is_light(mail, self.inline_limit):
+                results[i] = self._parse_inline(email, mail)
+            else:
+                heavy.append(i)
+
+        if heavy:
+            self.start()
+            batches = [heavy[i:i + self.batch_size] for i in range(0, len(heavy), self.batch_size)]
+            done = await asyncio.gather(*(
+                self._run_batch([(jobs[i][0], self._trim(jobs[i][1])) for i in batch]) for batch in batches
+            ))
+            for batch, parsed in zip(batches, done):
+                for i, result in zip(batch, parsed):
+                    results[i] = result
+            self.offloaded += len(heavy)
+
+        parsed_mails = []
+        for parsed, otp_seconds in results:
+            metrics.OTP_EXTRACT_TIME.observe(otp_seconds)
+            parsed_mails.append(parsed)
+        return parsed_mails
@@ -0,0 +1,150 @@
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Hashable, Optional
+
+# --- Adaptive polling defaults (seconds) ---
+FRESH_INTERVAL = 2.0     # Poll interval right after an address is created or receives mail
+FRESH_PERIOD = 120.0     # How long an address stays "fresh"
+IDLE_INTERVAL = 3.0      # First interval once the fresh period is over
+MAX_INTERVAL = 60.0      # Upper bound for the exponential back-off
+BACKOFF_FACTOR = 2.0
+
+
+class _Entry:
+    __slots__ = ("interval", "fresh_until", "due", "token")
+
+    def __init__(self, interval: float, fresh_until: float, due: float, token: int):
+        self.interval = interval
+        self.fresh_until = fresh_until
+        self.due = due
+        self.token = token
+
+
+class PollScheduler:
+    """
+    Per-mailbox adaptive poll scheduler.
+
+    Every mailbox key has its own next-poll time kept in a min-heap, so finding
+    the due mailboxes costs O(k log n) instead of a scan over every user.
+    Fresh mailboxes are polled every `fresh_interval`; idle ones back off
+    exponentially up to `max_interval`; receiving mail makes a mailbox fresh again.
+
+    Removed or rescheduled keys leave stale heap entries behind, which are
+    skipped lazily using a per-entry token.
+    """
+
+    def __init__(
+        self,
+        fresh_interval: float = FRESH_INTERVAL,
+        fresh_period: float = FRESH_PERIOD,
+        idle_interval: float = IDLE_INTERVAL,
+        max_interval: float = MAX_INTERVAL,
+        backoff_factor: float = BACKOFF_FACTOR,
+        clock=time.monotonic,
+    ):
+        self.fresh_interval = fresh_interval
+        self.fresh_period = fresh_period
+        self.idle_interval = idle_interval
+        self.max_interval = max_interval
+        self.backoff_factor = backoff_factor
+        self.clock = clock
+        self._heap = []
+        self._entries = {}
+        self._tokens = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def _push(self, key: Hashable, entry: _Entry) -> None:
+        entry.token = next(self._tokens)
+        heapq.heappush(self._heap, (entry.due, entry.token, key))
+
+    def add(self, key: Hashable, delay: Optional[float] = None) -> None:
+        """
+        Registers (or re-registers) a fresh mailbox, due after `delay` seconds
+        (one fresh interval by default).
+        """
+        now = self.clock()
+        if delay is None:
+            delay = self.fresh_interval
+        entry = _Entry(self.fresh_interval, now + self.fresh_period, now + delay, 0)
+        self._entries[key] = entry
+        self._push(key, entry)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def remove(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def pop_due(self, now: Optional[float] = None) -> list:
+        """
+        Returns every key whose poll time has passed. The keys stay registered
+        but are not due again until `record()` reschedules them.
+        """
+        now = self.clock() if now is None else now
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, token, key = heapq.heappop(self._heap)
+            entry = self._entries.get(key)
+            if entry is None or entry.token != token:
+                continue  # Stale heap entry
+            entry.token = -1  # In flight: not in the heap until record()
+            due.append(key)
+        return due
+
+    def record(self, key: Hashable, got_mail: bool, now: Optional[float] = None) -> None:
+        """Reschedules a polled mailbox based on whether it just received mail."""
+        entry = self._entries.get(key)
+        if entry is None or entry.token != -1:
+            return  # Removed, or re-added while the poll was in flight
+        now = self.clock() if now is None else now
+        if got_mail:
+            entry.fresh_until = now + self.fresh_period
+            entry.interval = self.fresh_interval
+        elif now >= entry.fresh_until:
+            if entry.interval < self.idle_interval:
+                entry.interval = self.idle_interval
+            else:
+                entry.interval = min(entry.interval * self.backoff_factor, self.max_interval)
+        entry.due = now + entry.interval
+        self._push(key, entry)
+
+    def defer(self, key: Hashable, delay: float, now: Optional[float] = None) -> None:
+        """Reschedules an in-flight mailbox `delay` seconds out without touching its interval."""
+        entry = self._entries.get(key)
+        if entry is None or entry.token != -1:
+            return
+        now = self.clock() if now is None else now
+        entry.due = now + delay
+        self._push(key, entry)
+
+    def seconds_until_next(self, now: Optional[float] = None) -> Optional[float]:
+        """Time until the earliest scheduled poll, or None if nothing is scheduled."""
+        now = self.clock() if now is None else now
+        while self._heap:
+            _, token, key = self._heap[0]
+            entry = self._entries.get(key)
+            if entry is not None and entry.token == token:
+                return max(0.0, entry.due - now)
+            heapq.heappop(self._heap)
+        return None
+
+    async def wait(self, max_wait: float) -> None:
+        """Sleeps until the next mailbox is due, a new one is added, or `max_wait` passes."""
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        delay = self.seconds_until_next()
+        delay = max_wait if delay is None else min(delay, max_wait)
+        if delay <= 0:
+            return
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
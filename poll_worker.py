@@ -0,0 +1,165 @@
+"""
+Poll worker process for sharded polling (see sharding.ShardCoordinator).
+
+Connects to the bot's coordinator, polls the addresses it is assigned with its
+own scheduler and tempmail client, and reports new mail (bodies fetched, HTML
+already converted to text) back as JSON lines.
+
+    python poll_worker.py --connect 127.0.0.1:7001 --name worker-0
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+
+from html_text import html_to_text
+from mail_client import CIRCUIT_OPEN_ERROR, TEMPMAIL_BASE_URL, TempMailClient, new_mails_since
+from models import Mail, Mailbox
+from poll_scheduler import PollScheduler
+
+logger = logging.getLogger("poll_worker")
+
+# --- Worker defaults ---
+MAX_SLEEP = 3            # Upper bound on how long the worker sleeps between sweeps
+CONCURRENCY = 50         # Max concurrent tempmail.plus requests per worker
+REQUEST_TIMEOUT = 10
+TEXT_LIMIT = 20000       # Characters of converted HTML sent back per mail
+
+
+class PollWorker:
+    """Polls one shard of mailboxes and streams new mail to the coordinator."""
+
+    def __init__(self, name: str, client: TempMailClient, scheduler: PollScheduler):
+        self.name = name
+        self.client = client
+        self.scheduler = scheduler
+        self.cursors = {}    # email -> Mailbox of what was already reported
+        self.requests = 0    # Upstream inbox polls and failures since the last sweep report
+        self.failed = 0
+        self._writer: asyncio.StreamWriter = None
+
+    def _send(self, message: dict) -> None:
+        self._writer.write(json.dumps(message, separators=(",", ":")).encode() + b"\n")
+
+    def handle_command(self, message: dict) -> None:
+        email = message["email"]
+        if message["op"] == "watch":
+            mailbox = Mailbox.from_json(message.get("cursor"))
+            current = self.cursors.get(email)
+            # Shared address: keep the oldest cursor so no chat misses mail
+            if current is not None and (current.cursor is None or (mailbox.cursor is not None and current.cursor <= mailbox.cursor)):
+                mailbox = current
+            self.cursors[email] = mailbox
+            if email not in self.scheduler:
+                self.scheduler.add(email)
+        elif message["op"] == "unwatch":
+            self.cursors.pop(email, None)
+            self.scheduler.remove(email)
+            self.client.forget(email)
+
+    async def _read_commands(self, reader: asyncio.StreamReader) -> None:
+        while line := await reader.readline():
+            self.handle_command(json.loads(line))
+
+    async def _fetch_bodies(self, email: str, mails: list) -> list:
+        """
+        Fetches the bodies of `mails` (oldest first). Stops at the first that
+        fails: it and the newer ones stay unseen and are retried on the next poll.
+        """
+        bodies = await asyncio.gather(*(self.client.fetch_mail(email, mail.mail_id) for mail in mails))
+        full = []
+        for header, body in zip(mails, bodies):
+            if "error" in body:
+                break
+            mail = Mail.with_body(header, body)
+            # Convert here, off the bot's process
+            if not mail.text and mail.html:
+                mail.text = html_to_text(mail.html, limit=TEXT_LIMIT)
+            mail.html = ""
+            full.append(mail)
+        return full
+
+    async def sweep(self) -> int:
+        popped = self.scheduler.pop_due()
+        try:
+            return await self._sweep_due([email for email in popped if email in self.cursors])
+        finally:
+            # Mailboxes a failed sweep left in flight are retried shortly
+            for email in popped:
+                self.scheduler.defer(email, random.uniform(1, 2 * MAX_SLEEP))
+
+    async def _sweep_due(self, due: list) -> int:
+        if not due:
+            return 0
+        inboxes = await self.client.fetch_many({email: self.cursors[email].cursor for email in due})
+        for email in due:
+            error = inboxes[email].get("error")
+            if error == CIRCUIT_OPEN_ERROR:
+                # Shed by the circuit breaker: retry later, spread out
+                self.scheduler.defer(email, random.uniform(1, 2 * MAX_SLEEP))
+                continue
+            self.requests += 1
+            if error:
+                self.failed += 1
+            mail_list = inboxes[email].get("mail_list") or []
+            mailbox = self.cursors.get(email)
+            new_mails = new_mails_since(mail_list, mailbox) if mailbox is not None else []
+            if new_mails:
+                mails = await self._fetch_bodies(email, new_mails)
+                if mails:
+                    # Newest first, like the upstream list; marked seen only once reported
+                    self._send({"op": "mail", "email": email, "mails": [mail.to_json() for mail in reversed(mails)]})
+                    for mail in mails:
+                        mailbox.mark(mail.mail_id)
+            self.scheduler.record(email, bool(new_mails))
+        return len(due)
+
+    async def run(self, host: str, port: int) -> None:
+        reader, self._writer = await asyncio.open_connection(host, port)
+        self._send({"op": "hello", "worker": self.name, "pid": os.getpid()})
+        commands = asyncio.create_task(self._read_commands(reader))
+        await self.client.start()
+        try:
+            while not commands.done():
+                # Pause polling while the upstream circuit breaker is open
+                pause = self.client.breaker.retry_in()
+                if pause:
+                    await asyncio.sleep(min(pause, MAX_SLEEP))
+                    self._send({"op": "sweep", "polled": 0, "at": time.time()})
+                    continue
+                try:
+                    polled = await self.sweep()
+                except Exception as e:
+                    logger.exception(f"Sweep failed: {e}")
+                    polled = 0
+                self._send({"op": "sweep", "polled": polled, "requests": self.requests, "failed": self.failed,
+                            "at": time.time()})
+                self.requests = self.failed = 0
+                await self._writer.drain()
+                await self.scheduler.wait(MAX_SLEEP)
+        finally:
+            commands.cancel()
+            await self.client.close()
+            self._writer.close()
+        logger.info(f"{self.name}: coordinator closed the connection.")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connect", required=True, help="Coordinator address, host:port")
+    parser.add_argument("--name", required=True)
+    parser.add_argument("--base-url", default=TEMPMAIL_BASE_URL)
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+    host, port = args.connect.rsplit(":", 1)
+    client = TempMailClient(base_url=args.base_url, concurrency=args.concurrency, request_timeout=REQUEST_TIMEOUT)
+    asyncio.run(PollWorker(args.name, client, PollScheduler()).run(host, int(port)))
+
+
+if __name__ == "__main__":
+    main()
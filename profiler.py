@@ -0,0 +1,200 @@
+import asyncio
+import functools
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import contextmanager
+from typing import Optional
+
+from metrics import CALLBACK_TIME, LOOP_LAG, SLOW_CALLBACKS
+
+logger = logging.getLogger(__name__)
+
+# --- Profiler defaults ---
+PING_INTERVAL = 0.02     # Seconds between loop lag probes from the watchdog thread
+SLOW_CALLBACK = 0.1      # A callback blocking the loop at least this long is reported with its stack
+KEEP_SAMPLES = 2000      # Recent durations kept per callback (and for loop lag) for percentiles
+KEEP_SLOW = 20           # Slow-callback reports kept
+STACK_DEPTH = 20         # Innermost frames kept per captured stack
+
+
+class _Samples:
+    """Bounded window of recent durations plus lifetime count and max."""
+    __slots__ = ("recent", "count", "max")
+
+    def __init__(self, keep: int):
+        self.recent = deque(maxlen=keep)
+        self.count = 0
+        self.max = 0.0
+
+    def add(self, value: float) -> None:
+        self.recent.append(value)
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def summary(self) -> dict:
+        ordered = sorted(self.recent)
+
+        def pct(p: float) -> float:
+            return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000, 2) if ordered else 0.0
+
+        return {"count": self.count, "p50_ms": pct(0.5), "p95_ms": pct(0.95), "p99_ms": pct(0.99),
+                "max_ms": round(self.max * 1000, 2)}
+
+
+class LoopProfiler:
+    """
+    Event-loop lag sampler, per-callback timing and slow-callback capture.
+
+    A watchdog thread posts a ping to the loop every `interval`; the delay
+    until the loop runs it is the loop lag. If a ping stays pending for
+    `slow_threshold`, the loop is blocked: the watchdog captures the loop
+    thread's stack right then (so it shows the blocking code) together with
+    the running task and the callback label it is tracked under, and the
+    report is completed with the total blocked time once the loop answers.
+
+    Handlers, jobs and other callbacks are timed (wall time, awaits
+    included) by wrapping them with `timed()` or a `track()` block.
+    """
+
+    def __init__(self, interval: float = PING_INTERVAL, slow_threshold: float = SLOW_CALLBACK,
+                 keep_samples: int = KEEP_SAMPLES, keep_slow: int = KEEP_SLOW):
+        self.interval = interval
+        self.slow_threshold = slow_threshold
+        self.keep_samples = keep_samples
+        self.lag = _Samples(keep_samples)
+        self.callbacks = {}                 # label -> _Samples
+        self.slow = deque(maxlen=keep_slow)
+        self._labels = {}                   # task -> label of the callback it is running
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._ping_sent: Optional[float] = None
+        self._report: Optional[dict] = None
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # --- Callback timing ---
+
+    def record(self, label: str, elapsed: float) -> None:
+        samples = self.callbacks.get(label)
+        if samples is None:
+            samples = self.callbacks[label] = _Samples(self.keep_samples)
+        samples.add(elapsed)
+        CALLBACK_TIME.labels(label).observe(elapsed)
+
+    @contextmanager
+    def track(self, label: str):
+        """Times the block under `label` and attributes loop stalls inside it to that label."""
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        previous = self._labels.get(task)
+        if task is not None:
+            self._labels[task] = label
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(label, time.perf_counter() - started)
+            if task is not None:
+                if previous is None:
+                    self._labels.pop(task, None)
+                else:
+                    self._labels[task] = previous
+
+    def timed(self, callback, label: Optional[str] = None):
+        """Wraps an async callback (handler, job, subscriber) so every call is tracked."""
+        label = label or getattr(callback, "__name__", repr(callback))
+
+        @functools.wraps(callback)
+        async def wrapper(*args, **kwargs):
+            with self.track(label):
+                return await callback(*args, **kwargs)
+
+        return wrapper
+
+    def instrument(self, application) -> None:
+        """Wraps the callback of every handler registered on a PTB Application."""
+        for handlers in application.handlers.values():
+            for handler in handlers:
+                if not getattr(handler.callback, "__wrapped__", None):
+                    handler.callback = self.timed(handler.callback)
+
+    # --- Loop lag and stall capture ---
+
+    def _pong(self, sent: float) -> None:
+        lag = time.perf_counter() - sent
+        self._ping_sent = None
+        self.lag.add(lag)
+        LOOP_LAG.observe(lag)
+        report, self._report = self._report, None
+        if report is not None:
+            report["blocked_ms"] = round(lag * 1000, 1)
+            self.slow.append(report)
+            SLOW_CALLBACKS.inc()
+            logger.warning(
+                f"Event loop blocked for {lag * 1000:.0f} ms in {report['callback'] or report['task']}:\n"
+                + "".join(report["stack"][-5:])
+            )
+
+    def _capture(self) -> dict:
+        task = None
+        try:
+            task = asyncio.current_task(self._loop)
+        except RuntimeError:
+            pass
+        frame = sys._current_frames().get(self._loop_thread)
+        stack = traceback.format_stack(frame)[-STACK_DEPTH:] if frame is not None else []
+        coro = task.get_coro() if task is not None else None
+        return {
+            "at": time.time(),
+            "task": getattr(coro, "__qualname__", None) or (task.get_name() if task is not None else None),
+            "callback": self._labels.get(task),
+            "stack": stack,
+        }
+
+    def _watch(self) -> None:
+        while not self._stopping.wait(self.interval):
+            sent = self._ping_sent
+            now = time.perf_counter()
+            if sent is None:
+                self._ping_sent = now
+                try:
+                    self._loop.call_soon_threadsafe(self._pong, now)
+                except RuntimeError:
+                    return  # Loop closed
+            elif now - sent >= self.slow_threshold and self._report is None:
+                self._report = self._capture()
+
+    def start(self) -> None:
+        """Starts the watchdog for the running loop."""
+        if self._thread is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._stopping.clear()
+        self._ping_sent = None
+        self._thread = threading.Thread(target=self._watch, name="loop-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stopping.set()
+            self._thread.join()
+            self._thread = None
+
+    def snapshot(self) -> dict:
+        return {
+            "slow_threshold_ms": self.slow_threshold * 1000,
+            "loop_lag": self.lag.summary(),
+            "callbacks": {
+                label: samples.summary()
+                for label, samples in sorted(self.callbacks.items(), key=lambda item: -item[1].max)
+            },
+            "slow_callbacks": list(reversed(self.slow)),
+        }
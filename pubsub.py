@@ -0,0 +1,35 @@
+import logging
+from typing import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+Subscriber = Callable[[int, list], Awaitable[None]]
+
+
+class MailBus:
+    """
+    In-process publish/subscribe for new mail.
+
+    The poller publishes each chat's batch of parsed mails (oldest first);
+    subscribers are async callables `handler(chat_id, mails)` awaited in
+    subscription order, so one chat's messages keep their order. A failing
+    subscriber is logged and does not stop the others.
+    """
+
+    def __init__(self):
+        self._subscribers = []
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self, handler: Subscriber) -> Subscriber:
+        """Adds a subscriber. Returns it, so it can be used as a decorator."""
+        self._subscribers.append(handler)
+        return handler
+
+    async def publish(self, chat_id: int, mails: list) -> None:
+        for handler in list(self._subscribers):
+            try:
+                await handler(chat_id, mails)
+            except Exception as e:
+                logger.exception(f"Mail subscriber {getattr(handler, '__name__', handler)} failed for chat {chat_id}: {e}")
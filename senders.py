@@ -0,0 +1,152 @@
+import json
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# --- Sender index defaults ---
+CACHE_SIZE = 4096        # Resolved sender strings kept (repeat senders skip parsing)
+RELOAD_INTERVAL = 5.0    # Seconds between checks of the config file for changes
+
+# Display names for known services, keyed by full address or by domain
+# (a domain also covers its subdomains: google.com matches accounts.google.com)
+KNOWN_SENDERS = {
+    'google.com': 'Google',
+    'registration@facebookmail.com': 'Facebook',
+    'meta.com': 'Meta (Facebook)',
+    'twitter.com': 'X (Twitter)',
+    'discord.com': 'Discord',
+    'amazon.com': 'Amazon',
+    'microsoft.com': 'Microsoft',
+    'apple.com': 'Apple',
+    'noreply@telegram.org': 'Telegram',
+    'instagram.com': 'Instagram',
+    'tiktok.com': 'TikTok',
+    'netflix.com': 'Netflix',
+    'steamcommunity.com': 'Steam',
+    'reddit.com': 'Reddit',
+    'paypal.com': 'PayPal',
+    'snapchat.com': 'Snapchat',
+    'spotify.com': 'Spotify',
+    'linkedin.com': 'LinkedIn',
+    'uber.com': 'Uber',
+    'noreply@tm.openai.com': 'Chat Gpt'
+}
+
+# 'Name <user@domain>', '"Name" <user@domain>', '<user@domain>' or a bare 'user@domain'
+_SENDER_RE = re.compile(r'\s*(?:([^<]*?)\s*<([^<>\s@]+@[^<>\s@]+)>|([^<>\s@]+@[^<>\s@]+))\s*$')
+
+_NAME = ""  # Key holding a node's display name in the domain tree (labels are never empty)
+
+
+class SenderIndex:
+    """
+    Resolves a mail's sender string to the name shown to users.
+
+    Known services are looked up first by exact address, then by the longest
+    matching domain suffix, walking a tree of reversed domain labels
+    (com -> google -> accounts). Unknown senders fall back to their display
+    name, then to the cleaned-up raw string. Results are kept in an LRU, and
+    the optional JSON config file (address or domain -> name, merged over
+    `senders`) is re-read when it changes, without a restart.
+    """
+
+    def __init__(self, senders: dict = KNOWN_SENDERS, config_path: Optional[str] = None,
+                 cache_size: int = CACHE_SIZE, reload_interval: float = RELOAD_INTERVAL, clock=time.monotonic):
+        self.senders = senders
+        self.config_path = config_path
+        self.cache_size = cache_size
+        self.reload_interval = reload_interval
+        self.clock = clock
+        self._config_mtime = None
+        self._next_check = 0.0
+        self._cache = OrderedDict()    # sender string -> resolved name, least recently used first
+        self._build(senders)
+        self.maybe_reload()
+
+    def _build(self, senders: dict) -> None:
+        addresses, domains = {}, {}
+        for key, name in senders.items():
+            key = key.strip().lower()
+            if "@" in key:
+                addresses[key] = name
+                continue
+            node = domains
+            for label in reversed(key.strip(".").split(".")):
+                node = node.setdefault(label, {})
+            node[_NAME] = name
+        self._addresses, self._domains = addresses, domains
+        self.services = frozenset(senders.values())    # Known service names (for usage stats)
+        self._cache.clear()
+
+    def maybe_reload(self) -> bool:
+        """Re-reads the config file if it changed since the last load. Returns whether the index was rebuilt."""
+        if not self.config_path:
+            return False
+        self._next_check = self.clock() + self.reload_interval
+        try:
+            mtime = os.stat(self.config_path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime == self._config_mtime:
+            return False
+        self._config_mtime = mtime
+        extra = {}
+        if mtime is not None:
+            try:
+                with open(self.config_path) as config:
+                    extra = json.load(config)
+                if not isinstance(extra, dict) or not all(isinstance(v, str) for v in extra.values()):
+                    raise ValueError("expected a JSON object of address or domain -> name")
+            except (OSError, ValueError) as e:
+                logger.error(f"Ignoring sender config {self.config_path}: {e}")
+                return False
+        self._build({**self.senders, **extra})
+        logger.info(f"Loaded {len(extra)} sender names from {self.config_path}.")
+        return True
+
+    def lookup(self, address: str) -> Optional[str]:
+        """Known service name for an address: exact match first, then the longest domain suffix."""
+        address = address.lower()
+        name = self._addresses.get(address)
+        if name is not None:
+            return name
+        node = self._domains
+        for label in reversed(address.rpartition("@")[2].split(".")):
+            node = node.get(label)
+            if node is None:
+                break
+            name = node.get(_NAME, name)
+        return name
+
+    def _resolve(self, sender: str) -> str:
+        match = _SENDER_RE.match(sender)
+        if match:
+            display, address = match.group(1), match.group(2) or match.group(3)
+            name = self.lookup(address)
+            if name is not None:
+                return name
+            if display:
+                display = display.strip().strip('"').strip()
+                if display:
+                    return display
+        return sender.replace("<", " ").replace(">", "").strip()
+
+    def resolve(self, sender: Optional[str]) -> str:
+        """Returns the display name for a sender string (cached)."""
+        if not sender:
+            return ""
+        if self.config_path and self.clock() >= self._next_check:
+            self.maybe_reload()
+        name = self._cache.get(sender)
+        if name is not None:
+            self._cache.move_to_end(sender)
+            return name
+        name = self._cache[sender] = self._resolve(sender)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return name
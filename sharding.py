@@ -0,0 +1,273 @@
+import asyncio
+import bisect
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from typing import Awaitable, Callable, Hashable, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# --- Sharding defaults ---
+RING_REPLICAS = 100      # Virtual nodes per worker on the hash ring
+MAX_MESSAGE_BYTES = 16 * 1024 * 1024   # Largest JSON line accepted from a worker (reports carry bodies)
+RESTART_DELAY = 1.0      # Seconds before a crashed worker process is restarted
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "poll_worker.py")
+
+
+def _ring_hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Consistent hash ring. Each node owns `replicas` points on the ring, so
+    adding or removing a node only moves about 1/N of the keys.
+    """
+
+    def __init__(self, replicas: int = RING_REPLICAS):
+        self.replicas = replicas
+        self._points = []    # Sorted ring positions
+        self._owners = []    # Node owning each position
+        self.nodes = set()
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def add(self, node: str) -> None:
+        if node in self.nodes:
+            return
+        self.nodes.add(node)
+        for i in range(self.replicas):
+            point = _ring_hash(f"{node}#{i}")
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, node)
+
+    def remove(self, node: str) -> None:
+        if node not in self.nodes:
+            return
+        self.nodes.discard(node)
+        kept = [(point, owner) for point, owner in zip(self._points, self._owners) if owner != node]
+        self._points = [point for point, _ in kept]
+        self._owners = [owner for _, owner in kept]
+
+    def node_for(self, key: Hashable) -> Optional[str]:
+        """Returns the node owning `key`, or None if the ring is empty."""
+        if not self._points:
+            return None
+        index = bisect.bisect(self._points, _ring_hash(str(key))) % len(self._points)
+        return self._owners[index]
+
+
+class _Worker:
+    __slots__ = ("name", "pid", "writer", "mailboxes", "last_sweep", "polled")
+
+    def __init__(self, name: str, pid: Optional[int], writer: asyncio.StreamWriter):
+        self.name = name
+        self.pid = pid
+        self.writer = writer
+        self.mailboxes = {}   # email -> chat IDs on this shard watching it
+        self.last_sweep = time.monotonic()
+        self.polled = 0
+
+    def send(self, message: dict) -> None:
+        if not self.writer.is_closing():
+            self.writer.write(json.dumps(message, separators=(",", ":")).encode() + b"\n")
+
+
+class ShardCoordinator:
+    """
+    Bot-side end of sharded polling.
+
+    Poll workers (`poll_worker.py`, one process each) connect over a local
+    socket. Chats are assigned to workers by consistent hashing of `chat_id`,
+    so all of a chat's addresses are polled by the same worker. Workers report
+    new mail (bodies included) back as JSON lines, and `on_mail(email, mails,
+    chat_ids)` is awaited for each report; the optional `on_sweep(requests,
+    failed)` gets each sweep's upstream request and failure counts. When a worker connects or is lost,
+    the ring changes and only the chats that moved are re-assigned, starting
+    from their current cursor (`cursor(chat_id, email)`).
+    """
+
+    def __init__(
+        self,
+        on_mail: Callable[[str, list, set], Awaitable],
+        cursor: Callable[[int, str], Union[int, dict, None]],
+        on_sweep: Optional[Callable[[int, int], None]] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        replicas: int = RING_REPLICAS,
+    ):
+        self.on_mail = on_mail
+        self.cursor = cursor
+        self.on_sweep = on_sweep
+        self.host = host
+        self.port = port
+        self.ring = HashRing(replicas)
+        self._workers = {}     # name -> _Worker
+        self._watches = {}     # chat_id -> set of emails
+        self._owner = {}       # chat_id -> worker name currently polling it
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._processes = []
+        self._closing = False
+
+    def __len__(self) -> int:
+        """Number of watched addresses (counted once per chat)."""
+        return sum(len(emails) for emails in self._watches.values())
+
+    @property
+    def workers(self) -> list:
+        return sorted(self._workers)
+
+    @property
+    def last_sweep(self) -> Optional[float]:
+        """Monotonic time of the least recent worker sweep (None without workers)."""
+        return min((worker.last_sweep for worker in self._workers.values()), default=None)
+
+    def worker_info(self) -> dict:
+        """Per connected worker: process ID, addresses assigned and polls done so far."""
+        return {
+            name: {"pid": worker.pid, "mailboxes": len(worker.mailboxes), "polled": worker.polled}
+            for name, worker in self._workers.items()
+        }
+
+    # --- Assignment ---
+
+    def watch(self, chat_id: int, email: str) -> None:
+        self._watches.setdefault(chat_id, set()).add(email)
+        node = self._owner.get(chat_id) or self.ring.node_for(chat_id)
+        if node in self._workers:
+            self._owner[chat_id] = node
+            self._assign(self._workers[node], chat_id, email)
+
+    def unwatch(self, chat_id: int, email: str) -> None:
+        emails = self._watches.get(chat_id)
+        if emails is None:
+            return
+        emails.discard(email)
+        node = self._owner.get(chat_id)
+        if node in self._workers:
+            self._release(self._workers[node], chat_id, email)
+        if not emails:
+            del self._watches[chat_id]
+            self._owner.pop(chat_id, None)
+
+    def _assign(self, worker: _Worker, chat_id: int, email: str) -> None:
+        worker.mailboxes.setdefault(email, set()).add(chat_id)
+        # Re-sent for shared addresses too: the worker keeps the oldest cursor
+        worker.send({"op": "watch", "email": email, "cursor": self.cursor(chat_id, email)})
+
+    def _release(self, worker: _Worker, chat_id: int, email: str) -> None:
+        chats = worker.mailboxes.get(email)
+        if chats is None:
+            return
+        chats.discard(chat_id)
+        if not chats:
+            del worker.mailboxes[email]
+            worker.send({"op": "unwatch", "email": email})
+
+    def _rebalance(self) -> None:
+        """Moves every chat whose ring owner changed to its new worker."""
+        moved = 0
+        for chat_id, emails in self._watches.items():
+            node = self.ring.node_for(chat_id)
+            old = self._owner.get(chat_id)
+            if node == old:
+                continue
+            if old in self._workers:
+                for email in emails:
+                    self._release(self._workers[old], chat_id, email)
+            if node is None:
+                self._owner.pop(chat_id, None)
+                continue
+            self._owner[chat_id] = node
+            for email in emails:
+                self._assign(self._workers[node], chat_id, email)
+            moved += 1
+        if moved:
+            logger.info(f"Rebalanced {moved} chats across {len(self.ring)} poll workers.")
+
+    # --- Worker connections ---
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        worker = None
+        try:
+            hello = json.loads(await reader.readline() or b"{}")
+            name = hello.get("worker")
+            if hello.get("op") != "hello" or not name or name in self._workers:
+                logger.warning(f"Rejected poll worker connection: {hello}")
+                return
+            worker = self._workers[name] = _Worker(name, hello.get("pid"), writer)
+            self.ring.add(name)
+            logger.info(f"Poll worker {name} connected ({len(self.ring)} total).")
+            self._rebalance()
+
+            while line := await reader.readline():
+                message = json.loads(line)
+                if message["op"] == "mail":
+                    chats = set(worker.mailboxes.get(message["email"], ()))
+                    if chats:
+                        try:
+                            await self.on_mail(message["email"], message["mails"], chats)
+                        except Exception as e:
+                            logger.exception(f"Failed to deliver mail for {message['email']}: {e}")
+                elif message["op"] == "sweep":
+                    worker.last_sweep = time.monotonic()
+                    worker.polled += message.get("polled", 0)
+                    if self.on_sweep is not None:
+                        self.on_sweep(message.get("requests", 0), message.get("failed", 0))
+        except (ConnectionError, ValueError) as e:
+            if not self._closing:
+                logger.warning(f"Poll worker connection failed: {e}")
+        finally:
+            if worker is not None and self._workers.get(worker.name) is worker:
+                del self._workers[worker.name]
+                self.ring.remove(worker.name)
+                if not self._closing:
+                    logger.warning(f"Poll worker {worker.name} lost ({len(self.ring)} left).")
+                    self._rebalance()
+            writer.close()
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(
+            self._handle_connection, self.host, self.port, limit=MAX_MESSAGE_BYTES
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"Shard coordinator listening on {self.host}:{self.port}")
+
+    def spawn_workers(self, count: int, *worker_args: str) -> None:
+        """Starts `count` local poll worker processes, restarting any that exit."""
+        for i in range(count):
+            self._processes.append(asyncio.create_task(self._supervise(f"worker-{i}", worker_args)))
+
+    async def _supervise(self, name: str, worker_args: tuple) -> None:
+        while True:
+            process = await asyncio.create_subprocess_exec(
+                sys.executable, WORKER_SCRIPT,
+                "--connect", f"{self.host}:{self.port}", "--name", name, *worker_args,
+            )
+            try:
+                code = await process.wait()
+            except asyncio.CancelledError:
+                if process.returncode is None:
+                    process.terminate()
+                    await process.wait()
+                raise
+            logger.warning(f"Poll worker {name} exited with {code}; restarting.")
+            await asyncio.sleep(RESTART_DELAY)
+
+    async def close(self) -> None:
+        self._closing = True
+        for task in self._processes:
+            task.cancel()
+        await asyncio.gather(*self._processes, return_exceptions=True)
+        self._processes = []
+        if self._server is not None:
+            self._server.close()
+            for worker in list(self._workers.values()):
+                worker.writer.close()
+            await self._server.wait_closed()
+            self._server = None
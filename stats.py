@@ -0,0 +1,141 @@
+import time
+from typing import Iterable, Optional
+
+# --- Rolling window defaults ---
+WINDOW = 3600            # Seconds of history kept per counter
+SLOT = 10                # Seconds per ring-buffer slot
+SPANS = (60, 900, 3600)  # Windows reported by snapshots (seconds)
+TOP_SENDERS = 5
+
+
+class RollingCounter:
+    """
+    Event counts over a sliding time window, kept in a fixed ring of slots.
+
+    `add()` is O(1) amortized: slots that went stale since the last event are
+    zeroed as the ring advances (at most one pass over the ring). The whole
+    window's sum is maintained alongside, and shorter spans only read the
+    last few slots, so reads never scan history either.
+    """
+    __slots__ = ("slot", "slots", "total", "_counts", "_current", "_window_sum", "clock")
+
+    def __init__(self, window: float = WINDOW, slot: float = SLOT, clock=time.monotonic):
+        self.slot = slot
+        self.slots = max(1, int(window // slot))
+        self.total = 0                # Lifetime count
+        self.clock = clock
+        self._counts = [0] * self.slots
+        self._current = int(clock() // slot)
+        self._window_sum = 0
+
+    def _advance(self) -> int:
+        now = int(self.clock() // self.slot)
+        stale = now - self._current
+        if stale > 0:
+            counts = self._counts
+            if stale >= self.slots:
+                counts[:] = [0] * self.slots
+                self._window_sum = 0
+            else:
+                for i in range(self._current + 1, now + 1):
+                    index = i % self.slots
+                    self._window_sum -= counts[index]
+                    counts[index] = 0
+            self._current = now
+        return now
+
+    def add(self, amount: int = 1) -> None:
+        now = self._advance()
+        self._counts[now % self.slots] += amount
+        self._window_sum += amount
+        self.total += amount
+
+    def sum(self, seconds: float) -> int:
+        """Events in the last `seconds` (rounded up to whole slots, capped at the window)."""
+        now = self._advance()
+        span = min(self.slots, max(1, -(-int(seconds) // int(self.slot))))
+        if span == self.slots:
+            return self._window_sum
+        counts, slots = self._counts, self.slots
+        return sum(counts[(now - i) % slots] for i in range(span))
+
+    def per_minute(self, seconds: float, elapsed: Optional[float] = None) -> float:
+        """Average rate over the last `seconds`; `elapsed` shortens the divisor while less time has passed."""
+        return self.sum(seconds) * 60 / max(1.0, min(seconds, elapsed or seconds))
+
+
+class UsageStats:
+    """
+    Bot-wide usage counters for the admin stats view.
+
+    Every hot-path hook is a couple of integer updates; derived figures
+    (rates, top senders, error ratios) are computed only when a snapshot is
+    read. Sender services are counted only for the known service names
+    (`services`), so the per-sender table stays bounded.
+    """
+
+    def __init__(self, window: float = WINDOW, slot: float = SLOT, clock=time.monotonic):
+        self.window = window
+        self.slot = slot
+        self.clock = clock
+        self.started = clock()
+        self.mails = self._counter()
+        self.otps = self._counter()
+        self.auto_generated = self._counter()
+        self.upstream_requests = self._counter()
+        self.upstream_errors = self._counter()
+        self.senders = {}             # service name -> RollingCounter
+
+    def _counter(self) -> RollingCounter:
+        return RollingCounter(self.window, self.slot, self.clock)
+
+    # --- Hot-path hooks ---
+
+    def mail(self, sender: str, otp: bool, services: Iterable[str] = ()) -> None:
+        """Records one announced mail (and its OTP, if any)."""
+        self.mails.add()
+        if otp:
+            self.otps.add()
+        if sender in services:
+            counter = self.senders.get(sender)
+            if counter is None:
+                counter = self.senders[sender] = self._counter()
+            counter.add()
+
+    def auto_generation(self, count: int = 1) -> None:
+        self.auto_generated.add(count)
+
+    def upstream(self, requests: int, errors: int) -> None:
+        """Records a batch of tempmail.plus inbox polls and how many failed."""
+        if requests:
+            self.upstream_requests.add(requests)
+        if errors:
+            self.upstream_errors.add(errors)
+
+    # --- Reading ---
+
+    def top_senders(self, seconds: float = WINDOW, limit: int = TOP_SENDERS) -> list:
+        """[(service, mails)] over the last `seconds`, busiest first."""
+        counts = [(name, counter.sum(seconds)) for name, counter in self.senders.items()]
+        return sorted((item for item in counts if item[1]), key=lambda item: -item[1])[:limit]
+
+    def error_rate(self, seconds: float) -> float:
+        requests = self.upstream_requests.sum(seconds)
+        return self.upstream_errors.sum(seconds) / requests if requests else 0.0
+
+    def snapshot(self, spans: tuple = SPANS) -> dict:
+        uptime = self.clock() - self.started
+
+        def rates(counter: RollingCounter) -> dict:
+            return {"total": counter.total, **{f"per_min_{span // 60}m": round(counter.per_minute(span, uptime), 2)
+                                               for span in spans}}
+
+        return {
+            "uptime": round(uptime),
+            "mails": rates(self.mails),
+            "otps": rates(self.otps),
+            "auto_generated": rates(self.auto_generated),
+            "upstream_requests": rates(self.upstream_requests),
+            "upstream_error_rate": {f"{span // 60}m": round(self.error_rate(span), 4) for span in spans},
+            "top_senders": self.top_senders(max(spans)),
+        }
@@ -0,0 +1,268 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import AsyncIterator, Optional
+
+from models import UserState
+
+logger = logging.getLogger(__name__)
+
+# --- Storage defaults ---
+FLUSH_INTERVAL = 0.5     # Seconds between write-behind batches
+SCAN_BATCH = 1000        # Rows per batch when streaming active mailboxes at startup
+CACHE_SIZE = 100_000     # Records kept in memory; the least recently used clean ones are evicted
+MISSING_LIMIT = 10_000   # Chat IDs remembered as having no row, so repeated misses skip SQLite
+
+
+def new_user_record() -> UserState:
+    """Default temp-mail state for a new chat."""
+    return UserState()
+
+
+class UserStore:
+    """
+    In-memory user state store (no persistence).
+
+    Records are `UserState` objects owned by the store: callers mutate them in place
+    and call `save(chat_id)` afterwards so persistent backends can write them back.
+    """
+
+    def __init__(self):
+        self._cache = {}
+        self._blobs = {}
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def get(self, chat_id: int) -> Optional[UserState]:
+        return self._cache.get(chat_id)
+
+    def ensure(self, chat_id: int) -> UserState:
+        """Returns the record for a chat, creating it if needed."""
+        record = self.get(chat_id)
+        if record is None:
+            record = self._remember(chat_id, new_user_record())
+            self.save(chat_id)
+        return record
+
+    def _remember(self, chat_id: int, record: UserState) -> UserState:
+        self._cache[chat_id] = record
+        return record
+
+    def save(self, chat_id: int) -> None:
+        """Marks a record as modified."""
+
+    def load_blob(self, key: str) -> Optional[bytes]:
+        """Returns a named binary snapshot (e.g. the issued-address filter), or None."""
+        return self._blobs.get(key)
+
+    def save_blob(self, key: str, data: bytes) -> None:
+        """Stores a named binary snapshot. Blocking on persistent backends: run it on a worker thread."""
+        self._blobs[key] = data
+
+    async def iter_active(self) -> AsyncIterator[tuple]:
+        """Yields (chat_id, record) for every chat with an active address."""
+        for chat_id, record in list(self._cache.items()):
+            if record.active:
+                yield chat_id, record
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+class SQLiteUserStore(UserStore):
+    """
+    SQLite-backed user state store (WAL mode).
+
+    - Reads are read-through: a chat's row is loaded into the in-memory cache
+      on first access, so startup cost does not grow with the user count.
+      The cache keeps the `cache_size` most recently used records (records
+      with unflushed changes are never evicted), and chat IDs with no row are
+      remembered too, so lookups for unknown chats do not hit SQLite each time.
+    - Writes are write-behind: `save()` only marks the chat dirty; a background
+      task snapshots dirty records and writes them in one transaction per batch
+      on a worker thread, off the event loop.
+    """
+
+    def __init__(self, path: str, flush_interval: float = FLUSH_INTERVAL, cache_size: int = CACHE_SIZE,
+                 missing_limit: int = MISSING_LIMIT):
+        super().__init__()
+        self.path = path
+        self.flush_interval = flush_interval
+        self.cache_size = cache_size
+        self.missing_limit = missing_limit
+        self._cache = OrderedDict()
+        self._missing = OrderedDict()   # chat_id -> None, known to have no row
+        self._dirty = set()
+        self._write_lock = threading.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._read = self._connect()
+        self._write = self._connect()
+        with self._write_lock:
+            self._write.execute("PRAGMA journal_mode=WAL")
+            self._write.execute("PRAGMA synchronous=NORMAL")
+            self._write.execute(
+                "CREATE TABLE IF NOT EXISTS users ("
+                " chat_id INTEGER PRIMARY KEY,"
+                " active TEXT,"
+                " data TEXT NOT NULL)"
+            )
+            self._write.execute("CREATE INDEX IF NOT EXISTS users_active ON users(active) WHERE active IS NOT NULL")
+            self._write.execute("CREATE TABLE IF NOT EXISTS blobs (key TEXT PRIMARY KEY, data BLOB NOT NULL)")
+            self._write.commit()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+
+    # --- Reads ---
+
+    def get(self, chat_id: int) -> Optional[UserState]:
+        record = self._cache.get(chat_id)
+        if record is not None:
+            self._cache.move_to_end(chat_id)
+            return record
+        if chat_id in self._missing:
+            return None
+        row = self._read.execute("SELECT data FROM users WHERE chat_id = ?", (chat_id,)).fetchone()
+        if row is not None:
+            return self._remember(chat_id, self._decode(row[0]))
+        self._missing[chat_id] = None
+        if len(self._missing) > self.missing_limit:
+            self._missing.popitem(last=False)
+        return None
+
+    def _remember(self, chat_id: int, record: UserState) -> UserState:
+        self._cache[chat_id] = record
+        self._missing.pop(chat_id, None)
+        for _ in range(len(self._cache) - self.cache_size):
+            old_id, old = self._cache.popitem(last=False)
+            if old_id in self._dirty:
+                # Unflushed changes: keep it until they are written
+                self._cache[old_id] = old
+        return record
+
+    def load_blob(self, key: str) -> Optional[bytes]:
+        row = self._read.execute("SELECT data FROM blobs WHERE key = ?", (key,)).fetchone()
+        return row[0] if row is not None else None
+
+    async def iter_active(self) -> AsyncIterator[tuple]:
+        """Streams active chats from disk in batches, without blocking the loop."""
+        last_chat_id = None
+        while True:
+            rows = await asyncio.to_thread(self._scan_active, last_chat_id)
+            if not rows:
+                return
+            for chat_id, data in rows:
+                # Prefer the cached copy: it may hold unflushed changes
+                record = self._cache.get(chat_id)
+                if record is None:
+                    record = self._remember(chat_id, self._decode(data))
+                if record.active:
+                    yield chat_id, record
+            last_chat_id = rows[-1][0]
+
+    def _scan_active(self, after: Optional[int]) -> list:
+        connection = self._connect()
+        try:
+            if after is None:
+                sql, args = "SELECT chat_id, data FROM users WHERE active IS NOT NULL ORDER BY chat_id LIMIT ?", (SCAN_BATCH,)
+            else:
+                sql = "SELECT chat_id, data FROM users WHERE active IS NOT NULL AND chat_id > ? ORDER BY chat_id LIMIT ?"
+                args = (after, SCAN_BATCH)
+            return connection.execute(sql, args).fetchall()
+        finally:
+            connection.close()
+
+    # --- Writes ---
+
+    def save(self, chat_id: int) -> None:
+        self._dirty.add(chat_id)
+
+    def _snapshot(self) -> list:
+        dirty, self._dirty = self._dirty, set()
+        rows = []
+        for chat_id in dirty:
+            record = self._cache.get(chat_id)
+            if record is not None:
+                rows.append((chat_id, record.active, self._encode(record)))
+        return rows
+
+    def _write_rows(self, rows: list) -> None:
+        with self._write_lock:
+            self._write.execute("BEGIN")
+            try:
+                self._write.executemany(
+                    "INSERT INTO users (chat_id, active, data) VALUES (?, ?, ?) "
+                    "ON CONFLICT(chat_id) DO UPDATE SET active = excluded.active, data = excluded.data",
+                    rows,
+                )
+                self._write.execute("COMMIT")
+            except Exception:
+                self._write.execute("ROLLBACK")
+                raise
+
+    def save_blob(self, key: str, data: bytes) -> None:
+        with self._write_lock:
+            self._write.execute(
+                "INSERT INTO blobs (key, data) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET data = excluded.data",
+                (key, data),
+            )
+
+    async def flush(self) -> int:
+        """Writes every dirty record in one batch. Returns the number of rows written."""
+        rows = self._snapshot()
+        if rows:
+            try:
+                await asyncio.to_thread(self._write_rows, rows)
+            except Exception as e:
+                logger.error(f"Failed to persist {len(rows)} user records: {e}")
+                self._dirty.update(chat_id for chat_id, _, _ in rows)
+                return 0
+        return len(rows)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def start(self) -> None:
+        if self._flush_task is None:
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    async def close(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        # Final synchronous flush so nothing is lost on shutdown
+        rows = self._snapshot()
+        if rows:
+            self._write_rows(rows)
+        self._read.close()
+        self._write.close()
+
+    # --- Serialization ---
+
+    @staticmethod
+    def _encode(record: UserState) -> str:
+        return json.dumps(record.to_json(), separators=(",", ":"))
+
+    @staticmethod
+    def _decode(data: str) -> UserState:
+        return UserState.from_json(json.loads(data))
+
+
+def open_user_store(path: Optional[str]) -> UserStore:
+    """Returns a SQLite store for `path`, or a memory-only store if `path` is empty."""
+    if not path:
+        return UserStore()
+    return SQLiteUserStore(path)
@@ -0,0 +1,149 @@
+import asyncio
+import hmac
+import json
+import logging
+from typing import Awaitable, Callable, Iterable, Optional
+
+from aiohttp import web
+from telegram import Update
+from telegram.ext import BaseHandler, CallbackQueryHandler, CommandHandler, MessageHandler
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# --- Intake defaults ---
+MAX_PENDING = 1000       # Updates accepted but not yet handled; beyond this the endpoint sheds load
+WORKERS = 16             # Updates handled concurrently (one ordered lane per worker)
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+# Update types each handler class can consume
+_HANDLER_UPDATE_TYPES = (
+    (CommandHandler, (Update.MESSAGE,)),
+    (MessageHandler, (Update.MESSAGE,)),
+    (CallbackQueryHandler, (Update.CALLBACK_QUERY,)),
+)
+
+
+def allowed_update_types(handlers: Iterable[BaseHandler]) -> list:
+    """
+    Returns the update types the given handlers can consume, so Telegram only
+    delivers those. Unknown handler classes fall back to every update type.
+    """
+    types = set()
+    for handler in handlers:
+        for handler_class, handler_types in _HANDLER_UPDATE_TYPES:
+            if isinstance(handler, handler_class):
+                types.update(handler_types)
+                break
+        else:
+            return list(Update.ALL_TYPES)
+    return sorted(types)
+
+
+def _lane_key(data: dict) -> int:
+    """Chat (or user) the raw update belongs to, read without building the Update object."""
+    for kind in (Update.MESSAGE, Update.EDITED_MESSAGE, Update.CALLBACK_QUERY):
+        payload = data.get(kind)
+        if payload:
+            chat = payload.get("chat") or (payload.get("message") or {}).get("chat") or payload.get("from") or {}
+            return chat.get("id", 0)
+    return 0
+
+
+class WebhookIntake:
+    """
+    Bounded webhook intake with concurrent, per-chat ordered handling.
+
+    The HTTP handler only validates and enqueues: it answers Telegram as soon
+    as the update is queued. Updates are spread over `workers` lanes by chat,
+    so different chats are handled concurrently while one chat's updates stay
+    in order. Once `max_pending` updates are waiting the endpoint answers 503
+    and Telegram redelivers later, which is the backpressure.
+    """
+
+    def __init__(
+        self,
+        process: Callable[[Update], Awaitable],
+        bot=None,
+        secret: Optional[str] = None,
+        max_pending: int = MAX_PENDING,
+        workers: int = WORKERS,
+    ):
+        self.process = process
+        self.bot = bot
+        self.secret = secret
+        self.max_pending = max_pending
+        self.pending = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.handled = 0
+        self._lanes = [asyncio.Queue() for _ in range(workers)]
+        self._tasks = []
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def __len__(self) -> int:
+        return self.pending
+
+    def register(self, app: web.Application, path: str) -> None:
+        app.router.add_post(path, self.handle)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if self.secret is not None:
+            token = request.headers.get(SECRET_HEADER, "")
+            if not hmac.compare_digest(token, self.secret):
+                return web.Response(status=403)
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            metrics.WEBHOOK_REJECTED.inc()
+            return web.Response(status=503)
+        try:
+            data = json.loads(await request.read())
+        except ValueError:
+            return web.Response(status=400)
+        if not isinstance(data, dict):
+            # Valid JSON but not an update object
+            return web.Response(status=400)
+        self.submit(data)
+        return web.Response()
+
+    def submit(self, data: dict) -> None:
+        """Queues a decoded update payload on its chat's lane."""
+        self.pending += 1
+        self.accepted += 1
+        self._idle.clear()
+        self._lanes[hash(_lane_key(data)) % len(self._lanes)].put_nowait(data)
+
+    async def _worker(self, lane: asyncio.Queue) -> None:
+        while True:
+            data = await lane.get()
+            try:
+                with metrics.UPDATE_HANDLING.time():
+                    await self.process(Update.de_json(data, self.bot))
+            except Exception as e:
+                logger.exception(f"Failed to handle update {data.get('update_id')}: {e}")
+            finally:
+                self.pending -= 1
+                self.handled += 1
+                if not self.pending:
+                    self._idle.set()
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker(lane)) for lane in self._lanes]
+
+    async def join(self) -> None:
+        """Waits until every accepted update has been handled."""
+        await self._idle.wait()
+
+    async def stop(self, drain_timeout: float = 10.0) -> None:
+        """Stops the workers, first giving queued updates up to `drain_timeout` seconds to finish."""
+        try:
+            await asyncio.wait_for(self.join(), drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Dropping {self.pending} unhandled updates on shutdown.")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []